@@ -278,20 +278,8 @@ function VideoAndChatPanel({ authUser, onLogout }) {
   const [text, setText] = useState('')
   const [isConnected, setIsConnected] = useState(false)
 
-  // Listen for ASL predictions from unified video
-  useEffect(() => {
-    const handler = (e) => {
-      if (ws && ws.readyState === WebSocket.OPEN) {
-        ws.send(JSON.stringify({ 
-          type: 'asl_prediction', 
-          label: e.detail.label, 
-          confidence: e.detail.confidence 
-        }));
-      }
-    };
-    window.addEventListener('asl-prediction-local', handler);
-    return () => window.removeEventListener('asl-prediction-local', handler);
-  }, [ws])
+  // ASL predictions reach the chat room server-side: UnifiedVideoChat opens
+  // the ASL socket with ?target= and the server captions the peer directly
 
   const connectChat = () => {
     if (!targetId || !myId) {
@@ -2,11 +2,121 @@ import React, { useEffect, useRef, useState } from 'react';
 import { Hands, HAND_CONNECTIONS } from '@mediapipe/hands'
 import { Camera } from '@mediapipe/camera_utils'
 import { drawConnectors, drawLandmarks } from '@mediapipe/drawing_utils'
+import { createMuxConnection, STREAM_ASL, STREAM_CHAT, STREAM_VIDEO } from './muxSocket'
 
 const HOST = typeof window !== 'undefined' ? window.location.hostname : 'localhost'
 const WS_PROTOCOL = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
 const WS_BASE = `${WS_PROTOCOL}//${HOST}:8000`
 
+// Binary ASL landmark frames (see rtslt/translator/wire.py):
+// [type u8][flags u8][count u16 LE][seq u32 LE][count x f64 t][mask][n x 126 f32]
+const FRAME_BATCH = 2
+const LANDMARK_VALUES = 126
+const FRAME_HEADER_BYTES = 8
+// Frames packed into one message; the server only evaluates the newest
+const LANDMARK_BATCH_FRAMES = 3
+// Quantized encoding for slow uplinks (?encoding=q16): int16 keyframes and
+// int8 deltas at 1/4096 precision
+const FRAME_Q16_KEY = 3
+const FRAME_Q16_DELTA = 4
+const FLAG_HAS_HANDS = 0x01
+const QUANT_SCALE = 4096
+const QUANT_KEYFRAME_INTERVAL = 30
+
+// Binary video frame (see rtslt/translator/media.py):
+// [type u8 = 0x10][flags u8][reserved u16][seq u32 LE] + JPEG bytes
+const FRAME_VIDEO = 0x10
+const VIDEO_HEADER_BYTES = 8
+// Sending settings until the server's congestion control says otherwise
+// (DEFAULT_LEVEL of QUALITY_LADDER in rtslt/translator/media.py)
+const DEFAULT_VIDEO_CONTROL = { scale: 1.0, quality: 0.5, fps: 10 }
+// Peer-to-peer video negotiated over the video socket (see
+// rtslt/translator/signaling.py); relayed frames are the fallback
+const ICE_SERVERS = [{ urls: 'stun:stun.l.google.com:19302' }]
+const P2P_FPS = 15
+
+// Thin clients skip MediaPipe in the browser; the server extracts landmarks
+// from their video frames instead (?extract=1 on the video stream)
+const prefersServerExtraction = () =>
+  new URLSearchParams(window.location.search).has('extract') || (navigator.hardwareConcurrency || 4) <= 2
+
+const prefersLowBandwidth = () => {
+  const c = typeof navigator !== 'undefined' ? navigator.connection : null
+  return !!c && (c.saveData || ['slow-2g', '2g', '3g'].includes(c.effectiveType))
+}
+
+// Mirrors QuantizedFrameEncoder in rtslt/translator/wire.py
+function createQuantizedEncoder() {
+  let reference = null
+  let sinceKeyframe = 0
+  return {
+    requestKeyframe() { reference = null },
+    encode(seq, landmarks) {
+      if (!landmarks) {
+        reference = null
+        const buf = new ArrayBuffer(FRAME_HEADER_BYTES)
+        const view = new DataView(buf)
+        view.setUint8(0, FRAME_Q16_KEY)
+        view.setUint16(2, 1, true)
+        view.setUint32(4, seq >>> 0, true)
+        return buf
+      }
+      const q = new Int16Array(LANDMARK_VALUES)
+      for (let i = 0; i < LANDMARK_VALUES; i++) {
+        q[i] = Math.max(-32768, Math.min(32767, Math.round(landmarks[i] * QUANT_SCALE)))
+      }
+      let delta = null
+      if (reference && sinceKeyframe < QUANT_KEYFRAME_INTERVAL) {
+        delta = new Int8Array(LANDMARK_VALUES)
+        for (let i = 0; i < LANDMARK_VALUES; i++) {
+          const d = q[i] - reference[i]
+          if (d > 127 || d < -127) { delta = null; break }
+          delta[i] = d
+        }
+      }
+      const payload = delta ? LANDMARK_VALUES : LANDMARK_VALUES * 2
+      const buf = new ArrayBuffer(FRAME_HEADER_BYTES + payload)
+      const view = new DataView(buf)
+      view.setUint8(0, delta ? FRAME_Q16_DELTA : FRAME_Q16_KEY)
+      view.setUint8(1, FLAG_HAS_HANDS)
+      view.setUint16(2, 1, true)
+      view.setUint32(4, seq >>> 0, true)
+      if (delta) {
+        new Int8Array(buf, FRAME_HEADER_BYTES).set(delta)
+        sinceKeyframe += 1
+      } else {
+        for (let i = 0; i < LANDMARK_VALUES; i++) view.setInt16(FRAME_HEADER_BYTES + i * 2, q[i], true)
+        sinceKeyframe = 1
+      }
+      reference = q
+      return buf
+    }
+  }
+}
+
+// frames: [{ t: captureTimeMs, landmarks: Float32Array | null }], oldest first
+function encodeLandmarkBatch(seq, frames) {
+  const count = frames.length
+  const maskBytes = Math.ceil(count / 8) * 8
+  const withHands = frames.filter(f => f.landmarks).length
+  const valuesOffset = FRAME_HEADER_BYTES + count * 8 + maskBytes
+  const buf = new ArrayBuffer(valuesOffset + withHands * LANDMARK_VALUES * 4)
+  const view = new DataView(buf)
+  view.setUint8(0, FRAME_BATCH)
+  view.setUint16(2, count, true)
+  view.setUint32(4, seq >>> 0, true)
+  let offset = valuesOffset
+  frames.forEach((f, i) => {
+    view.setFloat64(FRAME_HEADER_BYTES + i * 8, f.t, true)
+    if (!f.landmarks) return
+    view.setUint8(FRAME_HEADER_BYTES + count * 8 + i, 1)
+    for (let j = 0; j < LANDMARK_VALUES; j++, offset += 4) {
+      view.setFloat32(offset, f.landmarks[j], true)
+    }
+  })
+  return buf
+}
+
 export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '', myId = '', targetId = '', isConnected = false }) {
   // --- STATE ---
   const [joined, setJoined] = useState(isConnected);
@@ -23,6 +133,20 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
   const cameraRef = useRef(null);
   const lastSentLandmarksRef = useRef(0);
   const lastVideoSentRef = useRef(0);
+  const videoSeqRef = useRef(0);
+  const videoEncodingRef = useRef(false);
+  // Latest video_control from the receiver's side; scaledCanvasRef holds
+  // the downscaled copy that is encoded when scale < 1
+  const videoControlRef = useRef(DEFAULT_VIDEO_CONTROL);
+  const scaledCanvasRef = useRef(null);
+  const peerConnectionRef = useRef(null);
+  const remoteMediaRef = useRef(null);
+  // True while media flows peer to peer and relayed frames are paused
+  const p2pActiveRef = useRef(false);
+  const landmarkSeqRef = useRef(0);
+  const pendingFramesRef = useRef([]);
+  // Set when the server accepts ?encoding=q16
+  const quantEncoderRef = useRef(null);
   
   const [videoActive, setVideoActive] = useState(false);
   const [error, setError] = useState(null);
@@ -31,6 +155,10 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
   const [chat, setChat] = useState([]);
   const [text, setText] = useState('');
   const [ws, setWs] = useState(null);
+  // Single socket the ASL, chat and video streams are opened on
+  const [mux, setMux] = useState(null);
+  const [p2pActive, setP2pActive] = useState(false);
+  const [thinClient] = useState(prefersServerExtraction);
 
   // --- HANDLERS ---
 
@@ -58,7 +186,7 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
   }, [joined]);
 
   useEffect(() => {
-    if (!joined) return;
+    if (!joined || thinClient) return;
     const hands = new Hands({
       locateFile: (file) => `https://cdn.jsdelivr.net/npm/@mediapipe/hands/${file}`
     });
@@ -66,7 +194,17 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
     hands.onResults(onResults);
     handsRef.current = hands;
     return () => { try { handsRef.current?.close() } catch {} };
-  }, [joined]);
+  }, [joined, thinClient]);
+
+  // Thin clients send the plain camera image
+  const drawPlainFrame = () => {
+    const canvas = localCanvasRef.current;
+    const video = localVideoRef.current;
+    if (!canvas || !video) return;
+    canvas.width = video.videoWidth;
+    canvas.height = video.videoHeight;
+    canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+  };
 
   const onResults = (results) => {
     const canvas = localCanvasRef.current;
@@ -94,24 +232,37 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
     const now = performance.now();
     if (now - lastSentLandmarksRef.current > 50) {
       // Only send landmarks if hands are detected
+      let flat = null;
       if (all.length > 0) {
-        const flat = [];
+        flat = new Float32Array(LANDMARK_VALUES);
+        let k = 0;
         for (let h = 0; h < Math.min(2, all.length); h++) {
           const lm = all[h];
-          for (let i = 0; i < lm.length; i++) {
-            flat.push(lm[i].x, lm[i].y, lm[i].z ?? 0);
+          for (let i = 0; i < lm.length && k + 3 <= LANDMARK_VALUES; i++) {
+            flat[k++] = lm[i].x; flat[k++] = lm[i].y; flat[k++] = lm[i].z ?? 0;
           }
         }
-        while (flat.length < 126) flat.push(0);
+      }
 
+      if (quantEncoderRef.current) {
+        // Low-bandwidth mode: one small quantized frame per sample
         if (wsASLRef.current && wsASLRef.current.readyState === WebSocket.OPEN) {
-          wsASLRef.current.send(JSON.stringify({ type: 'landmarks', landmarks: flat.slice(0, 126), has_hands: true }));
+          wsASLRef.current.send(quantEncoderRef.current.encode(landmarkSeqRef.current++, flat));
         }
-      } else {
-        // No hands detected - send signal to reset prediction
+        lastSentLandmarksRef.current = now;
+        return;
+      }
+
+      // Queue frames and send them together; a frame without hands
+      // (which resets the server's buffer) is flushed right away
+      const pending = pendingFramesRef.current;
+      pending.push({ t: Date.now(), landmarks: flat });
+      if (pending.length >= LANDMARK_BATCH_FRAMES || !flat) {
         if (wsASLRef.current && wsASLRef.current.readyState === WebSocket.OPEN) {
-          wsASLRef.current.send(JSON.stringify({ type: 'landmarks', landmarks: [], has_hands: false }));
+          wsASLRef.current.send(encodeLandmarkBatch(landmarkSeqRef.current, pending));
         }
+        landmarkSeqRef.current += pending.length;
+        pendingFramesRef.current = [];
       }
       lastSentLandmarksRef.current = now;
     }
@@ -122,7 +273,10 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
     const start = async () => {
       try {
         const cam = new Camera(localVideoRef.current, {
-          onFrame: async () => { await handsRef.current.send({ image: localVideoRef.current }); },
+          onFrame: async () => {
+            if (thinClient) drawPlainFrame();
+            else await handsRef.current.send({ image: localVideoRef.current });
+          },
           width: 640, height: 480
         });
         cameraRef.current = cam;
@@ -135,33 +289,63 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
     };
     start();
     return () => { try { cameraRef.current?.stop() } catch {} };
-  }, [joined, videoActive]);
+  }, [joined, videoActive, thinClient]);
 
   useEffect(() => {
-    if (!joined || !videoActive) return;
-    const wsUrl = `${WS_BASE}/ws/video/${displayTargetId}/?self=${displayMyId}`;
-    const ws = new WebSocket(wsUrl);
+    if (!joined) return;
+    const params = new URLSearchParams({ self: displayMyId });
+    const connection = createMuxConnection(`${WS_BASE}/ws/mux/${encodeURIComponent(displayTargetId)}/?${params}`);
+    setMux(connection);
+    return () => { connection.close(); setMux(null); };
+  }, [joined, displayTargetId, displayMyId]);
+
+  useEffect(() => {
+    if (!joined || !videoActive || !mux) return;
+    // Server extraction needs the frames, so thin clients stay on relayed video
+    const ws = mux.openStream(STREAM_VIDEO, thinClient ? { frames: 'binary', acks: 1, extract: 1 } : { frames: 'binary', acks: 1, webrtc: 1 });
     wsVideoRef.current = ws;
+    videoControlRef.current = DEFAULT_VIDEO_CONTROL;
     ws.onopen = () => startSendingFrames();
+    // The server sends the next frame once this one is drawn (?acks=1)
+    const ack = () => sendSignal({ type: 'ack' });
     ws.onmessage = (evt) => {
+      if (evt.data instanceof ArrayBuffer) {
+        if (new DataView(evt.data).getUint8(0) === FRAME_VIDEO) {
+          displayRemoteFrame(new Blob([evt.data.slice(VIDEO_HEADER_BYTES)], { type: 'image/jpeg' }), ack);
+        }
+        return;
+      }
       try {
         const data = JSON.parse(evt.data);
-        if (data.type === 'frame' && data.frame_data) displayRemoteFrame(data.frame_data);
+        if (data.type === 'frame' && data.frame_data) displayRemoteFrame(data.frame_data, ack);
+        else if (data.type === 'video_control') {
+          videoControlRef.current = { scale: data.scale, quality: data.quality, fps: data.fps };
+        } else {
+          handleSignal(data);
+        }
       } catch (err) {}
     };
     ws.onerror = () => setError('Video connection failed');
-    return () => { if (ws && ws.readyState === WebSocket.OPEN) ws.close(); };
-  }, [joined, videoActive, displayTargetId, displayMyId]);
+    return () => {
+      closePeerConnection();
+      ws.close();
+    };
+  }, [joined, videoActive, mux, thinClient]);
 
   useEffect(() => {
-    if (!joined || !videoActive) return;
-    const wsUrl = `${WS_BASE}/ws/asl/`;
-    const ws = new WebSocket(wsUrl);
+    if (!joined || !videoActive || !mux) return;
+    // The mux adds self and target
+    const ws = mux.openStream(STREAM_ASL, prefersLowBandwidth() ? { encoding: 'q16' } : {});
     wsASLRef.current = ws;
+    quantEncoderRef.current = null;
     ws.onmessage = (evt) => {
       try {
         const data = JSON.parse(evt.data);
-        if (data.type === 'prediction') {
+        if (data.type === 'connection') {
+          quantEncoderRef.current = data.encoding === 'q16' ? createQuantizedEncoder() : null;
+        } else if (data.type === 'keyframe_request') {
+          quantEncoderRef.current?.requestKeyframe();
+        } else if (data.type === 'prediction') {
           setLocalPrediction({ label: data.label, confidence: data.confidence });
           window.dispatchEvent(new CustomEvent('asl-prediction-local', {
             detail: { label: data.label, confidence: data.confidence }
@@ -169,15 +353,12 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
         }
       } catch (err) {}
     };
-    return () => { if (ws && ws.readyState === WebSocket.OPEN) ws.close(); };
-  }, [joined, videoActive]);
+    return () => ws.close();
+  }, [joined, videoActive, mux]);
 
   useEffect(() => {
-    if (!joined) return;
-    const qs = `?self=${encodeURIComponent(displayMyId)}`;
-    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const BACKEND_HOST_STR = window.location.hostname === 'localhost' ? '127.0.0.1' : window.location.hostname;
-    const sock = new WebSocket(`${protocol}//${BACKEND_HOST_STR}:8000/ws/chat/${encodeURIComponent(displayTargetId)}/${qs}`);
+    if (!joined || !mux) return;
+    const sock = mux.openStream(STREAM_CHAT);
     
     sock.onopen = () => setChat([{ sys: true, text: 'Chat connected' }]);
     sock.onclose = () => setChat(c => [...c, { sys: true, text: 'Chat disconnected' }]);
@@ -194,8 +375,72 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
       } catch {}
     };
     setWs(sock);
-    return () => { if (sock && sock.readyState === WebSocket.OPEN) sock.close(); };
-  }, [joined, displayTargetId, displayMyId]);
+    return () => sock.close();
+  }, [joined, mux]);
+
+  const sendSignal = (message) => {
+    const sock = wsVideoRef.current;
+    if (sock && sock.readyState === WebSocket.OPEN) sock.send(JSON.stringify(message));
+  };
+
+  const closePeerConnection = () => {
+    if (peerConnectionRef.current) peerConnectionRef.current.close();
+    peerConnectionRef.current = null;
+    p2pActiveRef.current = false;
+    setP2pActive(false);
+  };
+
+  const createPeerConnection = (peerId) => {
+    closePeerConnection();
+    const pc = new RTCPeerConnection({ iceServers: ICE_SERVERS });
+    peerConnectionRef.current = pc;
+    // Same annotated canvas the relayed frames are taken from
+    const stream = localCanvasRef.current.captureStream(P2P_FPS);
+    stream.getTracks().forEach(track => pc.addTrack(track, stream));
+    pc.onicecandidate = (evt) => {
+      if (evt.candidate) sendSignal({ type: 'ice', to: peerId, candidate: evt.candidate.toJSON() });
+    };
+    pc.ontrack = (evt) => {
+      if (remoteMediaRef.current) remoteMediaRef.current.srcObject = evt.streams[0];
+    };
+    pc.onconnectionstatechange = () => {
+      if (peerConnectionRef.current !== pc) return;
+      // Pause relayed frames while connected; resume them if the link fails
+      p2pActiveRef.current = pc.connectionState === 'connected';
+      setP2pActive(p2pActiveRef.current);
+    };
+    return pc;
+  };
+
+  const handleSignal = async (data) => {
+    try {
+      if (data.type === 'peer' && data.webrtc) {
+        // The lower id makes the offer (the server resolves any glare the same way)
+        if (displayMyId < data.peer_id && localCanvasRef.current) {
+          const pc = createPeerConnection(data.peer_id);
+          await pc.setLocalDescription(await pc.createOffer());
+          sendSignal({ type: 'offer', to: data.peer_id, sdp: pc.localDescription.sdp });
+        }
+      } else if (data.type === 'offer') {
+        if (peerConnectionRef.current?.signalingState === 'have-local-offer') {
+          await peerConnectionRef.current.setLocalDescription({ type: 'rollback' });
+        }
+        const pc = peerConnectionRef.current || createPeerConnection(data.from);
+        await pc.setRemoteDescription({ type: 'offer', sdp: data.sdp });
+        await pc.setLocalDescription(await pc.createAnswer());
+        sendSignal({ type: 'answer', to: data.from, sdp: pc.localDescription.sdp });
+      } else if (data.type === 'answer') {
+        await peerConnectionRef.current?.setRemoteDescription({ type: 'answer', sdp: data.sdp });
+      } else if (data.type === 'ice') {
+        await peerConnectionRef.current?.addIceCandidate(data.candidate);
+      } else if (data.type === 'hangup' || data.type === 'peer_left') {
+        closePeerConnection();
+      }
+    } catch (err) {
+      // Negotiation failed: stay on relayed frames
+      closePeerConnection();
+    }
+  };
 
   const startSendingFrames = () => {
     const send = () => {
@@ -203,31 +448,75 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
         requestAnimationFrame(send);
         return;
       }
+      if (p2pActiveRef.current) {
+        requestAnimationFrame(send);
+        return;
+      }
       const now = Date.now();
-      if (now - lastVideoSentRef.current < 150) {
+      const { scale, quality, fps } = videoControlRef.current;
+      if (now - lastVideoSentRef.current < 1000 / fps) {
         requestAnimationFrame(send);
         return;
       }
+      if (videoEncodingRef.current) {
+        // Previous JPEG is still being encoded
+        requestAnimationFrame(send);
+        return;
+      }
+      lastVideoSentRef.current = now;
+      videoEncodingRef.current = true;
       try {
-        const frameData = localCanvasRef.current.toDataURL('image/jpeg', 0.5);
-        wsVideoRef.current.send(JSON.stringify({ type: 'frame', frame_data: frameData }));
-        lastVideoSentRef.current = now;
-      } catch (err) {}
+        let source = localCanvasRef.current;
+        if (scale < 1 && source.width) {
+          const scaled = scaledCanvasRef.current || (scaledCanvasRef.current = document.createElement('canvas'));
+          scaled.width = Math.round(source.width * scale);
+          scaled.height = Math.round(source.height * scale);
+          scaled.getContext('2d').drawImage(source, 0, 0, scaled.width, scaled.height);
+          source = scaled;
+        }
+        source.toBlob(async (blob) => {
+          try {
+            const sock = wsVideoRef.current;
+            if (!blob || !sock || sock.readyState !== WebSocket.OPEN) return;
+            const jpeg = new Uint8Array(await blob.arrayBuffer());
+            const frame = new Uint8Array(VIDEO_HEADER_BYTES + jpeg.length);
+            const view = new DataView(frame.buffer);
+            view.setUint8(0, FRAME_VIDEO);
+            view.setUint32(4, videoSeqRef.current++ >>> 0, true);
+            frame.set(jpeg, VIDEO_HEADER_BYTES);
+            sock.send(frame.buffer);
+          } catch (err) {
+          } finally {
+            videoEncodingRef.current = false;
+          }
+        }, 'image/jpeg', quality);
+      } catch (err) {
+        videoEncodingRef.current = false;
+      }
       requestAnimationFrame(send);
     };
     requestAnimationFrame(send);
   };
 
-  const displayRemoteFrame = (frameDataUrl) => {
-    if (!remoteVideoRef.current) return;
+  // Accepts a JPEG Blob (binary frames) or a data URL (legacy JSON frames);
+  // onDone runs once the frame is drawn or failed to decode
+  const displayRemoteFrame = (frame, onDone = () => {}) => {
+    if (!remoteVideoRef.current) return onDone();
     const img = new Image();
-    img.src = frameDataUrl;
+    const objectUrl = frame instanceof Blob ? URL.createObjectURL(frame) : null;
+    img.src = objectUrl || frame;
+    img.onerror = () => {
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+      onDone();
+    };
     img.onload = () => {
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
       remoteVideoRef.current.width = img.width;
       remoteVideoRef.current.height = img.height;
       const ctx = remoteVideoRef.current.getContext('2d');
       ctx.clearRect(0, 0, remoteVideoRef.current.width, remoteVideoRef.current.height);
       ctx.drawImage(img, 0, 0);
+      onDone();
     };
   };
 
@@ -269,7 +558,9 @@ export default function UnifiedVideoChat({ initialMyId = '', initialTargetId = '
           ) : (
             <>
               {/* Remote Video (Big) */}
-              <canvas ref={remoteVideoRef} className="remote-video" />
+              <canvas ref={remoteVideoRef} className="remote-video" style={{ display: p2pActive ? 'none' : undefined }} />
+              <video ref={remoteMediaRef} className="remote-video" autoPlay playsInline muted
+                style={{ display: p2pActive ? undefined : 'none' }} />
               
               {/* Local Video (PIP) */}
               <div className="local-pip">
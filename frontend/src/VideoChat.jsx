@@ -14,6 +14,8 @@ export default function VideoChat({ targetId, myId, isConnected }) {
   const [wsStatus, setWsStatus] = useState('idle');
   const canvasRef = useRef(null);
   const animationFrameRef = useRef(null);
+  // Adjusted by the server's video_control messages when the peer lags
+  const videoControlRef = useRef({ scale: 1.0, quality: 0.7, fps: 10 });
 
   // Start local video stream
   useEffect(() => {
@@ -62,7 +64,7 @@ export default function VideoChat({ targetId, myId, isConnected }) {
       return;
     }
 
-    const wsUrl = `${WS_PROTOCOL}//${BACKEND_HOST}:8000/ws/video/${targetId}/?self=${myId}`;
+    const wsUrl = `${WS_PROTOCOL}//${BACKEND_HOST}:8000/ws/video/${targetId}/?self=${myId}&acks=1`;
     console.log('Connecting to WebSocket:', wsUrl);
     
     const ws = new WebSocket(wsUrl);
@@ -78,7 +80,12 @@ export default function VideoChat({ targetId, myId, isConnected }) {
       try {
         const data = JSON.parse(event.data);
         if (data.type === 'frame' && data.frame_data) {
-          displayRemoteFrame(data.frame_data);
+          // The server sends the next frame once this one is drawn
+          displayRemoteFrame(data.frame_data, () => {
+            if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: 'ack' }));
+          });
+        } else if (data.type === 'video_control') {
+          videoControlRef.current = { scale: data.scale, quality: data.quality, fps: data.fps };
         }
       } catch (err) {
         console.error('Video message error:', err);
@@ -110,7 +117,6 @@ export default function VideoChat({ targetId, myId, isConnected }) {
   const startSendingFrames = () => {
     console.log('Starting frame transmission...');
     let lastSendTime = 0;
-    const MIN_FRAME_INTERVAL = 100; // ~10 FPS
     
     const sendFrame = () => {
       if (!localVideoRef.current || !wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) {
@@ -122,7 +128,8 @@ export default function VideoChat({ targetId, myId, isConnected }) {
       }
 
       const now = Date.now();
-      if (now - lastSendTime < MIN_FRAME_INTERVAL) {
+      const { scale, quality, fps } = videoControlRef.current;
+      if (now - lastSendTime < 1000 / fps) {
         animationFrameRef.current = requestAnimationFrame(sendFrame);
         return;
       }
@@ -137,12 +144,12 @@ export default function VideoChat({ targetId, myId, isConnected }) {
 
       try {
         const ctx = canvas.getContext('2d');
-        canvas.width = video.videoWidth;
-        canvas.height = video.videoHeight;
-        ctx.drawImage(video, 0, 0);
+        canvas.width = Math.round(video.videoWidth * scale);
+        canvas.height = Math.round(video.videoHeight * scale);
+        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
         // Send as base64
-        const frameData = canvas.toDataURL('image/jpeg', 0.7);
+        const frameData = canvas.toDataURL('image/jpeg', quality);
         wsRef.current.send(JSON.stringify({
           type: 'frame',
           frame_data: frameData
@@ -158,7 +165,7 @@ export default function VideoChat({ targetId, myId, isConnected }) {
     animationFrameRef.current = requestAnimationFrame(sendFrame);
   };
 
-  const displayRemoteFrame = (frameDataUrl) => {
+  const displayRemoteFrame = (frameDataUrl, onDone = () => {}) => {
     if (remoteVideoRef.current) {
       const img = new Image();
       img.src = frameDataUrl;
@@ -168,10 +175,14 @@ export default function VideoChat({ targetId, myId, isConnected }) {
         const ctx = remoteVideoRef.current.getContext('2d');
         ctx.clearRect(0, 0, remoteVideoRef.current.width, remoteVideoRef.current.height);
         ctx.drawImage(img, 0, 0);
+        onDone();
       };
       img.onerror = () => {
         console.error('Failed to load frame image');
+        onDone();
       };
+    } else {
+      onDone();
     }
   };
 
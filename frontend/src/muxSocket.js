@@ -0,0 +1,119 @@
+// One WebSocket carrying the ASL, chat and video streams (see
+// rtslt/translator/mux.py). Every frame is [stream id u8][flags u8] followed
+// by the stream's own message; stream 0 is JSON control.
+export const STREAM_CONTROL = 0
+export const STREAM_ASL = 1
+export const STREAM_CHAT = 2
+export const STREAM_VIDEO = 3
+const FLAG_TEXT = 0x01
+const MUX_HEADER_BYTES = 2
+
+const textEncoder = new TextEncoder()
+const textDecoder = new TextDecoder()
+
+const encodeFrame = (streamId, data) => {
+  const text = typeof data === 'string'
+  const payload = text ? textEncoder.encode(data)
+    : data instanceof ArrayBuffer ? new Uint8Array(data)
+    : new Uint8Array(data.buffer, data.byteOffset, data.byteLength)
+  const frame = new Uint8Array(MUX_HEADER_BYTES + payload.length)
+  frame[0] = streamId
+  frame[1] = text ? FLAG_TEXT : 0
+  frame.set(payload, MUX_HEADER_BYTES)
+  return frame.buffer
+}
+
+// The part of the WebSocket API the components use, for one stream
+class MuxStream {
+  constructor(connection, id) {
+    this.connection = connection
+    this.id = id
+    this.closed = false
+    this.onopen = null
+    this.onmessage = null
+    this.onclose = null
+    this.onerror = null
+  }
+
+  get readyState() {
+    return this.closed ? WebSocket.CLOSED : this.connection.socket.readyState
+  }
+
+  send(data) {
+    this.connection.socket.send(encodeFrame(this.id, data))
+  }
+
+  close() {
+    if (this.closed) return
+    this.connection.closeStream(this.id)
+  }
+}
+
+export function createMuxConnection(url) {
+  const socket = new WebSocket(url)
+  socket.binaryType = 'arraybuffer'
+  const streams = new Map()
+  const pendingControl = []
+  // Closes we asked for; the server's 'closed' for them is not news
+  const requestedCloses = new Map()
+
+  const control = (message) => {
+    if (socket.readyState === WebSocket.OPEN) socket.send(encodeFrame(STREAM_CONTROL, JSON.stringify(message)))
+    else if (socket.readyState === WebSocket.CONNECTING) pendingControl.push(message)
+  }
+
+  const detach = (id) => {
+    const stream = streams.get(id)
+    if (!stream) return
+    stream.closed = true
+    streams.delete(id)
+    stream.onclose?.()
+  }
+
+  const connection = {
+    socket,
+    openStream(id, params = {}) {
+      const stream = new MuxStream(connection, id)
+      streams.set(id, stream)
+      control({ type: 'open', stream: id, params })
+      // Let the caller attach onopen first
+      if (socket.readyState === WebSocket.OPEN) setTimeout(() => { if (!stream.closed) stream.onopen?.() }, 0)
+      return stream
+    },
+    closeStream(id) {
+      requestedCloses.set(id, (requestedCloses.get(id) || 0) + 1)
+      control({ type: 'close', stream: id })
+      detach(id)
+    },
+    close() {
+      socket.close()
+    },
+  }
+
+  socket.onopen = () => {
+    pendingControl.splice(0).forEach(control)
+    streams.forEach(stream => stream.onopen?.())
+  }
+  socket.onmessage = (evt) => {
+    const bytes = new Uint8Array(evt.data)
+    const id = bytes[0]
+    const data = bytes[1] & FLAG_TEXT
+      ? textDecoder.decode(bytes.subarray(MUX_HEADER_BYTES))
+      : evt.data.slice(MUX_HEADER_BYTES)
+    if (id !== STREAM_CONTROL) {
+      streams.get(id)?.onmessage?.({ data })
+      return
+    }
+    const message = JSON.parse(data)
+    if (message.type === 'closed') {
+      const requested = requestedCloses.get(message.stream) || 0
+      if (requested) requestedCloses.set(message.stream, requested - 1)
+      else detach(message.stream)
+    } else if (message.type === 'error') {
+      console.warn('Mux error:', message.message)
+    }
+  }
+  socket.onerror = (evt) => streams.forEach(stream => stream.onerror?.(evt))
+  socket.onclose = () => [...streams.keys()].forEach(detach)
+  return connection
+}
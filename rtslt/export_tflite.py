@@ -0,0 +1,145 @@
+"""
+Export the trained LSTM model to TFLite - CONVERSION SCRIPT
+Run this after train_improved_lstm.py to produce a quantized model for
+CPU-only inference nodes:
+
+    python export_tflite.py --mode dynamic   # int8 weights, float activations
+    python export_tflite.py --mode int8      # int8 activations where possible
+    python export_tflite.py --mode float16   # float16 weights
+
+--mode int8 calibrates activations on a representative dataset and runs
+every op that has an int8 kernel in int8. Ops without one (the LSTM often
+falls in this group) stay float, and so do the model's input and output, so
+the result is mixed int8/float rather than fully integer.
+
+The accuracy of the exported model is compared against the float Keras
+model on the held-out windows train_improved_lstm.py saved next to the
+model (<model>_split.npz).
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from ml_models.tflite_backend import TFLiteModel
+
+
+def load_split(split_path):
+    """(calibration windows, test windows, test labels) saved by train_improved_lstm.py"""
+    if not os.path.exists(split_path):
+        raise FileNotFoundError(
+            f'{split_path} not found; retrain with train_improved_lstm.py to save the held-out split'
+        )
+    split = np.load(split_path)
+    return split['X_calibration'], split['X_test'], split['y_test']
+
+
+def representative_dataset(X_calibration):
+    """Calibration windows for int8 quantization"""
+    def gen():
+        for i in range(len(X_calibration)):
+            yield [X_calibration[i:i + 1]]
+    return gen
+
+
+def convert(model, mode='dynamic', rep_data=None):
+    """Convert a Keras model to a TFLite flatbuffer"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if mode in ('dynamic', 'int8', 'float16'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'int8':
+        if rep_data is None:
+            raise ValueError('int8 quantization needs a representative dataset')
+        converter.representative_dataset = rep_data
+        # Float kernels stay available for ops without an int8 one
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+        ]
+    elif mode != 'float32':
+        raise ValueError(f'Unknown quantization mode: {mode}')
+    return converter.convert()
+
+
+def evaluate(predict_fn, X, y, batch_size=64):
+    """Accuracy and mean per-window latency (ms)"""
+    preds = []
+    start = time.perf_counter()
+    for i in range(0, len(X), batch_size):
+        preds.append(np.asarray(predict_fn(X[i:i + batch_size])))
+    elapsed = time.perf_counter() - start
+    y_pred = np.argmax(np.concatenate(preds), axis=1)
+    return float((y_pred == y).mean()), elapsed * 1000 / max(len(X), 1)
+
+
+def single_window_latency(predict_fn, X, runs=200):
+    """Mean latency (ms) of batch-1 calls, the realtime path"""
+    window = X[:1]
+    predict_fn(window)
+    start = time.perf_counter()
+    for _ in range(runs):
+        predict_fn(window)
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def export_tflite(model_path, mode='dynamic', output_path=None, split_path=None):
+    output_path = output_path or model_path.replace('.h5', f'_{mode}.tflite')
+    split_path = split_path or model_path.replace('.h5', '_split.npz')
+
+    print("\n" + "="*70)
+    print(f"TFLITE EXPORT ({mode})")
+    print("="*70)
+
+    model = keras.models.load_model(model_path)
+    X_calibration, X_test, y_test = load_split(split_path)
+    print(f"Held-out sequences: {len(X_test)}")
+
+    rep_data = representative_dataset(X_calibration) if mode == 'int8' else None
+    tflite_bytes = convert(model, mode, rep_data)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_bytes)
+
+    tflite_model = TFLiteModel(output_path)
+
+    keras_acc, _ = evaluate(model.predict_on_batch, X_test, y_test)
+    tflite_acc, _ = evaluate(tflite_model.predict_on_batch, X_test, y_test)
+    keras_ms = single_window_latency(model.predict_on_batch, X_test)
+    tflite_ms = single_window_latency(tflite_model.predict_on_batch, X_test)
+
+    keras_size = os.path.getsize(model_path) / 1024 / 1024
+    tflite_size = len(tflite_bytes) / 1024 / 1024
+
+    print(f"\n{'':<10}{'accuracy':>12}{'latency (ms)':>16}{'size (MB)':>12}")
+    print(f"{'keras':<10}{keras_acc:>12.4f}{keras_ms:>16.2f}{keras_size:>12.2f}")
+    print(f"{'tflite':<10}{tflite_acc:>12.4f}{tflite_ms:>16.2f}{tflite_size:>12.2f}")
+    print(f"\nAccuracy delta (tflite - keras): {tflite_acc - keras_acc:+.4f}")
+    print(f"✓ TFLite model saved to: {output_path}")
+
+    return {
+        'mode': mode,
+        'output_path': output_path,
+        'keras_accuracy': keras_acc,
+        'tflite_accuracy': tflite_acc,
+        'accuracy_delta': tflite_acc - keras_acc,
+        'keras_latency_ms': keras_ms,
+        'tflite_latency_ms': tflite_ms,
+        'keras_size_mb': keras_size,
+        'tflite_size_mb': tflite_size,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the LSTM model to TFLite')
+    parser.add_argument('--model', default='ml_models/saved_models/lstm_model.h5')
+    parser.add_argument('--split', default=None, help='held-out split (default: <model>_split.npz)')
+    parser.add_argument('--mode', default='dynamic', choices=['float32', 'dynamic', 'float16', 'int8'])
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    export_tflite(args.model, mode=args.mode, output_path=args.output, split_path=args.split)
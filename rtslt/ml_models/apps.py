@@ -1,6 +1,17 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MlModelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_models'
+
+    def ready(self):
+        # Dedicated inference workers load the model at startup (in the
+        # background) instead of on the first ASL connection; every other
+        # worker leaves the ML stack unimported.
+        if getattr(settings, 'ASL_PRELOAD_MODEL', False):
+            from .session import preload
+            threading.Thread(target=preload, args=(settings,), name='asl-preload', daemon=True).start()
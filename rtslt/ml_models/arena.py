@@ -0,0 +1,106 @@
+"""
+Preallocated per-session landmark buffers
+
+All ASL sessions in a process share one float32 arena instead of each
+keeping a Python list of frames. Each slot is a ring buffer written twice
+(at i and i + seq_len), so the newest window is always the contiguous
+slice [head, head + seq_len) and can be read as a view without copying.
+Pushing a frame normalizes it straight into the arena: no per-frame heap
+allocation and a fixed memory ceiling of
+max_sessions * 2 * seq_len * features * 4 bytes.
+"""
+
+import threading
+
+import numpy as np
+
+
+class ArenaFullError(RuntimeError):
+    """Raised when every session slot is in use"""
+
+
+class SessionArena:
+    """Fixed-size pool of per-session sequence ring buffers"""
+
+    def __init__(self, max_sessions=256, seq_len=10, features=126, scale=2.0, offset=-1.0):
+        self.max_sessions = max_sessions
+        self.seq_len = seq_len
+        self.features = features
+        # Landmark normalization applied on write: x * scale + offset
+        self.scale = scale
+        self.offset = offset
+        self.buffer = np.zeros((max_sessions, 2 * seq_len, features), dtype=np.float32)
+        # Next write position (also the oldest frame) and frames written
+        self.heads = np.zeros(max_sessions, dtype=np.int64)
+        self.counts = np.zeros(max_sessions, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._free = list(range(max_sessions - 1, -1, -1))
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    @property
+    def active_sessions(self):
+        return self.max_sessions - len(self._free)
+
+    def acquire(self):
+        """Reserve a slot for a new session"""
+        with self._lock:
+            if not self._free:
+                raise ArenaFullError(f'All {self.max_sessions} session slots are in use')
+            slot = self._free.pop()
+        self.reset(slot)
+        return slot
+
+    def release(self, slot):
+        with self._lock:
+            self._free.append(slot)
+
+    def reset(self, slot):
+        self.heads[slot] = 0
+        self.counts[slot] = 0
+
+    def push(self, slot, frame):
+        """Normalize one frame into the slot; True once a full window is ready"""
+        if frame.size != self.features:
+            raise ValueError(f'Expected {self.features} landmark values, got {frame.size}')
+        head = self.heads[slot]
+        row = self.buffer[slot, head]
+        np.multiply(frame.reshape(-1), self.scale, out=row, casting='unsafe')
+        row += self.offset
+        self.buffer[slot, head + self.seq_len] = row
+        self.heads[slot] = (head + 1) % self.seq_len
+        if self.counts[slot] < self.seq_len:
+            self.counts[slot] += 1
+        return self.counts[slot] >= self.seq_len
+
+    def ready(self, slot):
+        return self.counts[slot] >= self.seq_len
+
+    def window(self, slot):
+        """Newest (seq_len, features) window as a view into the arena"""
+        head = self.heads[slot]
+        return self.buffer[slot, head:head + self.seq_len]
+
+    def gather(self, slots, out=None):
+        """Copy the windows of several sessions into one batch array"""
+        if out is None:
+            out = np.empty((len(slots), self.seq_len, self.features), dtype=np.float32)
+        for i, slot in enumerate(slots):
+            head = self.heads[slot]
+            out[i] = self.buffer[slot, head:head + self.seq_len]
+        return out
+
+
+_arena = None
+_arena_lock = threading.Lock()
+
+
+def get_session_arena(max_sessions=256, seq_len=10, features=126, scale=2.0, offset=-1.0):
+    """Process-wide arena shared by every ASL session"""
+    global _arena
+    with _arena_lock:
+        if _arena is None:
+            _arena = SessionArena(max_sessions, seq_len, features, scale, offset)
+        return _arena
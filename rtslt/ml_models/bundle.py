@@ -0,0 +1,156 @@
+"""
+Self-describing model bundle (.aslb) loaded with a single mmap
+
+One file holds everything a worker needs to serve predictions: the
+BatchNorm-folded NumPy engine weights, the class list, the sequence length,
+the feature count and the landmark normalization. Loading maps the file
+once and exposes every weight as a read-only array view into the mapping,
+so there is no pickle, no sklearn LabelEncoder and no per-worker copy of
+the weights (the page cache is shared by every process that maps it).
+
+Layout:
+    b'ASLB' | u32 version | u32 header length | JSON header | arrays
+Each array starts on a 64-byte boundary; the header records its offset,
+dtype and shape.
+
+Build from an exported .npz (or straight from the .h5, which needs
+TensorFlow):
+    python -m ml_models.bundle ml_models/saved_models/lstm_model.npz
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from .numpy_engine import NumpyLSTMModel, flatten_layers, unflatten_layers, load_numpy_model
+from .registry import SharedModel
+
+MAGIC = b'ASLB'
+VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<4sII')
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_bundle(path, layers, classes, sequence_length=10, features=126, scale=2.0, offset=-1.0):
+    """Write engine layers and metadata to a bundle file"""
+    spec, arrays = flatten_layers(layers)
+    arrays = {name: np.ascontiguousarray(a, dtype=np.float32) for name, a in arrays.items()}
+
+    header = {
+        'version': VERSION,
+        'classes': [str(c) for c in classes],
+        'sequence_length': int(sequence_length),
+        'features': int(features),
+        'normalization': {'scale': float(scale), 'offset': float(offset)},
+        'model': {'engine': 'numpy_lstm', 'spec': spec},
+        'arrays': {},
+    }
+    # Offsets depend on the header size, which depends on the offsets, so
+    # lay out the arrays relative to a padded header and iterate once
+    header_room = _align(len(json.dumps(header)) + 128 * (len(arrays) + 1))
+    position = _align(_PREAMBLE.size + header_room)
+    for name, a in arrays.items():
+        header['arrays'][name] = {'offset': position, 'dtype': 'float32', 'shape': list(a.shape)}
+        position = _align(position + a.nbytes)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    if len(header_bytes) > header_room:
+        raise ValueError('Bundle header larger than reserved space')
+
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, a in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            f.write(a.tobytes())
+        f.truncate(position)
+    return path
+
+
+class ModelBundle:
+    """Memory-mapped bundle; arrays are zero-copy views into the file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an ASL model bundle')
+        if version > VERSION:
+            raise ValueError(f'Unsupported bundle version {version} (max {VERSION})')
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_len].decode('utf-8'))
+
+        self.arrays = {}
+        for name, info in self.header['arrays'].items():
+            shape = tuple(info['shape'])
+            count = int(np.prod(shape)) if shape else 1
+            self.arrays[name] = np.frombuffer(
+                self._mmap, dtype=info['dtype'], count=count, offset=info['offset']
+            ).reshape(shape)
+
+        self.classes = self.header['classes']
+        self.sequence_length = self.header['sequence_length']
+        self.features = self.header['features']
+        self.scale = self.header['normalization']['scale']
+        self.offset = self.header['normalization']['offset']
+
+    def build_model(self):
+        layers = unflatten_layers(self.header['model']['spec'], self.arrays)
+        return NumpyLSTMModel(layers, classes=self.classes)
+
+    def shared_model(self, model_type='lstm'):
+        shared = SharedModel(
+            self.build_model(), model_type, classes=self.classes,
+            sequence_length=self.sequence_length, features=self.features,
+            scale=self.scale, offset=self.offset,
+        )
+        # Keep the mapping alive as long as the model uses its views
+        shared.bundle = self
+        return shared
+
+
+def load_bundle(path, model_type='lstm'):
+    return ModelBundle(path).shared_model(model_type)
+
+
+def input_features(layers):
+    """Width of the model input, from the first layer that fixes it"""
+    for layer in layers:
+        if layer['kind'] == 'affine':
+            return len(layer['scale'])
+        kernel = layer.get('kernel', layer.get('forward', {}).get('kernel'))
+        if kernel is not None:
+            return kernel.shape[0]
+    raise ValueError('No layer fixes the input size of this model')
+
+
+def build_bundle(model_path, output_path=None, classes=None, sequence_length=10):
+    """Create a bundle from an exported .npz or a Keras .h5"""
+    if model_path.endswith('.h5'):
+        from .numpy_engine import export_h5
+        model_path, _ = export_h5(model_path)
+    model = load_numpy_model(model_path)
+    classes = classes or model.classes
+    if not classes:
+        raise ValueError('No class list available; export with the label encoder present')
+    features = input_features(model.layers)
+    output_path = output_path or os.path.splitext(model_path)[0] + '.aslb'
+    write_bundle(output_path, model.layers, classes, sequence_length=sequence_length, features=features)
+    print(f"✓ Bundle written to {output_path} ({os.path.getsize(output_path) / 1024 / 1024:.2f} MB, {len(classes)} classes)")
+    return output_path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python -m ml_models.bundle <model.npz|model.h5> [output.aslb]")
+        sys.exit(1)
+    build_bundle(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,133 @@
+"""
+Cheap-first prediction cascade
+
+A single-frame MLP (baseline_mlp.pkl from train_baseline.py) screens every
+frame with a few small matmuls. The sequence model is only invoked when the
+MLP is unsure (top probability below the threshold) or disagrees with the
+session's current stable label; otherwise the MLP's probabilities, mapped
+into the sequence model's class order, go straight to the smoothing logic.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _logistic(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+MLP_ACTIVATIONS = {
+    'identity': lambda x: x,
+    'relu': _relu,
+    'tanh': np.tanh,
+    'logistic': _logistic,
+    'softmax': _softmax,
+}
+
+
+class NumpyMLP:
+    """Vectorized forward pass of a fitted sklearn MLPClassifier"""
+
+    def __init__(self, coefs, intercepts, activation='relu', out_activation='softmax'):
+        self.coefs = [np.asarray(w, dtype=np.float32) for w in coefs]
+        self.intercepts = [np.asarray(b, dtype=np.float32) for b in intercepts]
+        self.activation = MLP_ACTIVATIONS[activation]
+        self.out_activation = MLP_ACTIVATIONS[out_activation]
+        self.n_features = self.coefs[0].shape[0]
+
+    @classmethod
+    def from_sklearn(cls, mlp):
+        return cls(mlp.coefs_, mlp.intercepts_, mlp.activation, mlp.out_activation_)
+
+    def predict_proba(self, x):
+        """(batch, features) -> (batch, classes) probabilities"""
+        h = np.asarray(x, dtype=np.float32).reshape(-1, self.n_features)
+        last = len(self.coefs) - 1
+        for i, (w, b) in enumerate(zip(self.coefs, self.intercepts)):
+            h = h @ w + b
+            h = self.out_activation(h) if i == last else self.activation(h)
+        if h.shape[1] == 1:
+            # Binary classifiers output P(class 1) only
+            h = np.hstack([1.0 - h, h])
+        return h
+
+
+class CascadeStats:
+    """Accept/escalate counts and end-to-end decision latency.
+
+    Escalated frames the motion gate answered from its cache, without the
+    sequence model, are counted as reused instead.
+    """
+
+    def __init__(self, window=1000):
+        self.accepted = 0
+        self.escalated = 0
+        self.reused = 0
+        self.accept_latency_ms = deque(maxlen=window)
+        self.escalate_latency_ms = deque(maxlen=window)
+        self.reuse_latency_ms = deque(maxlen=window)
+
+    def record(self, escalated, latency_ms):
+        if escalated:
+            self.escalated += 1
+            self.escalate_latency_ms.append(latency_ms)
+        else:
+            self.accepted += 1
+            self.accept_latency_ms.append(latency_ms)
+
+    def record_reuse(self, latency_ms):
+        self.reused += 1
+        self.reuse_latency_ms.append(latency_ms)
+
+    def as_dict(self):
+        total = self.accepted + self.escalated + self.reused
+
+        def mean(values):
+            return round(float(np.mean(values)), 3) if values else 0.0
+
+        return {
+            'screened': total,
+            'accept_rate': round(self.accepted / total, 4) if total else 0.0,
+            'escalate_rate': round(self.escalated / total, 4) if total else 0.0,
+            'reuse_rate': round(self.reused / total, 4) if total else 0.0,
+            'avg_accept_latency_ms': mean(self.accept_latency_ms),
+            'avg_escalate_latency_ms': mean(self.escalate_latency_ms),
+            'avg_reuse_latency_ms': mean(self.reuse_latency_ms),
+        }
+
+
+class Cascade:
+    """MLP screen in front of a sequence model; shared across sessions"""
+
+    def __init__(self, screen_model, target_classes, threshold=0.9):
+        self.screen_model = screen_model
+        self.threshold = threshold
+        self.num_targets = len(target_classes)
+        # Column of each MLP class in the sequence model's probability row
+        target_index = {str(c): i for i, c in enumerate(target_classes)}
+        self.column_map = np.array(
+            [target_index.get(str(c), -1) for c in screen_model.class_list], dtype=np.int64
+        )
+
+    def screen(self, landmarks, stable_label):
+        """Probabilities in the sequence model's class order, or None to escalate"""
+        probs = self.screen_model.model.predict_proba(landmarks)[0]
+        top = int(np.argmax(probs))
+        if probs[top] < self.threshold or self.column_map[top] < 0:
+            return None
+        if stable_label is None or str(self.screen_model.label_for(top)) != str(stable_label):
+            return None
+        mapped = np.zeros(self.num_targets, dtype=np.float32)
+        known = self.column_map >= 0
+        mapped[self.column_map[known]] = probs[known]
+        return mapped
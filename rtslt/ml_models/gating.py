@@ -0,0 +1,66 @@
+"""
+Motion gating for sequence model inference
+
+While a signer holds a static letter, consecutive windows are nearly
+identical and re-running the model on them only reproduces the previous
+probabilities. MotionGate compares each new normalized frame with the
+newest frame of the last window whose result came back and reuses that
+result when nothing has moved more than the threshold. The reference pose
+and the cached probabilities change together in store(), so while a window
+is still being inferred, frames are compared with the pose the cache really
+belongs to. A minimum refresh interval still forces a real inference now
+and then.
+"""
+
+import time
+
+import numpy as np
+
+
+class MotionGate:
+    """Decides per frame whether the model needs to run again"""
+
+    def __init__(self, threshold=0.01, min_refresh_ms=200.0, features=126):
+        # Mean absolute coordinate change (in normalized [-1, 1] units)
+        # below which the pose counts as unchanged
+        self.threshold = threshold
+        self.min_refresh = min_refresh_ms / 1000.0
+        # Newest frame of the window self.cached was computed from
+        self.reference = np.zeros(features, dtype=np.float32)
+        self._scratch = np.zeros(features, dtype=np.float32)
+        self.cached = None
+        self.last_inferred_at = 0.0
+        self.checked = 0
+        self.skipped = 0
+
+    def should_infer(self, frame, now=None):
+        """True if frame needs a model call; False to reuse self.cached"""
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        if self.cached is not None and now - self.last_inferred_at < self.min_refresh:
+            np.subtract(frame, self.reference, out=self._scratch)
+            np.abs(self._scratch, out=self._scratch)
+            if float(self._scratch.mean()) <= self.threshold:
+                self.skipped += 1
+                return False
+        return True
+
+    def store(self, probabilities, frame, now=None):
+        """Cache the probabilities the model returned for the window ending in frame"""
+        self.cached = np.array(probabilities, dtype=np.float32).reshape(-1)
+        self.reference[...] = frame
+        self.last_inferred_at = time.monotonic() if now is None else now
+
+    def reset(self):
+        self.cached = None
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skip_ratio': round(self.skip_ratio, 4),
+        }
@@ -2,8 +2,13 @@ import time
 import pickle
 import os
 import numpy as np
-from tensorflow import keras
 from collections import deque
+from .arena import SessionArena
+from .bundle import load_bundle
+from .cascade import Cascade, CascadeStats, NumpyMLP
+from .numpy_engine import load_numpy_model
+from .registry import SharedModel, registry
+from .tflite_backend import TFLiteModel
 
 DEFAULT_CLASSES = [
     'A','B','C','D','E','F','G','H','I','J','K','L','M','N','O','P','Q','R','S','T','U','V','W','X','Y','Z',
@@ -11,56 +16,115 @@ DEFAULT_CLASSES = [
 ]
 
 
+def load_shared_model(model_path, label_encoder_path=None, model_type='lstm'):
+    """Load a model and its label metadata from disk"""
+    if model_path.endswith('.aslb'):
+        # Self-describing bundle: weights, classes and input geometry in one
+        # memory-mapped file, no pickle
+        return load_bundle(model_path, model_type)
+    
+    if model_type == 'lstm' or model_type == 'gru':
+        if model_path.endswith('.npz'):
+            # Exported weights run on the NumPy engine; TensorFlow is never
+            # imported in this process
+            model = load_numpy_model(model_path)
+            if model.classes:
+                return SharedModel(model, model_type, classes=model.classes)
+        elif model_path.endswith('.tflite'):
+            model = TFLiteModel(model_path)
+        else:
+            from tensorflow import keras
+            model = keras.models.load_model(model_path)
+        label_encoder = None
+        classes = None
+        # Try to load label encoder if provided or common paths
+        encoder_paths = []
+        if label_encoder_path:
+            encoder_paths.append(label_encoder_path)
+        # common fallback locations
+        encoder_paths.extend([
+            'ml_models/saved_models/lstm_model_label_encoder.pkl',
+            'ml_models/saved_models/label_encoder.pkl'
+        ])
+        for p in encoder_paths:
+            if os.path.exists(p):
+                try:
+                    with open(p, 'rb') as f:
+                        label_encoder = pickle.load(f)
+                    break
+                except Exception:
+                    pass
+        # If encoder missing, derive classes from dataset or default
+        if label_encoder is None:
+            # Use relative path or os.path.join to avoid backslash issues
+            dataset_dir = os.path.join('data', 'asl_alphabet', 'asl_alphabet_train')
+            if os.path.isdir(dataset_dir):
+                try:
+                    labels = [d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d))]
+                    classes = sorted(labels)
+                except Exception:
+                    classes = DEFAULT_CLASSES
+            else:
+                classes = DEFAULT_CLASSES
+        return SharedModel(model, model_type, label_encoder=label_encoder, classes=classes)
+
+    with open(model_path, 'rb') as f:
+        data = pickle.load(f)
+    # Run the fitted MLP as plain matmuls instead of through sklearn
+    classes = [str(c) for c in data['label_encoder'].classes_]
+    return SharedModel(NumpyMLP.from_sklearn(data['model']), model_type, classes=classes)
+
+
+def get_shared_model(model_path, label_encoder_path=None, model_type='lstm'):
+    """Return the process-wide instance of a model, loading it on first use"""
+    key = (os.path.abspath(model_path), model_type)
+    return registry.get(key, lambda: load_shared_model(model_path, label_encoder_path, model_type))
+
+
+def get_cascade(screen_model_path, shared_model, threshold=0.9):
+    """Process-wide MLP screen in front of a shared sequence model"""
+    screen_model = get_shared_model(screen_model_path, model_type='mlp')
+    key = ('cascade', os.path.abspath(screen_model_path), id(shared_model), threshold)
+    return registry.get(key, lambda: Cascade(screen_model, shared_model.class_list, threshold))
+
+
 class ASLPredictor:
-    """Real-time ASL prediction with improved accuracy"""
+    """Real-time ASL prediction with improved accuracy
+
+    Each instance holds only per-session state; the model itself is shared
+    through the process-wide registry.
+    """
     
-    def __init__(self, model_path, label_encoder_path=None, model_type='lstm'):
-        self.model_type = model_type
+    def __init__(self, model_path=None, label_encoder_path=None, model_type='lstm', shared_model=None, arena=None, motion_gate=None, cascade=None):
+        if shared_model is None:
+            shared_model = get_shared_model(model_path, label_encoder_path, model_type)
+        self.shared_model = shared_model
+        self.model_type = shared_model.model_type
+        self.model = shared_model.model
+        self.label_encoder = shared_model.label_encoder
+        self.classes = shared_model.classes
         
-        if model_type == 'lstm' or model_type == 'gru':
-            self.model = keras.models.load_model(model_path)
-            self.label_encoder = None
-            self.classes = None
-            # Try to load label encoder if provided or common paths
-            encoder_paths = []
-            if label_encoder_path:
-                encoder_paths.append(label_encoder_path)
-            # common fallback locations
-            encoder_paths.extend([
-                'ml_models/saved_models/lstm_model_label_encoder.pkl',
-                'ml_models/saved_models/label_encoder.pkl'
-            ])
-            for p in encoder_paths:
-                if os.path.exists(p):
-                    try:
-                        with open(p, 'rb') as f:
-                            self.label_encoder = pickle.load(f)
-                        break
-                    except Exception:
-                        pass
-            # If encoder missing, derive classes from dataset or default
-            if self.label_encoder is None:
-                # Use relative path or os.path.join to avoid backslash issues
-                dataset_dir = os.path.join('data', 'asl_alphabet', 'asl_alphabet_train')
-                if os.path.isdir(dataset_dir):
-                    try:
-                        labels = [d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d))]
-                        self.classes = sorted(labels)
-                    except Exception:
-                        self.classes = DEFAULT_CLASSES
-                else:
-                    self.classes = DEFAULT_CLASSES
-            self.sequence_buffer = []
-            self.sequence_length = 10
+        if self.model_type == 'lstm' or self.model_type == 'gru':
+            self.sequence_length = shared_model.sequence_length
+            # Frames live in a preallocated arena slot rather than a list;
+            # standalone predictors get a private single-slot arena
+            if arena is None:
+                arena = SessionArena(
+                    max_sessions=1, seq_len=self.sequence_length, features=shared_model.features,
+                    scale=shared_model.scale, offset=shared_model.offset
+                )
+            self.arena = arena
+            self.slot = arena.acquire()
+            # Optional MotionGate: reuse the last probabilities while the
+            # hand pose is static
+            self.gate = motion_gate
+            # Optional Cascade: single-frame MLP screen before the sequence model
+            self.cascade = cascade
+            self.cascade_stats = CascadeStats() if cascade is not None else None
             # Prediction smoothing: track last N predictions for voting
             self.prediction_history = deque(maxlen=3)
             self.last_predicted_label = None
             self.same_prediction_count = 0
-        else:
-            with open(model_path, 'rb') as f:
-                data = pickle.load(f)
-                self.model = data['model']
-                self.label_encoder = data['label_encoder']
     
     def _normalize_landmarks(self, landmarks):
         """Normalize landmarks for consistent model input"""
@@ -85,76 +149,158 @@ class ASLPredictor:
         
         # Reset buffer if no hands detected
         if not has_hands:
-            self.reset_sequence()
-            self.prediction_history.clear()
-            self.same_prediction_count = 0
-            self.last_predicted_label = None
+            self.clear_history()
             return None, 0.0, 0
         
         if self.model_type == 'lstm' or self.model_type == 'gru':
-            # Normalize landmarks for better model accuracy
-            landmarks = self._normalize_landmarks(landmarks)
-            
-            # Add to sequence buffer only if hands are detected
-            self.sequence_buffer.append(landmarks)
-            if len(self.sequence_buffer) > self.sequence_length:
-                self.sequence_buffer.pop(0)
-            
             # Need full sequence
-            if len(self.sequence_buffer) < self.sequence_length:
+            if not self.push_frame(landmarks):
                 return None, 0.0, 0
             
+            screened = self.screen_frame(landmarks)
+            if screened is not None:
+                result = self.update_from_probabilities(screened, start_time)
+                self.record_cascade(False, start_time)
+                return result
+            
+            cached = self.cached_probabilities()
+            if cached is not None:
+                result = self.update_from_probabilities(cached, start_time)
+                self.record_reuse(start_time)
+                return result
+            
             # Predict with optimized batch prediction
-            sequence = np.array([self.sequence_buffer])
+            sequence = self.current_window()[np.newaxis]
             predictions = self.model.predict_on_batch(sequence)
-            confidence = float(np.max(predictions))
-            predicted_idx = int(np.argmax(predictions))
-            
-            if self.label_encoder is not None:
-                predicted_label = self.label_encoder.inverse_transform([predicted_idx])[0]
+            self.record_inference(predictions, sequence[0, -1])
+            result = self.update_from_probabilities(predictions, start_time)
+            self.record_cascade(True, start_time)
+            return result
+        
+        # Single-frame models (baseline MLP) predict directly on raw landmarks
+        probabilities = self.model.predict_proba(np.asarray(landmarks, dtype=np.float32))[0]
+        predicted_idx = int(np.argmax(probabilities))
+        latency = int((time.time() - start_time) * 1000)
+        return self.shared_model.label_for(predicted_idx), float(probabilities[predicted_idx]), latency
+    
+    def push_frame(self, landmarks):
+        """Add one frame to the sequence buffer; True once a full window is ready"""
+        # The arena normalizes to [-1, 1] as it writes the frame in place
+        return self.arena.push(self.slot, np.asarray(landmarks))
+    
+    def current_window(self):
+        """Current (sequence_length, features) model input, as a view.
+
+        The next push_frame overwrites it; copy it before holding it
+        across an await.
+        """
+        return self.arena.window(self.slot)
+    
+    @property
+    def stable_label(self):
+        """Label the smoothing logic has confirmed, if any"""
+        if self.same_prediction_count >= 2:
+            return self.last_predicted_label
+        return None
+    
+    def screen_frame(self, landmarks):
+        """MLP probabilities if the cascade accepts this frame, else None"""
+        if self.cascade is None:
+            return None
+        return self.cascade.screen(landmarks, self.stable_label)
+    
+    def record_cascade(self, escalated, start_time):
+        if self.cascade_stats is not None:
+            self.cascade_stats.record(escalated, (time.time() - start_time) * 1000)
+    
+    def record_reuse(self, start_time):
+        """The cascade escalated but the motion gate answered from its cache"""
+        if self.cascade_stats is not None:
+            self.cascade_stats.record_reuse((time.time() - start_time) * 1000)
+    
+    def cached_probabilities(self):
+        """Last probabilities if the motion gate says the model can be skipped"""
+        if self.gate is None:
+            return None
+        if self.gate.should_infer(self.current_window()[-1]):
+            return None
+        return self.gate.cached
+    
+    def record_inference(self, predictions, frame):
+        """Remember the probabilities of a window the model actually ran on
+        (frame is that window's newest frame)"""
+        if self.gate is not None:
+            self.gate.store(predictions, frame)
+    
+    @property
+    def buffered_frames(self):
+        return int(self.arena.counts[self.slot])
+    
+    def update_from_probabilities(self, predictions, start_time=None):
+        """Feed one row of class probabilities through the smoothing logic.
+        
+        Returns (label, confidence, latency_ms); label is None until the
+        prediction is stable.
+        """
+        if start_time is None:
+            start_time = time.time()
+        confidence = float(np.max(predictions))
+        predicted_idx = int(np.argmax(predictions))
+        
+        predicted_label = self.shared_model.label_for(predicted_idx)
+        
+        # Add to history for smoothing
+        self.prediction_history.append((predicted_label, confidence))
+        
+        # Only return prediction if:
+        # 1. High confidence (>0.65)
+        # 2. Same label appears at least 2 times in recent history (voting)
+        label_counts = {}
+        avg_confidence = 0
+        for label, conf in self.prediction_history:
+            label_counts[label] = label_counts.get(label, 0) + 1
+            avg_confidence += conf
+        avg_confidence /= len(self.prediction_history)
+        
+        # Check if current prediction is stable
+        if confidence > 0.65 and label_counts.get(predicted_label, 0) >= 2 and avg_confidence > 0.65:
+            # If same as last prediction, increment counter
+            if predicted_label == self.last_predicted_label:
+                self.same_prediction_count += 1
             else:
-                # Fallback mapping
-                if self.classes and 0 <= predicted_idx < len(self.classes):
-                    predicted_label = self.classes[predicted_idx]
-                else:
-                    predicted_label = str(predicted_idx)
-            
-            # Add to history for smoothing
-            self.prediction_history.append((predicted_label, confidence))
+                self.same_prediction_count = 1
+                self.last_predicted_label = predicted_label
             
-            # Only return prediction if:
-            # 1. High confidence (>0.65)
-            # 2. Same label appears at least 2 times in recent history (voting)
-            label_counts = {}
-            avg_confidence = 0
-            for label, conf in self.prediction_history:
-                label_counts[label] = label_counts.get(label, 0) + 1
-                avg_confidence += conf
-            avg_confidence /= len(self.prediction_history)
-            
-            # Check if current prediction is stable
-            if confidence > 0.65 and label_counts.get(predicted_label, 0) >= 2 and avg_confidence > 0.65:
-                # If same as last prediction, increment counter
-                if predicted_label == self.last_predicted_label:
-                    self.same_prediction_count += 1
-                else:
-                    self.same_prediction_count = 1
-                    self.last_predicted_label = predicted_label
-                
-                # Return prediction after 2 consecutive matches
-                if self.same_prediction_count >= 2:
-                    latency = int((time.time() - start_time) * 1000)
-                    return predicted_label, avg_confidence, latency
-            else:
-                # Reset counter if prediction changed or confidence dropped
-                if predicted_label != self.last_predicted_label:
-                    self.same_prediction_count = 0
-                    self.last_predicted_label = None
+            # Return prediction after 2 consecutive matches
+            if self.same_prediction_count >= 2:
+                latency = int((time.time() - start_time) * 1000)
+                return predicted_label, avg_confidence, latency
+        else:
+            # Reset counter if prediction changed or confidence dropped
+            if predicted_label != self.last_predicted_label:
+                self.same_prediction_count = 0
+                self.last_predicted_label = None
         
         latency = int((time.time() - start_time) * 1000)
         return None, 0.0, latency
     
+    def clear_history(self):
+        """Reset the sequence buffer and the smoothing state"""
+        self.reset_sequence()
+        if self.model_type in ['lstm', 'gru']:
+            self.prediction_history.clear()
+            self.same_prediction_count = 0
+            self.last_predicted_label = None
+    
     def reset_sequence(self):
         """Reset sequence buffer"""
         if self.model_type in ['lstm', 'gru']:
-            self.sequence_buffer = []
\ No newline at end of file
+            self.arena.reset(self.slot)
+            if self.gate is not None:
+                self.gate.reset()
+    
+    def close(self):
+        """Return this session's arena slot"""
+        if self.model_type in ['lstm', 'gru'] and self.slot is not None:
+            self.arena.release(self.slot)
+            self.slot = None
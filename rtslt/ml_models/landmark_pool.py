@@ -0,0 +1,494 @@
+"""
+Server-side hand landmark extraction for thin clients
+
+Clients too slow to run MediaPipe Hands in the browser can let the server
+extract landmarks from the JPEG frames they already send to the video
+socket (?extract=1). Extraction runs on a pool of worker processes:
+
+- every session is pinned to one worker (the one with the fewest
+  sessions), which keeps its own mp.solutions.hands tracker in tracking
+  mode (static_image_mode=False), so consecutive frames of a session hit
+  the same tracker in order
+- a session has at most one frame at its worker plus `queue_frames`
+  waiting; a newer frame replaces the oldest waiting one, so a slow pool
+  lowers the extraction rate instead of adding latency
+- JPEG bytes go down a pipe with a small binary header and come back as
+  126 float32 values; nothing is pickled
+- a sender thread per worker does the pipe writes, which block once the
+  worker falls behind, so the event loop only queues frames; a worker has
+  at most `max_inflight_bytes` of JPEGs queued or being extracted, and
+  frames beyond that are dropped
+- a monitor thread restarts a worker that dies (retrying with backoff);
+  its sessions get fresh trackers and lose only the frames in flight
+
+The 126 values use the browser's layout (up to two hands of 21 x/y/z
+landmarks, zero padded), so they feed the same ASL prediction path.
+
+Benchmark frames/s per core:
+    python -m ml_models.landmark_pool <frame.jpg> [max_workers]
+"""
+
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from multiprocessing.connection import wait as wait_for_objects
+
+import numpy as np
+
+LANDMARK_VALUES = 126
+# Parent -> worker: op, session id, then the JPEG for OP_FRAME
+REQUEST = struct.Struct('<BI')
+OP_FRAME = 1
+OP_CLOSE = 2
+OP_STOP = 3
+# Worker -> parent: session id, has hands, extraction ms, then 126 float32
+RESULT = struct.Struct('<IBf')
+# JPEG bytes one worker may have queued or being extracted
+MAX_INFLIGHT_BYTES = 4 * 1024 * 1024
+RESTART_BACKOFF_S = 0.5
+RESTART_BACKOFF_MAX_S = 30.0
+
+
+def landmarks_from_results(results):
+    """126 float32 values (zero padded) and has_hands from Hands.process() results"""
+    values = np.zeros(LANDMARK_VALUES, dtype=np.float32)
+    hands = results.multi_hand_landmarks or []
+    flat = [c for hand in hands for lm in hand.landmark for c in (lm.x, lm.y, lm.z)]
+    flat = flat[:LANDMARK_VALUES]
+    values[:len(flat)] = flat
+    return values, bool(hands)
+
+
+def _worker_main(requests_conn, results_conn, hands_options):
+    """Entry point of an extraction worker process"""
+    try:
+        import cv2
+        import mediapipe
+    except ImportError as e:
+        results_conn.send_bytes(json.dumps({'error': f'Landmark extraction needs {e.name}'}).encode('utf-8'))
+        return
+    results_conn.send_bytes(json.dumps({'ok': True}).encode('utf-8'))
+
+    trackers = {}
+    try:
+        while True:
+            message = requests_conn.recv_bytes()
+            op, session = REQUEST.unpack_from(message)
+            if op == OP_STOP:
+                break
+            if op == OP_CLOSE:
+                tracker = trackers.pop(session, None)
+                if tracker is not None:
+                    tracker.close()
+                continue
+            start = time.perf_counter()
+            values, has_hands = np.zeros(LANDMARK_VALUES, dtype=np.float32), False
+            try:
+                tracker = trackers.get(session)
+                if tracker is None:
+                    tracker = trackers[session] = mediapipe.solutions.hands.Hands(
+                        static_image_mode=False, **hands_options
+                    )
+                image = cv2.imdecode(np.frombuffer(message, dtype=np.uint8, offset=REQUEST.size), cv2.IMREAD_COLOR)
+                if image is not None:
+                    values, has_hands = landmarks_from_results(
+                        tracker.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                    )
+            except Exception as e:
+                print(f"[Extraction] session {session} frame failed: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            results_conn.send_bytes(RESULT.pack(session, has_hands, elapsed_ms) + values.tobytes())
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for tracker in trackers.values():
+            tracker.close()
+
+
+class _Worker:
+    """Parent-side handle for one extraction process.
+
+    generation counts the processes that served this worker; frames queued
+    for, and results read from, an earlier process are ignored.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.requests_conn = None
+        # (message, session id, generation) for the sender thread, None to stop
+        self.outbox = queue.SimpleQueue()
+        self.inflight_bytes = 0
+        self.generation = 0
+        self.sessions = set()
+        self.frames = 0
+        self.busy_ms = 0.0
+        self.restarts = 0
+
+
+class ExtractionSession:
+    """One client's frames; results go to `on_landmarks(landmarks, has_hands)`.
+
+    Only touched from the event loop thread. landmarks is a float32 array
+    of 126 values, or None when no hands were found.
+    """
+
+    def __init__(self, pool, session_id, worker, on_landmarks, queue_frames):
+        self.pool = pool
+        self.id = session_id
+        self.worker = worker
+        self.on_landmarks = on_landmarks
+        self.pending = []
+        self.queue_frames = queue_frames
+        self.in_flight = False
+        self.in_flight_bytes = 0
+        self.generation = None
+        # on_landmarks tasks still running
+        self.tasks = set()
+        self.submitted = 0
+        self.extracted = 0
+        self.dropped = 0
+        self.closed = False
+
+    def submit(self, jpeg):
+        """Queue a JPEG without waiting; may drop the oldest queued frame"""
+        if self.closed:
+            return
+        self.submitted += 1
+        if not self.in_flight:
+            self._send(jpeg)
+            return
+        if len(self.pending) == self.queue_frames:
+            self.pending.pop(0)
+            self.dropped += 1
+            self.pool.dropped += 1
+        self.pending.append(jpeg)
+
+    def _send(self, jpeg):
+        worker = self.worker
+        if worker.inflight_bytes + len(jpeg) > self.pool.max_inflight_bytes:
+            # The worker is backed up with other sessions' frames
+            self._drop()
+            return
+        self.in_flight = True
+        self.in_flight_bytes = len(jpeg)
+        self.generation = worker.generation
+        worker.inflight_bytes += len(jpeg)
+        worker.outbox.put((REQUEST.pack(OP_FRAME, self.id) + jpeg, self.id, self.generation))
+
+    def _settle(self):
+        self.in_flight = False
+        self.worker.inflight_bytes -= self.in_flight_bytes
+        self.in_flight_bytes = 0
+
+    def _drop(self):
+        self.dropped += 1
+        self.pool.dropped += 1
+
+    def _lost(self):
+        """The frame at the worker will never come back (worker restarted)"""
+        self._settle()
+        self._drop()
+        self._next()
+
+    def _next(self):
+        if self.pending and not self.closed:
+            self._send(self.pending.pop(0))
+
+    def _result(self, landmarks, has_hands):
+        self._settle()
+        self.extracted += 1
+        self._next()
+        if not self.closed:
+            task = asyncio.ensure_future(self.on_landmarks(landmarks if has_hands else None, has_hands))
+            self.tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[Extraction] session {self.id} landmarks callback failed: {task.exception()!r}")
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'extracted': self.extracted,
+            'dropped': self.dropped,
+            'worker': self.worker.index,
+        }
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.pending = []
+        self.pool._close_session(self)
+
+
+class LandmarkExtractorPool:
+    """Pool of MediaPipe Hands processes with per-session tracker affinity"""
+
+    def __init__(self, num_workers=None, queue_frames=1, start_method='spawn',
+                 max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.3,
+                 max_inflight_bytes=MAX_INFLIGHT_BYTES):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.queue_frames = queue_frames
+        self.max_inflight_bytes = max_inflight_bytes
+        self.restart_backoff = RESTART_BACKOFF_S
+        self.ctx = mp.get_context(start_method)
+        self.hands_options = {
+            'max_num_hands': max_num_hands,
+            'min_detection_confidence': min_detection_confidence,
+            'min_tracking_confidence': min_tracking_confidence,
+        }
+        self.dropped = 0
+        self._sessions = {}
+        self._next_id = 0
+        self._workers = []
+        self._closing = False
+        self._loop = None
+        self._started = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start every worker and wait for their handshakes (blocking)"""
+        for i in range(self.num_workers):
+            worker = _Worker(i)
+            self._workers.append(worker)
+            self._spawn(worker)
+            threading.Thread(target=self._write_requests, args=(worker,), daemon=True,
+                             name=f'landmark-worker-sender-{i}').start()
+            threading.Thread(target=self._monitor, args=(worker,), daemon=True,
+                             name=f'landmark-worker-monitor-{i}').start()
+        self._started = time.perf_counter()
+        return self
+
+    def _spawn(self, worker):
+        # Pipe(duplex=False) returns (receive end, send end)
+        requests_recv, requests_send = self.ctx.Pipe(duplex=False)
+        results_recv, results_send = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(requests_recv, results_send, self.hands_options),
+            name=f'landmark-extraction-{worker.index}',
+            daemon=True,
+        )
+        process.start()
+        requests_recv.close()
+        results_send.close()
+        try:
+            try:
+                hello = json.loads(results_recv.recv_bytes().decode('utf-8'))
+            except EOFError:
+                process.join(timeout=5)
+                raise RuntimeError(f'Extraction worker exited during startup (code {process.exitcode})')
+            if 'error' in hello:
+                raise RuntimeError(hello['error'])
+        except BaseException:
+            process.kill()
+            process.join()
+            requests_send.close()
+            results_recv.close()
+            raise
+        worker.process = process
+        worker.requests_conn = requests_send
+        threading.Thread(target=self._read_results, args=(worker, results_recv, worker.generation), daemon=True,
+                         name=f'landmark-worker-reader-{worker.index}').start()
+
+    def _monitor(self, worker):
+        """Restart the worker whenever its process exits unexpectedly"""
+        while not self._closing:
+            wait_for_objects([worker.process.sentinel])
+            if self._closing:
+                return
+            worker.process.join()
+            print(f"[Extraction] worker {worker.index} exited with code {worker.process.exitcode}; restarting")
+            try:
+                worker.requests_conn.close()
+            except OSError:
+                pass
+            worker.restarts += 1
+            worker.generation += 1
+            self._call_in_loop(self._recover, worker)
+            delay = self.restart_backoff
+            while not self._closing:
+                try:
+                    self._spawn(worker)
+                    break
+                except Exception as e:
+                    print(f"[Extraction] worker {worker.index} failed to restart: {e}; retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, RESTART_BACKOFF_MAX_S)
+
+    def _recover(self, worker):
+        for session in list(self._sessions.values()):
+            if session.worker is worker and session.in_flight and session.generation != worker.generation:
+                session._lost()
+
+    def _write_requests(self, worker):
+        """Sender thread: the only place that writes to the worker's pipe"""
+        while True:
+            item = worker.outbox.get()
+            if item is None:
+                return
+            message, session_id, generation = item
+            if generation is not None and generation != worker.generation:
+                # Queued for a process that has died; _recover counted it lost
+                continue
+            try:
+                worker.requests_conn.send_bytes(message)
+            except (OSError, ValueError):
+                # Worker is down or restarting; the frame is lost
+                if session_id is not None:
+                    self._call_in_loop(self._send_failed, session_id, generation)
+
+    def _send_failed(self, session_id, generation):
+        session = self._sessions.get(session_id)
+        if session is not None and session.in_flight and session.generation == generation:
+            session._lost()
+
+    def _call_in_loop(self, callback, *args):
+        """Run callback on the sessions' event loop from a pool thread"""
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The loop is closed; nobody is waiting any more
+            pass
+
+    def close(self):
+        self._closing = True
+        for worker in self._workers:
+            worker.outbox.put((REQUEST.pack(OP_STOP, 0), None, None))
+            worker.outbox.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._workers = []
+
+    # ------------------------------------------------------------------
+    # Sessions
+    # ------------------------------------------------------------------
+
+    def open_session(self, on_landmarks):
+        """New session pinned to the least loaded worker (event loop thread)"""
+        self._loop = asyncio.get_running_loop()
+        worker = min(self._workers, key=lambda w: len(w.sessions))
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        session = ExtractionSession(self, self._next_id, worker, on_landmarks, self.queue_frames)
+        worker.sessions.add(session.id)
+        self._sessions[session.id] = session
+        return session
+
+    def _close_session(self, session):
+        self._sessions.pop(session.id, None)
+        session.worker.sessions.discard(session.id)
+        if session.in_flight:
+            session._settle()
+        session.worker.outbox.put((REQUEST.pack(OP_CLOSE, session.id), None, None))
+
+    def _read_results(self, worker, conn, generation):
+        while True:
+            try:
+                message = conn.recv_bytes()
+            except (EOFError, OSError):
+                return
+            session_id, has_hands, elapsed_ms = RESULT.unpack_from(message)
+            landmarks = np.frombuffer(message, dtype=np.float32, offset=RESULT.size)
+            worker.frames += 1
+            worker.busy_ms += elapsed_ms
+            self._call_in_loop(self._deliver, session_id, generation, landmarks, bool(has_hands))
+
+    def _deliver(self, session_id, generation, landmarks, has_hands):
+        session = self._sessions.get(session_id)
+        if session is not None and session.in_flight and session.generation == generation:
+            session._result(landmarks, has_hands)
+
+    def metrics(self):
+        """Throughput so far; frames/s per core counts only busy worker time"""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        frames = sum(w.frames for w in self._workers)
+        busy_s = sum(w.busy_ms for w in self._workers) / 1000
+        return {
+            'sessions': len(self._sessions),
+            'frames': frames,
+            'dropped': self.dropped,
+            'frames_per_s': round(frames / elapsed, 2) if elapsed else 0.0,
+            'frames_per_core_s': round(frames / busy_s, 2) if busy_s else 0.0,
+            'workers': [
+                {'worker': w.index, 'pid': w.process.pid, 'sessions': len(w.sessions),
+                 'frames': w.frames, 'inflight_bytes': w.inflight_bytes, 'restarts': w.restarts}
+                for w in self._workers
+            ],
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_landmark_pool(num_workers=None, **kwargs):
+    """Process-wide extraction pool, started on first use (blocking)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LandmarkExtractorPool(num_workers=num_workers, **kwargs).start()
+        return _pool
+
+
+def benchmark(jpeg, worker_counts=(1, 2, 4), sessions=8, frames_per_session=100):
+    """Extracted frames/s, and frames/s per busy core, for each worker count"""
+    results = {}
+    for count in worker_counts:
+        pool = LandmarkExtractorPool(num_workers=count).start()
+
+        async def run():
+            done = asyncio.Event()
+            remaining = sessions * frames_per_session
+
+            async def on_landmarks(landmarks, has_hands):
+                nonlocal remaining
+                remaining -= 1
+                if remaining == 0:
+                    done.set()
+
+            # Every session keeps one frame at its worker, so nothing is dropped
+            opened = [pool.open_session(on_landmarks) for _ in range(sessions)]
+            for _ in range(frames_per_session):
+                for session in opened:
+                    session.submit(jpeg)
+                while any(session.in_flight for session in opened):
+                    await asyncio.sleep(0.001)
+            await done.wait()
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        rate = sessions * frames_per_session / (time.perf_counter() - start)
+        per_core = pool.metrics()['frames_per_core_s']
+        pool.close()
+        results[count] = (rate, per_core)
+        print(f"  {count} worker(s): {rate:8.1f} frames/s, {per_core:8.1f} frames/s per busy core")
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python -m ml_models.landmark_pool <frame.jpg> [max_workers]")
+        sys.exit(1)
+    with open(sys.argv[1], 'rb') as f:
+        jpeg = f.read()
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    counts = sorted({1, 2, 4, max_workers} & set(range(1, max_workers + 1)))
+    print(f"Landmark extraction pool throughput ({sys.argv[1]}):")
+    benchmark(jpeg, counts)
@@ -0,0 +1,318 @@
+"""
+Pure-NumPy forward pass for the exported LSTM/BiLSTM models
+
+Running the small create_lstm_model / create_improved_lstm_model networks
+through TensorFlow costs seconds of import time, hundreds of MB of RSS and a
+large fixed overhead per call. The exporter below pulls the LSTM,
+Bidirectional, BatchNormalization and Dense weights out of the Keras .h5
+(folding each BatchNormalization into the layer that follows it) and writes
+them to a .npz file; NumpyLSTMModel runs that file without importing
+tensorflow.
+
+Export (needs TensorFlow, run once after training):
+    python -m ml_models.numpy_engine ml_models/saved_models/lstm_model.h5
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'softmax': _softmax,
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f'Unsupported activation: {name}')
+    return ACTIVATIONS[name]
+
+
+# ----------------------------------------------------------------------------
+# Forward pass
+# ----------------------------------------------------------------------------
+
+def lstm_forward(x, layer, reverse=False):
+    """Run one LSTM direction over x (batch, time, features).
+
+    Returns (batch, time, units) when return_sequences is set, otherwise the
+    final hidden state (batch, units). Keras gate order is i, f, c, o.
+    """
+    kernel, recurrent, bias = layer['kernel'], layer['recurrent_kernel'], layer['bias']
+    act = _activation(layer.get('activation', 'tanh'))
+    rec_act = _activation(layer.get('recurrent_activation', 'sigmoid'))
+    batch, steps, _ = x.shape
+    units = recurrent.shape[0]
+
+    # Input projection for every timestep in one matmul
+    xw = x @ kernel + bias
+    h = np.zeros((batch, units), dtype=x.dtype)
+    c = np.zeros((batch, units), dtype=x.dtype)
+    outputs = np.empty((batch, steps, units), dtype=x.dtype) if layer['return_sequences'] else None
+
+    order = range(steps - 1, -1, -1) if reverse else range(steps)
+    for t in order:
+        z = xw[:, t] + h @ recurrent
+        i = rec_act(z[:, :units])
+        f = rec_act(z[:, units:2 * units])
+        g = act(z[:, 2 * units:3 * units])
+        o = rec_act(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * act(c)
+        if outputs is not None:
+            # Backward outputs stay aligned with input time, as in Keras
+            outputs[:, t] = h
+    return outputs if outputs is not None else h
+
+
+def forward(layers, x):
+    """Run a list of exported layers over a (batch, time, features) input"""
+    for layer in layers:
+        kind = layer['kind']
+        if kind == 'lstm':
+            x = lstm_forward(x, layer)
+        elif kind == 'bilstm':
+            fwd = lstm_forward(x, layer['forward'])
+            bwd = lstm_forward(x, layer['backward'], reverse=True)
+            x = np.concatenate([fwd, bwd], axis=-1)
+        elif kind == 'dense':
+            x = _activation(layer['activation'])(x @ layer['kernel'] + layer['bias'])
+        elif kind == 'affine':
+            x = x * layer['scale'] + layer['shift']
+        else:
+            raise ValueError(f'Unknown layer kind: {kind}')
+    return x
+
+
+class NumpyLSTMModel:
+    """Drop-in replacement for a Keras model's predict_on_batch"""
+
+    def __init__(self, layers, classes=None, dtype=np.float32):
+        self.layers = [_cast_layer(layer, dtype) for layer in layers]
+        self.classes = classes
+        self.dtype = dtype
+
+    def predict_on_batch(self, x):
+        return forward(self.layers, np.asarray(x, dtype=self.dtype))
+
+    def predict(self, x, verbose=0):
+        return self.predict_on_batch(x)
+
+
+def _cast_layer(layer, dtype):
+    out = {}
+    for key, value in layer.items():
+        if isinstance(value, dict):
+            out[key] = _cast_layer(value, dtype)
+        elif isinstance(value, np.ndarray):
+            out[key] = value.astype(dtype, copy=False)
+        else:
+            out[key] = value
+    return out
+
+
+# ----------------------------------------------------------------------------
+# BatchNormalization folding
+# ----------------------------------------------------------------------------
+
+def _fold_into(layer, scale, shift):
+    """Fold y = x * scale + shift into the input side of layer"""
+    if layer['kind'] == 'bilstm':
+        return dict(layer,
+                    forward=_fold_into(layer['forward'], scale, shift),
+                    backward=_fold_into(layer['backward'], scale, shift))
+    if layer['kind'] in ('lstm', 'dense'):
+        kernel = layer['kernel']
+        return dict(layer,
+                    kernel=scale[:, None] * kernel,
+                    bias=layer['bias'] + shift @ kernel)
+    if layer['kind'] == 'affine':
+        return dict(layer, scale=scale * layer['scale'], shift=shift * layer['scale'] + layer['shift'])
+    raise ValueError(f'Cannot fold into layer kind: {layer["kind"]}')
+
+
+def fold_batch_norm(layers):
+    """Fold every 'affine' (inference-mode BatchNormalization) layer into
+    the next layer's input weights. A trailing affine layer is kept as is."""
+    folded = []
+    pending = None
+    for layer in layers:
+        if pending is not None:
+            layer = _fold_into(layer, pending['scale'], pending['shift'])
+            pending = None
+        if layer['kind'] == 'affine':
+            pending = layer
+        else:
+            folded.append(layer)
+    if pending is not None:
+        folded.append(pending)
+    return folded
+
+
+# ----------------------------------------------------------------------------
+# Export from Keras / save / load
+# ----------------------------------------------------------------------------
+
+def _export_lstm(lstm):
+    config = lstm.get_config()
+    kernel, recurrent, bias = [np.asarray(w) for w in lstm.get_weights()]
+    return {
+        'kind': 'lstm',
+        'kernel': kernel,
+        'recurrent_kernel': recurrent,
+        'bias': bias,
+        'return_sequences': bool(config['return_sequences']),
+        'activation': config.get('activation', 'tanh'),
+        'recurrent_activation': config.get('recurrent_activation', 'sigmoid'),
+    }
+
+
+def export_keras_layers(model):
+    """Convert a Keras Sequential model into a list of layer dicts"""
+    layers = []
+    for layer in model.layers:
+        name = type(layer).__name__
+        if name in ('InputLayer', 'Dropout'):
+            continue
+        if name == 'LSTM':
+            if layer.get_config().get('go_backwards'):
+                raise ValueError('go_backwards LSTM layers are not supported')
+            layers.append(_export_lstm(layer))
+        elif name == 'Bidirectional':
+            if layer.merge_mode != 'concat':
+                raise ValueError(f'Unsupported merge_mode: {layer.merge_mode}')
+            fwd = _export_lstm(layer.forward_layer)
+            bwd = _export_lstm(layer.backward_layer)
+            layers.append({
+                'kind': 'bilstm',
+                'forward': fwd,
+                'backward': bwd,
+                'return_sequences': fwd['return_sequences'],
+            })
+        elif name == 'BatchNormalization':
+            gamma, beta, mean, var = [np.asarray(w) for w in layer.get_weights()]
+            scale = gamma / np.sqrt(var + layer.epsilon)
+            layers.append({'kind': 'affine', 'scale': scale, 'shift': beta - mean * scale})
+        elif name == 'Dense':
+            kernel, bias = [np.asarray(w) for w in layer.get_weights()]
+            activation = layer.get_config()['activation']
+            layers.append({'kind': 'dense', 'kernel': kernel, 'bias': bias, 'activation': activation})
+        else:
+            raise ValueError(f'Unsupported layer type for NumPy export: {name}')
+    return fold_batch_norm(layers)
+
+
+def flatten_layers(layers):
+    """Split layers into a JSON-able spec and a dict of named arrays"""
+    arrays = {}
+    spec = []
+    for i, layer in enumerate(layers):
+        entry = {}
+        for key, value in layer.items():
+            if isinstance(value, dict):
+                sub = {}
+                for k, v in value.items():
+                    if isinstance(v, np.ndarray):
+                        arrays[f'{i}/{key}/{k}'] = v
+                        sub[k] = {'array': f'{i}/{key}/{k}'}
+                    else:
+                        sub[k] = v
+                entry[key] = sub
+            elif isinstance(value, np.ndarray):
+                arrays[f'{i}/{key}'] = value
+                entry[key] = {'array': f'{i}/{key}'}
+            else:
+                entry[key] = value
+        spec.append(entry)
+    return spec, arrays
+
+
+def unflatten_layers(spec, arrays):
+    """Inverse of flatten_layers"""
+    def resolve(value):
+        if isinstance(value, dict) and 'array' in value:
+            return arrays[value['array']]
+        if isinstance(value, dict):
+            return {k: resolve(v) for k, v in value.items()}
+        return value
+    return [{k: resolve(v) for k, v in entry.items()} for entry in spec]
+
+
+def save_numpy_model(layers, path, classes=None):
+    spec, arrays = flatten_layers(layers)
+    arrays['__spec__'] = np.frombuffer(json.dumps(spec).encode('utf-8'), dtype=np.uint8)
+    if classes is not None:
+        arrays['__classes__'] = np.array([str(c) for c in classes])
+    np.savez(path, **arrays)
+
+
+def load_numpy_model(path):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {k: data[k] for k in data.files}
+    spec = json.loads(arrays.pop('__spec__').tobytes().decode('utf-8'))
+    classes = arrays.pop('__classes__', None)
+    if classes is not None:
+        classes = [str(c) for c in classes]
+    return NumpyLSTMModel(unflatten_layers(spec, arrays), classes=classes)
+
+
+def verify_against_keras(keras_model, numpy_model, num_samples=64, atol=1e-4, seed=0):
+    """Max absolute difference between Keras and NumPy outputs on random windows"""
+    rng = np.random.default_rng(seed)
+    shape = (num_samples,) + tuple(keras_model.input_shape[1:])
+    x = rng.uniform(-1.0, 1.0, size=shape).astype(np.float32)
+    expected = np.asarray(keras_model.predict_on_batch(x))
+    actual = numpy_model.predict_on_batch(x)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    return max_diff, max_diff <= atol
+
+
+def export_h5(model_path, output_path=None, label_encoder_path=None):
+    """Export a Keras .h5 model to a NumPy .npz and check it matches"""
+    from tensorflow import keras
+    import pickle
+
+    output_path = output_path or os.path.splitext(model_path)[0] + '.npz'
+    label_encoder_path = label_encoder_path or model_path.replace('.h5', '_label_encoder.pkl')
+
+    keras_model = keras.models.load_model(model_path)
+    classes = None
+    if os.path.exists(label_encoder_path):
+        with open(label_encoder_path, 'rb') as f:
+            classes = list(pickle.load(f).classes_)
+
+    layers = export_keras_layers(keras_model)
+    save_numpy_model(layers, output_path, classes=classes)
+
+    max_diff, ok = verify_against_keras(keras_model, load_numpy_model(output_path))
+    print(f"✓ Exported {len(layers)} layers to {output_path}")
+    print(f"  Max |keras - numpy| on random windows: {max_diff:.2e} ({'OK' if ok else 'MISMATCH'})")
+    return output_path, max_diff
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python -m ml_models.numpy_engine <model.h5> [output.npz]")
+        sys.exit(1)
+    export_h5(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,89 @@
+"""
+Process-wide registry of loaded models
+
+Loading the LSTM takes seconds and holds the full set of weights in memory,
+so every model is loaded once per process and shared by all sessions. The
+per-connection state (sequence buffer, vote history) lives in ASLPredictor.
+"""
+
+import threading
+
+
+class SharedModel:
+    """Loaded model plus label metadata, shared read-only across sessions"""
+
+    def __init__(self, model, model_type='lstm', label_encoder=None, classes=None,
+                 sequence_length=10, features=126, scale=2.0, offset=-1.0):
+        self.model = model
+        self.model_type = model_type
+        self.label_encoder = label_encoder
+        self.classes = classes
+        # Input geometry and landmark normalization (x * scale + offset)
+        self.sequence_length = sequence_length
+        self.features = features
+        self.scale = scale
+        self.offset = offset
+        self.bundle = None
+
+    @property
+    def class_list(self):
+        """Labels in model output order"""
+        if self.label_encoder is not None:
+            return list(self.label_encoder.classes_)
+        return list(self.classes or [])
+
+    def label_for(self, idx):
+        """Map a class index to its label"""
+        if self.label_encoder is not None:
+            return self.label_encoder.inverse_transform([idx])[0]
+        if self.classes and 0 <= idx < len(self.classes):
+            return self.classes[idx]
+        return str(idx)
+
+
+class ModelRegistry:
+    """Thread-safe cache that loads each model at most once per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._key_locks = {}
+
+    def get(self, key, loader):
+        """Return the cached model for key, calling loader() on first use.
+
+        Concurrent callers for the same key wait for a single load instead of
+        loading their own copy; callers for other keys are not blocked.
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = loader()
+                with self._lock:
+                    self._models[key] = model
+            return model
+
+    def is_loaded(self, key):
+        return key in self._models
+
+    def evict(self, key):
+        """Drop a cached model (e.g. after retraining)"""
+        with self._lock:
+            self._models.pop(key, None)
+            self._key_locks.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._key_locks.clear()
+
+
+# Single registry for the whole process
+registry = ModelRegistry()
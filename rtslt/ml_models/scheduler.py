@@ -0,0 +1,206 @@
+"""
+Cross-session micro-batching for sequence model inference
+
+Every ASL connection produces one (sequence_length, features) window per
+frame. Running them one at a time pays the full model call overhead for a
+batch of 1, so windows from all sessions are queued here and run together.
+A batch is flushed when it reaches max_batch_size or when the oldest window
+has waited max_wait_ms, whichever comes first.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class BatchStats:
+    """Running batch-size and queue-wait statistics"""
+
+    def __init__(self, window=1000):
+        self.batches = 0
+        self.windows = 0
+        self.max_batch_seen = 0
+        self.batch_sizes = deque(maxlen=window)
+        self.queue_waits_ms = deque(maxlen=window)
+        self.run_times_ms = deque(maxlen=window)
+
+    def record(self, batch_size, waits_ms, run_ms):
+        self.batches += 1
+        self.windows += batch_size
+        self.max_batch_seen = max(self.max_batch_seen, batch_size)
+        self.batch_sizes.append(batch_size)
+        self.queue_waits_ms.extend(waits_ms)
+        self.run_times_ms.append(run_ms)
+
+    def as_dict(self):
+        waits = np.array(self.queue_waits_ms) if self.queue_waits_ms else np.zeros(1)
+        sizes = np.array(self.batch_sizes) if self.batch_sizes else np.zeros(1)
+        runs = np.array(self.run_times_ms) if self.run_times_ms else np.zeros(1)
+        return {
+            'batches': self.batches,
+            'windows': self.windows,
+            'avg_batch_size': round(float(sizes.mean()), 2),
+            'max_batch_size': self.max_batch_seen,
+            'avg_queue_wait_ms': round(float(waits.mean()), 3),
+            'p95_queue_wait_ms': round(float(np.percentile(waits, 95)), 3),
+            'max_queue_wait_ms': round(float(waits.max()), 3),
+            'avg_run_ms': round(float(runs.mean()), 3),
+        }
+
+
+class BatchScheduler:
+    """Collects windows from many sessions and runs them as one batch"""
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, executor=None):
+        # predict_fn takes a (batch, sequence_length, features) array and
+        # returns one row of class probabilities per window
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.stats = BatchStats()
+        self._pending = []
+        self._batch = None
+        self._wakeup = None
+        self._task = None
+
+    async def submit(self, window):
+        """Queue one window and wait for its probability row.
+
+        The window is read when its batch runs, so it must not change until
+        then: pass a copy, not a view into the session arena.
+        """
+        loop = asyncio.get_running_loop()
+        self._ensure_running(loop)
+        future = loop.create_future()
+        self._pending.append((window, future, time.perf_counter()))
+        self._wakeup.set()
+        return await future
+
+    def _ensure_running(self, loop):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Wait for more windows until the batch is full or the oldest
+            # window's deadline has passed
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            await self._run_batch(loop, batch)
+
+    async def _run_batch(self, loop, batch):
+        started = time.perf_counter()
+        waits_ms = [(started - queued) * 1000 for _, _, queued in batch]
+        # Windows are copied into a reused batch array on the loop thread
+        windows = self._batch_array(batch[0][0].shape)[:len(batch)]
+        for i, (window, _, _) in enumerate(batch):
+            windows[i] = window
+        try:
+            probabilities = await loop.run_in_executor(self.executor, self._predict, windows)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        run_ms = (time.perf_counter() - started) * 1000
+        self.stats.record(len(batch), waits_ms, run_ms)
+        # Route each result row back to the session that queued it
+        for row, (_, future, _) in zip(probabilities, batch):
+            if not future.done():
+                future.set_result(row)
+
+    def _batch_array(self, window_shape):
+        if self._batch is None or self._batch.shape[1:] != window_shape:
+            self._batch = np.empty((self.max_batch_size,) + tuple(window_shape), dtype=np.float32)
+        return self._batch
+
+    def _predict(self, windows):
+        # Copy so result rows never alias the reused batch array
+        return np.array(self.predict_fn(windows))
+
+
+class LatestMailbox:
+    """Single-slot mailbox where a newer item replaces the pending one.
+
+    When a client sends frames faster than inference completes, only the
+    newest window is worth running; older pending windows are dropped and
+    counted instead of queueing up behind the live hand.
+    """
+
+    # Frames dropped by every mailbox in this process
+    total_dropped = 0
+
+    def __init__(self):
+        self._item = None
+        self._event = asyncio.Event()
+        self.dropped = 0
+        self.delivered = 0
+
+    def put(self, item):
+        if self._item is not None:
+            self.dropped += 1
+            LatestMailbox.total_dropped += 1
+        self._item = item
+        self._event.set()
+
+    async def get(self):
+        while self._item is None:
+            self._event.clear()
+            await self._event.wait()
+        item, self._item = self._item, None
+        self.delivered += 1
+        return item
+
+    def clear(self):
+        self._item = None
+
+
+_executor = None
+_schedulers = {}
+
+
+def get_inference_executor(max_workers=2):
+    """Bounded thread pool that runs model calls off the event loop"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asl-inference')
+    return _executor
+
+
+def get_batch_scheduler(shared_model, max_batch_size=32, max_wait_ms=5.0, executor=None):
+    """Return the scheduler for a shared model on the running event loop"""
+    loop = asyncio.get_running_loop()
+    key = (id(shared_model), id(loop))
+    scheduler = _schedulers.get(key)
+    if scheduler is None:
+        scheduler = BatchScheduler(
+            shared_model.model.predict_on_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            executor=executor if executor is not None else get_inference_executor(),
+        )
+        _schedulers[key] = scheduler
+    return scheduler
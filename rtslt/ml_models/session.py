@@ -0,0 +1,95 @@
+"""
+Per-connection ASL session setup
+
+Everything an ASL WebSocket needs (shared model, optional cascade, arena
+slot, motion gate, batch scheduler or worker pool, mailbox) is assembled
+here from the Django settings. translator.consumers imports this module only when the
+first ASL connection opens, so HTTP- and chat-only workers never import
+NumPy or the model backends.
+"""
+
+from asgiref.sync import sync_to_async
+
+from .arena import get_session_arena
+from .gating import MotionGate
+from .inference import ASLPredictor, get_cascade, get_shared_model
+from .scheduler import LatestMailbox, get_batch_scheduler, get_inference_executor
+from .worker_pool import get_worker_pool
+
+DEFAULT_MODEL_PATH = 'ml_models/saved_models/lstm_model.h5'
+DEFAULT_ENCODER_PATH = 'ml_models/saved_models/lstm_model_label_encoder.pkl'
+
+
+def process_mode(config):
+    return getattr(config, 'ASL_INFERENCE_MODE', 'thread') == 'process'
+
+
+def load_models(config):
+    """Load (or fetch from the registry) the shared model and cascade.
+
+    In process mode the model lives in the worker processes; the shared
+    model returned here only carries classes and normalization.
+    """
+    model_path = getattr(config, 'ASL_MODEL_PATH', DEFAULT_MODEL_PATH)
+    if process_mode(config):
+        shared_model = get_worker_pool(
+            model_path, num_workers=getattr(config, 'ASL_INFERENCE_PROCESSES', None)
+        ).shared_model
+    else:
+        shared_model = get_shared_model(
+            model_path=model_path,
+            label_encoder_path=DEFAULT_ENCODER_PATH,
+            model_type='lstm'
+        )
+    cascade = None
+    cascade_path = getattr(config, 'ASL_CASCADE_MODEL_PATH', None)
+    if cascade_path:
+        cascade = get_cascade(cascade_path, shared_model, getattr(config, 'ASL_CASCADE_THRESHOLD', 0.9))
+    return shared_model, cascade
+
+
+async def open_asl_session(config):
+    """Build the per-connection predictor, scheduler and mailbox.
+
+    The model is loaded once per process and shared; the first connection
+    loads it in a worker thread so the event loop keeps serving everyone
+    else.
+    """
+    shared_model, cascade = await sync_to_async(load_models, thread_sensitive=False)(config)
+
+    motion_gate = None
+    if getattr(config, 'ASL_MOTION_GATING', True):
+        motion_gate = MotionGate(
+            threshold=getattr(config, 'ASL_MOTION_THRESHOLD', 0.01),
+            min_refresh_ms=getattr(config, 'ASL_MOTION_MIN_REFRESH_MS', 200.0),
+            features=shared_model.features,
+        )
+    predictor = ASLPredictor(
+        shared_model=shared_model,
+        arena=get_session_arena(
+            getattr(config, 'ASL_MAX_SESSIONS', 256),
+            seq_len=shared_model.sequence_length,
+            features=shared_model.features,
+            scale=shared_model.scale,
+            offset=shared_model.offset
+        ),
+        motion_gate=motion_gate,
+        cascade=cascade
+    )
+    if process_mode(config):
+        # Same submit()/stats interface as the batch scheduler
+        scheduler = get_worker_pool(getattr(config, 'ASL_MODEL_PATH', DEFAULT_MODEL_PATH))
+    else:
+        scheduler = get_batch_scheduler(
+            shared_model,
+            max_batch_size=getattr(config, 'ASL_BATCH_MAX_SIZE', 32),
+            max_wait_ms=getattr(config, 'ASL_BATCH_MAX_WAIT_MS', 5.0),
+            executor=get_inference_executor(getattr(config, 'ASL_INFERENCE_WORKERS', 2)),
+        )
+    return predictor, scheduler, LatestMailbox()
+
+
+def preload(config):
+    """Warm the registry at startup for dedicated inference workers"""
+    shared_model, _ = load_models(config)
+    return shared_model
@@ -1,3 +1,646 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from .arena import ArenaFullError, SessionArena
+from .bundle import ModelBundle, build_bundle, write_bundle
+from .cascade import Cascade, CascadeStats, NumpyMLP
+from .gating import MotionGate
+from .inference import ASLPredictor
+from .landmark_pool import ExtractionSession, LandmarkExtractorPool, landmarks_from_results
+from .landmark_pool import _Worker as _ExtractionWorker
+from .numpy_engine import NumpyLSTMModel, fold_batch_norm, forward, load_numpy_model, save_numpy_model
+from .registry import ModelRegistry, SharedModel
+from .scheduler import BatchScheduler, LatestMailbox
+from .tflite_backend import TFLiteModel
+from .worker_pool import InferenceWorkerPool, _Worker
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_loads_each_model_once_across_threads(self):
+        reg = ModelRegistry()
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def loader():
+            calls.append(1)
+            return SharedModel(object())
+
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(reg.get('lstm', loader))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_evict_forces_reload(self):
+        reg = ModelRegistry()
+        first = reg.get('lstm', lambda: SharedModel(object()))
+        reg.evict('lstm')
+        second = reg.get('lstm', lambda: SharedModel(object()))
+        self.assertIsNot(first, second)
+
+    def test_label_for_falls_back_to_classes(self):
+        shared = SharedModel(object(), classes=['A', 'B'])
+        self.assertEqual(shared.label_for(1), 'B')
+        self.assertEqual(shared.label_for(5), '5')
+
+
+class BatchSchedulerTests(SimpleTestCase):
+    def test_batches_windows_and_routes_rows_back(self):
+        batch_sizes = []
+
+        def predict_fn(windows):
+            batch_sizes.append(len(windows))
+            # Row i echoes the session id stored in its window
+            return windows[:, 0, :2]
+
+        async def run():
+            scheduler = BatchScheduler(predict_fn, max_batch_size=4, max_wait_ms=20)
+            windows = [np.full((10, 126), i, dtype=np.float32) for i in range(6)]
+            rows = await asyncio.gather(*(scheduler.submit(w) for w in windows))
+            return scheduler, rows
+
+        scheduler, rows = asyncio.run(run())
+        self.assertEqual([int(r[0]) for r in rows], list(range(6)))
+        self.assertEqual(batch_sizes, [4, 2])
+        stats = scheduler.stats.as_dict()
+        self.assertEqual(stats['windows'], 6)
+        self.assertEqual(stats['max_batch_size'], 4)
+
+    def test_prediction_error_reaches_every_caller(self):
+        def predict_fn(windows):
+            raise RuntimeError('boom')
+
+        async def run():
+            scheduler = BatchScheduler(predict_fn, max_batch_size=2, max_wait_ms=1)
+            return await asyncio.gather(
+                scheduler.submit(np.zeros((10, 126))),
+                scheduler.submit(np.zeros((10, 126))),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+class LatestMailboxTests(SimpleTestCase):
+    def test_newest_item_wins_and_drops_are_counted(self):
+        async def run():
+            mailbox = LatestMailbox()
+            for i in range(5):
+                mailbox.put(i)
+            return mailbox, await mailbox.get()
+
+        mailbox, item = asyncio.run(run())
+        self.assertEqual(item, 4)
+        self.assertEqual(mailbox.dropped, 4)
+        self.assertEqual(mailbox.delivered, 1)
+
+
+class SessionArenaTests(SimpleTestCase):
+    def test_window_is_ordered_view_of_newest_frames(self):
+        arena = SessionArena(max_sessions=2, seq_len=3, features=4)
+        slot = arena.acquire()
+        ready = [arena.push(slot, np.full(4, i / 10.0)) for i in range(5)]
+        self.assertEqual(ready, [False, False, True, True, True])
+
+        window = arena.window(slot)
+        self.assertTrue(np.shares_memory(window, arena.buffer))
+        np.testing.assert_allclose(window[:, 0], [0.2 * 2 - 1, 0.3 * 2 - 1, 0.4 * 2 - 1], rtol=1e-6)
+
+    def test_gather_batches_several_sessions(self):
+        arena = SessionArena(max_sessions=2, seq_len=2, features=3)
+        a, b = arena.acquire(), arena.acquire()
+        for i in range(2):
+            arena.push(a, np.zeros(3))
+            arena.push(b, np.ones(3))
+        batch = arena.gather([b, a])
+        self.assertEqual(batch.shape, (2, 2, 3))
+        self.assertTrue((batch[0] == 1).all() and (batch[1] == -1).all())
+
+    def test_slots_are_bounded_and_reusable(self):
+        arena = SessionArena(max_sessions=1, seq_len=2, features=3)
+        slot = arena.acquire()
+        with self.assertRaises(ArenaFullError):
+            arena.acquire()
+        arena.release(slot)
+        self.assertEqual(arena.acquire(), slot)
+
+
+def random_lstm(rng, inputs, units, return_sequences):
+    return {
+        'kind': 'lstm',
+        'kernel': rng.normal(0, 0.3, (inputs, 4 * units)),
+        'recurrent_kernel': rng.normal(0, 0.3, (units, 4 * units)),
+        'bias': rng.normal(0, 0.1, 4 * units),
+        'return_sequences': return_sequences,
+    }
+
+
+def random_affine(rng, size):
+    return {'kind': 'affine', 'scale': rng.uniform(0.5, 1.5, size), 'shift': rng.normal(0, 0.2, size)}
+
+
+def random_improved_layers(rng, features=12, classes=5):
+    """Scaled-down create_improved_lstm_model stack"""
+    return [
+        {'kind': 'bilstm', 'return_sequences': True,
+         'forward': random_lstm(rng, features, 8, True),
+         'backward': random_lstm(rng, features, 8, True)},
+        random_affine(rng, 16),
+        random_lstm(rng, 16, 6, False),
+        random_affine(rng, 6),
+        {'kind': 'dense', 'kernel': rng.normal(0, 0.3, (6, 10)), 'bias': np.zeros(10), 'activation': 'relu'},
+        random_affine(rng, 10),
+        {'kind': 'dense', 'kernel': rng.normal(0, 0.3, (10, classes)), 'bias': np.zeros(classes), 'activation': 'softmax'},
+    ]
+
+
+class NumpyEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.layers = random_improved_layers(self.rng)
+        self.x = self.rng.uniform(-1, 1, (4, 10, 12))
+
+    def test_batch_norm_folding_preserves_outputs(self):
+        folded = fold_batch_norm(self.layers)
+        self.assertFalse(any(layer['kind'] == 'affine' for layer in folded))
+        np.testing.assert_allclose(forward(folded, self.x), forward(self.layers, self.x), atol=1e-10)
+
+    def test_batched_rows_match_single_window_calls(self):
+        model = NumpyLSTMModel(fold_batch_norm(self.layers))
+        batched = model.predict_on_batch(self.x)
+        self.assertEqual(batched.shape, (4, 5))
+        np.testing.assert_allclose(batched.sum(axis=1), 1.0, rtol=1e-5)
+        for i in range(4):
+            np.testing.assert_allclose(model.predict_on_batch(self.x[i:i + 1])[0], batched[i], atol=1e-6)
+
+    def test_save_and_load_round_trip(self):
+        layers = fold_batch_norm(self.layers)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.npz')
+            save_numpy_model(layers, path, classes=['A', 'B', 'C', 'D', 'E'])
+            model = load_numpy_model(path)
+        self.assertEqual(model.classes, ['A', 'B', 'C', 'D', 'E'])
+        np.testing.assert_allclose(
+            model.predict_on_batch(self.x),
+            NumpyLSTMModel(layers).predict_on_batch(self.x),
+            atol=1e-6,
+        )
+
+
+class MotionGateTests(SimpleTestCase):
+    def test_static_pose_reuses_cached_probabilities(self):
+        gate = MotionGate(threshold=0.01, min_refresh_ms=1000, features=4)
+        frame = np.zeros(4, dtype=np.float32)
+        self.assertTrue(gate.should_infer(frame, now=0.0))
+        gate.store([0.1, 0.9], frame, now=0.0)
+
+        self.assertFalse(gate.should_infer(frame + 0.005, now=0.1))
+        self.assertTrue(gate.should_infer(frame + 0.5, now=0.2))
+        self.assertEqual(gate.stats()['skipped'], 1)
+
+    def test_min_refresh_forces_inference(self):
+        gate = MotionGate(threshold=0.01, min_refresh_ms=100, features=4)
+        frame = np.zeros(4, dtype=np.float32)
+        gate.should_infer(frame, now=0.0)
+        gate.store([1.0], frame, now=0.0)
+        self.assertFalse(gate.should_infer(frame, now=0.05))
+        self.assertTrue(gate.should_infer(frame, now=0.15))
+        self.assertAlmostEqual(gate.skip_ratio, 1 / 3)
+
+    def test_new_pose_is_not_answered_with_the_old_pose_while_in_flight(self):
+        gate = MotionGate(threshold=0.01, min_refresh_ms=1000, features=4)
+        old_pose = np.zeros(4, dtype=np.float32)
+        new_pose = np.full(4, 0.5, dtype=np.float32)
+        gate.should_infer(old_pose, now=0.0)
+        gate.store([0.9, 0.1], old_pose, now=0.0)
+
+        # new_pose's window is dispatched; until its result is stored, frames
+        # near new_pose still need the model and frames near old_pose do not
+        self.assertTrue(gate.should_infer(new_pose, now=0.1))
+        self.assertTrue(gate.should_infer(new_pose + 0.001, now=0.12))
+        self.assertFalse(gate.should_infer(old_pose, now=0.13))
+
+        gate.store([0.1, 0.9], new_pose, now=0.15)
+        self.assertFalse(gate.should_infer(new_pose + 0.001, now=0.2))
+        np.testing.assert_allclose(gate.cached, [0.1, 0.9])
+
+
+class CascadeTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.mlp = NumpyMLP(
+            [rng.normal(0, 1, (6, 8)), rng.normal(0, 1, (8, 3))],
+            [np.zeros(8), np.zeros(3)],
+        )
+        self.frame = rng.uniform(0, 1, 6)
+
+    def test_mlp_forward_is_vectorized_softmax(self):
+        frames = np.stack([self.frame, self.frame * 0.5])
+        probs = self.mlp.predict_proba(frames)
+        self.assertEqual(probs.shape, (2, 3))
+        np.testing.assert_allclose(probs.sum(axis=1), 1.0, rtol=1e-6)
+        np.testing.assert_allclose(self.mlp.predict_proba(self.frame)[0], probs[0], rtol=1e-6)
+
+    def test_accepts_only_confident_agreement_with_stable_label(self):
+        screen = SharedModel(self.mlp, 'mlp', classes=['B', 'A', 'C'])
+        top = screen.label_for(int(np.argmax(self.mlp.predict_proba(self.frame))))
+        cascade = Cascade(screen, target_classes=['A', 'B', 'C', 'D'], threshold=0.0)
+
+        self.assertIsNone(cascade.screen(self.frame, stable_label=None))
+        self.assertIsNone(cascade.screen(self.frame, stable_label='D'))
+        mapped = cascade.screen(self.frame, stable_label=top)
+        self.assertEqual(mapped.shape, (4,))
+        self.assertEqual(['A', 'B', 'C', 'D'][int(np.argmax(mapped))], top)
+
+        cascade.threshold = 1.1
+        self.assertIsNone(cascade.screen(self.frame, stable_label=top))
+
+    def test_gate_reuse_is_not_counted_as_escalated(self):
+        stats = CascadeStats()
+        stats.record(False, 1.0)
+        stats.record(True, 2.0)
+        stats.record_reuse(0.5)
+        summary = stats.as_dict()
+        self.assertEqual(summary['screened'], 3)
+        self.assertAlmostEqual(summary['escalate_rate'], 1 / 3, places=4)
+        self.assertAlmostEqual(summary['reuse_rate'], 1 / 3, places=4)
+        self.assertEqual(summary['avg_reuse_latency_ms'], 0.5)
+
+    def test_mlp_model_type_predicts(self):
+        predictor = ASLPredictor(shared_model=SharedModel(self.mlp, 'mlp', classes=['B', 'A', 'C']))
+        label, confidence, _ = predictor.predict(self.frame)
+        self.assertIn(label, ['A', 'B', 'C'])
+        self.assertGreater(confidence, 0.0)
+
+
+class ModelBundleTests(SimpleTestCase):
+    def test_bundle_round_trip_is_memory_mapped(self):
+        rng = np.random.default_rng(2)
+        layers = fold_batch_norm(random_improved_layers(rng))
+        x = rng.uniform(-1, 1, (3, 10, 12)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.aslb')
+            write_bundle(path, layers, ['A', 'B', 'C', 'D', 'E'], sequence_length=10, features=12)
+            bundle = ModelBundle(path)
+            shared = bundle.shared_model()
+
+            self.assertEqual(shared.label_for(3), 'D')
+            self.assertEqual((shared.sequence_length, shared.features), (10, 12))
+            weights = next(iter(bundle.arrays.values()))
+            self.assertFalse(weights.flags.writeable)
+            self.assertFalse(weights.flags.owndata)
+            np.testing.assert_allclose(
+                shared.model.predict_on_batch(x),
+                NumpyLSTMModel(layers).predict_on_batch(x),
+                atol=1e-5,
+            )
+
+            predictor = ASLPredictor(shared_model=shared)
+            for _ in range(10):
+                predictor.push_frame(np.full(12, 0.5))
+            self.assertEqual(predictor.current_window().shape, (10, 12))
+            predictor.close()
+            del shared, bundle, weights, predictor
+
+    def test_build_bundle_with_leading_normalization(self):
+        rng = np.random.default_rng(6)
+        layers = [random_affine(rng, 12)] + random_improved_layers(rng)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.npz')
+            save_numpy_model(layers, path, classes=['A', 'B', 'C', 'D', 'E'])
+            bundle = ModelBundle(build_bundle(path))
+            self.assertEqual((bundle.sequence_length, bundle.features), (10, 12))
+            del bundle
+
+
+class FakeInterpreter:
+    """Interpreter API over a tiny model: per-window sum and mean of the inputs.
+
+    input_quantization/output_quantization make its tensors int8 with that
+    (scale, zero point); with resizable=False it only runs its fixed batch.
+    """
+
+    def __init__(self, batch=1, input_quantization=None, output_quantization=None, resizable=True):
+        self.input_quantization = input_quantization
+        self.output_quantization = output_quantization
+        self.resizable = resizable
+        self.shape = [batch, 10, 4]
+        self.fixed_batch = batch
+        self.invocations = []
+
+    def _dtype(self, quantization):
+        return np.int8 if quantization else np.float32
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': np.array(self.shape), 'dtype': self._dtype(self.input_quantization),
+                 'quantization': self.input_quantization or (0.0, 0)}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'shape': np.array([self.shape[0], 2]), 'dtype': self._dtype(self.output_quantization),
+                 'quantization': self.output_quantization or (0.0, 0)}]
+
+    def resize_tensor_input(self, index, shape):
+        if not self.resizable and shape[0] != self.fixed_batch:
+            raise RuntimeError('static batch')
+        self.shape = list(shape)
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.shape, dtype=self._dtype(self.input_quantization))
+
+    def tensor(self, index):
+        return lambda: self.input
+
+    def invoke(self):
+        x = self.input.astype(np.float32)
+        if self.input_quantization:
+            scale, zero_point = self.input_quantization
+            x = (x - zero_point) * scale
+        self.invocations.append(len(x))
+        flat = x.reshape(len(x), -1)
+        self.output = np.stack([flat.sum(axis=1), flat.mean(axis=1)], axis=1)
+        if self.output_quantization:
+            scale, zero_point = self.output_quantization
+            self.output = np.clip(np.round(self.output / scale + zero_point), -128, 127).astype(np.int8)
+
+    def get_tensor(self, index):
+        return self.output
+
+
+class TFLiteModelTests(SimpleTestCase):
+    def model(self, interpreter):
+        with mock.patch('ml_models.tflite_backend._make_interpreter', return_value=interpreter):
+            return TFLiteModel('model.tflite')
+
+    def expected(self, x):
+        flat = x.reshape(len(x), -1)
+        return np.stack([flat.sum(axis=1), flat.mean(axis=1)], axis=1)
+
+    def test_resizes_to_the_batch(self):
+        interpreter = FakeInterpreter()
+        x = np.random.default_rng(4).uniform(-1, 1, (5, 10, 4)).astype(np.float32)
+        np.testing.assert_allclose(self.model(interpreter).predict_on_batch(x), self.expected(x), rtol=1e-5)
+        self.assertEqual(interpreter.invocations, [5])
+
+    def test_static_batch_runs_padded_chunks(self):
+        interpreter = FakeInterpreter(batch=2, resizable=False)
+        x = np.random.default_rng(5).uniform(-1, 1, (5, 10, 4)).astype(np.float32)
+        model = self.model(interpreter)
+        np.testing.assert_allclose(model.predict_on_batch(x), self.expected(x), rtol=1e-5)
+        self.assertEqual(interpreter.invocations, [2, 2, 2])
+        self.assertFalse(model._resizable)
+        # The padding row of the last chunk is zeros
+        np.testing.assert_array_equal(interpreter.input[1], 0)
+
+    def test_quantizes_input_and_dequantizes_output(self):
+        model = self.model(FakeInterpreter(input_quantization=(0.1, 3), output_quantization=(0.5, -10)))
+        np.testing.assert_array_equal(model._quantize(np.array([1.0, 100.0, -100.0])), [13, 127, -128])
+        np.testing.assert_allclose(model._dequantize(np.array([-10, 0, 10], dtype=np.int8)), [0.0, 5.0, 10.0])
+
+        x = np.full((1, 10, 4), 0.1, dtype=np.float32)
+        # 0.1 is exact on the input grid; on the 0.5 output grid the sum 4.0 is
+        # exact and the mean 0.1 rounds to 0.0
+        np.testing.assert_allclose(model.predict_on_batch(x), [[4.0, 0.0]], atol=1e-6)
+
+
+class InferenceWorkerPoolTests(SimpleTestCase):
+    def test_pool_matches_model_and_survives_worker_crash(self):
+        rng = np.random.default_rng(3)
+        layers = fold_batch_norm(random_improved_layers(rng))
+        model = NumpyLSTMModel(layers)
+        x = rng.uniform(-1, 1, (6, 10, 12)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.aslb')
+            write_bundle(path, layers, ['A', 'B', 'C', 'D', 'E'], sequence_length=10, features=12)
+            pool = InferenceWorkerPool(path, num_workers=2, slots_per_worker=4).start()
+            try:
+                self.assertEqual(pool.shared_model.class_list, ['A', 'B', 'C', 'D', 'E'])
+                self.assertEqual((pool.seq_len, pool.features), (10, 12))
+
+                async def run_all():
+                    return await asyncio.gather(*(pool.submit(w) for w in x))
+
+                rows = asyncio.run(run_all())
+                np.testing.assert_allclose(np.stack(rows), model.predict_on_batch(x), atol=1e-5)
+
+                pool._workers[0].process.kill()
+                pool._workers[0].process.join()
+                rows = asyncio.run(run_all())
+                np.testing.assert_allclose(np.stack(rows), model.predict_on_batch(x), atol=1e-5)
+                self.assertEqual(pool.worker_stats()[0]['restarts'], 1)
+            finally:
+                pool.close()
+
+
+    def wait_for(self, condition, timeout=30):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def test_failed_restart_fails_requests_and_retries(self):
+        rng = np.random.default_rng(7)
+        layers = fold_batch_norm(random_improved_layers(rng))
+        x = rng.uniform(-1, 1, (10, 12)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.aslb')
+            write_bundle(path, layers, ['A', 'B', 'C', 'D', 'E'], sequence_length=10, features=12)
+            pool = InferenceWorkerPool(path, num_workers=1, slots_per_worker=4).start()
+            pool.restart_backoff = 0.05
+            worker = pool._workers[0]
+            try:
+                # The model cannot load any more, so the restart fails
+                os.rename(path, path + '.moved')
+                worker.process.kill()
+                self.wait_for(lambda: not worker.available and worker.restarts == 1)
+                with self.assertRaisesRegex(RuntimeError, 'No inference worker'):
+                    asyncio.run(pool.submit(x))
+
+                os.rename(path + '.moved', path)
+                self.wait_for(lambda: worker.available)
+                row = asyncio.run(pool.submit(x))
+                np.testing.assert_allclose(row, NumpyLSTMModel(layers).predict_on_batch(x[None])[0], atol=1e-5)
+            finally:
+                pool.close()
+
+    def test_stale_generation_does_not_resolve_a_reused_slot(self):
+        pool = InferenceWorkerPool('unused.aslb', num_workers=1)
+        pool.num_classes = 2
+        worker = _Worker(0)
+        worker.allocate(2, 1, 1, 2)
+        worker.available = True
+        pool._workers.append(worker)
+        # The restarted worker's late answer for generation 1, then the real one
+        results = [np.array([0, 0, 1], dtype=np.uint32), np.array([0, 0, 2], dtype=np.uint32)]
+
+        class Conn:
+            def recv_bytes(self):
+                if not results:
+                    raise EOFError
+                return results.pop(0).tobytes()
+
+        async def run():
+            pool._loop = asyncio.get_running_loop()
+            pool._slot_freed = asyncio.Event()
+            window = np.zeros((1, 1), dtype=np.float32)
+            first = pool._queue(window, pool._loop.create_future())
+            # The first request was answered (by a worker that then died) and
+            # its slot freed; the next request reuses the slot
+            worker.inflight.pop(first[1])
+            worker.free.append(first[1])
+            future = pool._loop.create_future()
+            _, slot, generation = pool._queue(window, future)
+            self.assertEqual((slot, generation), (first[1], first[2] + 1))
+            worker.responses[slot] = [0.25, 0.75]
+            threading.Thread(target=pool._read_results, args=(worker, Conn())).start()
+            row = await asyncio.wait_for(future, 5)
+            self.assertEqual(list(row), [0.25, 0.75])
+            self.assertEqual(pool.stats.as_dict()['batches'], 1)
+
+        try:
+            asyncio.run(run())
+        finally:
+            del worker.requests, worker.responses
+            worker.shm.close()
+            worker.shm.unlink()
+
+
+class LandmarkExtractionTests(SimpleTestCase):
+    def test_results_use_the_browser_layout(self):
+        hand = SimpleNamespace(landmark=[SimpleNamespace(x=i, y=i + 0.25, z=-i) for i in range(21)])
+        values, has_hands = landmarks_from_results(SimpleNamespace(multi_hand_landmarks=[hand]))
+        self.assertTrue(has_hands)
+        self.assertEqual(values.shape, (126,))
+        np.testing.assert_array_equal(values[3:6], [1, 1.25, -1])
+        self.assertFalse(values[63:].any())
+        values, has_hands = landmarks_from_results(SimpleNamespace(multi_hand_landmarks=None))
+        self.assertFalse(has_hands or values.any())
+
+    def outbox(self, worker):
+        messages = []
+        while not worker.outbox.empty():
+            messages.append(worker.outbox.get()[0])
+        return messages
+
+    def test_session_keeps_one_frame_in_flight_and_drops_stale_ones(self):
+        worker = _ExtractionWorker(0)
+        pool = SimpleNamespace(dropped=0, max_inflight_bytes=1024)
+        delivered = []
+
+        async def on_landmarks(landmarks, has_hands):
+            delivered.append(has_hands)
+
+        async def run():
+            session = ExtractionSession(pool, 7, worker, on_landmarks, queue_frames=1)
+            for frame in (b'a', b'b', b'c', b'd'):
+                session.submit(frame)
+            # 'a' went to the worker, 'd' waits, 'b' and 'c' were dropped
+            self.assertEqual(len(self.outbox(worker)), 1)
+            self.assertEqual((session.pending, session.dropped, pool.dropped), ([b'd'], 2, 2))
+            session._result(np.zeros(126, dtype=np.float32), False)
+            self.assertEqual(self.outbox(worker)[-1][-1:], b'd')
+            self.assertEqual(worker.inflight_bytes, 1)
+            await asyncio.sleep(0)
+            self.assertEqual(delivered, [False])
+
+        asyncio.run(run())
+
+    def test_blocked_pipe_never_blocks_submit_and_caps_bytes_per_worker(self):
+        unblock = threading.Event()
+        written = []
+
+        def send_bytes(message):
+            unblock.wait(5)
+            written.append(message)
+
+        pool = LandmarkExtractorPool(num_workers=1, max_inflight_bytes=10)
+        worker = _ExtractionWorker(0)
+        worker.requests_conn = SimpleNamespace(send_bytes=send_bytes)
+        threading.Thread(target=pool._write_requests, args=(worker,), daemon=True).start()
+
+        async def on_landmarks(landmarks, has_hands):
+            pass
+
+        async def run():
+            first = ExtractionSession(pool, 1, worker, on_landmarks, queue_frames=1)
+            second = ExtractionSession(pool, 2, worker, on_landmarks, queue_frames=1)
+            start = time.perf_counter()
+            first.submit(b'x' * 8)
+            second.submit(b'y' * 8)
+            self.assertLess(time.perf_counter() - start, 0.1)
+            # The second JPEG would put 16 bytes at the worker
+            self.assertEqual((worker.inflight_bytes, second.in_flight, second.dropped), (8, False, 1))
+            unblock.set()
+            first._result(np.zeros(126, dtype=np.float32), False)
+            second.submit(b'y' * 8)
+            self.assertEqual(worker.inflight_bytes, 8)
+
+        asyncio.run(run())
+        worker.outbox.put(None)
+
+    def test_failing_landmarks_callback_is_logged(self):
+        worker = _ExtractionWorker(0)
+        pool = SimpleNamespace(dropped=0, max_inflight_bytes=1024)
+
+        async def on_landmarks(landmarks, has_hands):
+            raise ValueError('group_send failed')
+
+        async def run():
+            session = ExtractionSession(pool, 3, worker, on_landmarks, queue_frames=1)
+            session.submit(b'a')
+            session._result(np.zeros(126, dtype=np.float32), True)
+            self.assertEqual(len(session.tasks), 1)
+            with mock.patch('builtins.print') as printed:
+                await asyncio.sleep(0.01)
+            self.assertFalse(session.tasks)
+            self.assertIn('group_send failed', printed.call_args[0][0])
+
+        asyncio.run(run())
+
+    def test_monitor_retries_a_failed_restart(self):
+        pool = LandmarkExtractorPool(num_workers=1)
+        pool.restart_backoff = 0.01
+        worker = _ExtractionWorker(0)
+        worker.process = pool.ctx.Process(target=time.sleep, args=(0,))
+        worker.process.start()
+        worker.requests_conn = mock.Mock()
+
+        attempts = []
+
+        def spawn(worker):
+            attempts.append(worker)
+            if len(attempts) == 1:
+                raise RuntimeError('no mediapipe')
+            pool._closing = True
+
+        with mock.patch.object(pool, '_spawn', side_effect=spawn):
+            pool._monitor(worker)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual((worker.restarts, worker.generation), (1, 1))
+
+    @unittest.skipIf(
+        importlib.util.find_spec('mediapipe') and importlib.util.find_spec('cv2'),
+        'MediaPipe is installed'
+    )
+    def test_pool_reports_missing_mediapipe(self):
+        with self.assertRaisesRegex(RuntimeError, 'Landmark extraction needs'):
+            LandmarkExtractorPool(num_workers=1).start()
@@ -0,0 +1,92 @@
+"""
+TFLite interpreter backend for ASLPredictor
+
+Runs a .tflite export of the sequence model (see export_tflite.py) through
+the lightweight tflite_runtime interpreter when it is installed, falling
+back to tf.lite otherwise. The interpreter's tensors are allocated once per
+batch size and reused between calls.
+"""
+
+import threading
+
+import numpy as np
+
+
+def _make_interpreter(model_path, num_threads=None):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite.python.interpreter import Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLiteModel:
+    """predict_on_batch wrapper around a TFLite interpreter"""
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.interpreter = _make_interpreter(model_path, num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # Some exports (fused LSTM with a static batch) cannot be resized;
+        # those run row by row at their fixed batch size
+        self._resizable = True
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size == self._batch_size or not self._resizable:
+            return
+        shape = list(self._input['shape'])
+        shape[0] = batch_size
+        try:
+            self.interpreter.resize_tensor_input(self._input['index'], shape)
+            self.interpreter.allocate_tensors()
+        except (RuntimeError, ValueError):
+            self._resizable = False
+            self.interpreter.resize_tensor_input(self._input['index'], list(self._input['shape']))
+            self.interpreter.allocate_tensors()
+            return
+        self._batch_size = batch_size
+
+    def _quantize(self, x):
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return x
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(dtype)
+        return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize(self, y):
+        if self._output['dtype'] == np.float32:
+            return y
+        scale, zero_point = self._output['quantization']
+        return (y.astype(np.float32) - zero_point) * scale
+
+    def _invoke(self, x):
+        # Write straight into the interpreter's input buffer
+        self.interpreter.tensor(self._input['index'])()[...] = self._quantize(x)
+        self.interpreter.invoke()
+        return self._dequantize(self.interpreter.get_tensor(self._output['index']))
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            self._resize(len(x))
+            if self._batch_size == len(x):
+                return self._invoke(x)
+            step = self._batch_size
+            rows = []
+            for i in range(0, len(x), step):
+                chunk = x[i:i + step]
+                if len(chunk) < step:
+                    pad = np.zeros((step - len(chunk),) + chunk.shape[1:], dtype=np.float32)
+                    rows.append(self._invoke(np.concatenate([chunk, pad]))[:len(chunk)])
+                else:
+                    rows.append(self._invoke(chunk))
+            return np.concatenate(rows)
+
+    def predict(self, x, verbose=0):
+        return self.predict_on_batch(x)
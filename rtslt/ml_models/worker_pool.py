@@ -0,0 +1,439 @@
+"""
+Inference worker processes behind shared-memory ring buffers
+
+With thread-based inference the model still competes with WebSocket I/O
+for the GIL, so one ASGI process uses about one core for ASL. In process
+mode windows are handed to a pool of inference worker processes instead:
+
+- each worker owns a shared-memory block holding a ring of request slots
+  (seq_len x features float32) and matching response rows, sized from the
+  model metadata the first worker reports when it starts
+- the ASGI process copies a window into a free slot and sends only the
+  slot id and the slot's generation (2 x uint32) down a pipe; nothing is
+  pickled
+- the worker drains every queued slot id, runs them as one batch, writes
+  the probabilities into the response rows and sends the ids back with
+  their generations
+- a reader thread per worker resolves the waiting asyncio futures, ignoring
+  results whose generation no longer matches the slot's request (a dead
+  worker's late answer for a slot that was re-sent and reused)
+- a monitor thread restarts a worker that dies and re-sends its in-flight
+  slots (their windows are still in shared memory), so sessions never see
+  the crash. If the restart fails, the worker's in-flight requests fail,
+  new ones go to the other workers, and the restart is retried with backoff
+
+Benchmark scaling with worker count:
+    python -m ml_models.worker_pool ml_models/saved_models/lstm_model.aslb
+"""
+
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_for_objects
+
+import numpy as np
+
+from .registry import SharedModel
+from .scheduler import BatchStats
+
+STOP = 0xFFFFFFFF
+# Seconds between restart attempts of a worker that fails to start, doubling
+# up to the maximum
+RESTART_BACKOFF_S = 0.5
+RESTART_BACKOFF_MAX_S = 30.0
+# First uint32 of every result message
+RESULT_OK = 0
+RESULT_ERROR = 1
+
+
+def _views(buf, slots, seq_len, features, max_classes):
+    requests = np.ndarray((slots, seq_len, features), dtype=np.float32, buffer=buf)
+    responses = np.ndarray(
+        (slots, max_classes), dtype=np.float32, buffer=buf, offset=requests.nbytes
+    )
+    return requests, responses
+
+
+def _worker_main(model_path, requests_conn, results_conn):
+    """Entry point of an inference worker process"""
+    from .inference import get_shared_model
+
+    shared = get_shared_model(model_path)
+
+    # Handshake: report model metadata so the parent never loads the model,
+    # then attach to the shared-memory block the parent sized from it
+    results_conn.send_bytes(json.dumps({
+        'classes': [str(c) for c in shared.class_list],
+        'sequence_length': shared.sequence_length,
+        'features': shared.features,
+        'scale': shared.scale,
+        'offset': shared.offset,
+    }).encode('utf-8'))
+    layout = json.loads(requests_conn.recv_bytes().decode('utf-8'))
+    max_classes = layout['max_classes']
+    shm = shared_memory.SharedMemory(name=layout['shm_name'])
+    requests, responses = _views(
+        shm.buf, layout['slots'], shared.sequence_length, shared.features, max_classes
+    )
+
+    try:
+        while True:
+            # (slot, generation) pairs; batch everything that is already queued
+            chunks = [np.frombuffer(requests_conn.recv_bytes(), dtype=np.uint32)]
+            while requests_conn.poll():
+                chunks.append(np.frombuffer(requests_conn.recv_bytes(), dtype=np.uint32))
+            pairs = np.concatenate(chunks).reshape(-1, 2)
+            ids = pairs[:, 0]
+            if (ids == STOP).any():
+                break
+            try:
+                probabilities = np.asarray(shared.model.predict_on_batch(requests[ids]), dtype=np.float32)
+                if probabilities.shape[1] > max_classes:
+                    raise ValueError(f'Model has {probabilities.shape[1]} classes, pool allows {max_classes}')
+                responses[ids, :probabilities.shape[1]] = probabilities
+                status = RESULT_OK
+            except Exception as e:
+                print(f"[Inference] worker batch failed: {e}")
+                status = RESULT_ERROR
+            results_conn.send_bytes(np.concatenate([[status], pairs.reshape(-1)]).astype(np.uint32).tobytes())
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del requests, responses
+        shm.close()
+
+
+class _Worker:
+    """Parent-side handle for one worker process and its shared memory"""
+
+    def __init__(self, index):
+        self.index = index
+        self.shm = None
+        self.requests = None
+        self.responses = None
+        self.free = []
+        # slot -> (future, queued_at, generation)
+        self.inflight = {}
+        # Bumped every time a slot takes a new request
+        self.generations = None
+        # False while the process is down or failing to restart
+        self.available = False
+        self.process = None
+        self.requests_conn = None
+        self.results_conn = None
+        self.restarts = 0
+
+    def allocate(self, slots, seq_len, features, max_classes):
+        nbytes = slots * (seq_len * features + max_classes) * 4
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.requests, self.responses = _views(self.shm.buf, slots, seq_len, features, max_classes)
+        self.free = list(range(slots - 1, -1, -1))
+        self.generations = np.zeros(slots, dtype=np.uint32)
+
+
+class InferenceWorkerPool:
+    """Pool of inference processes with an async submit() like BatchScheduler"""
+
+    def __init__(self, model_path, num_workers=None, slots_per_worker=64,
+                 max_classes=64, start_method='spawn'):
+        self.model_path = model_path
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.slots = slots_per_worker
+        self.max_classes = max_classes
+        # Filled in from the first worker's handshake
+        self.seq_len = None
+        self.features = None
+        self.ctx = mp.get_context(start_method)
+        self.shared_model = None
+        self.num_classes = None
+        self.stats = BatchStats()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closing = False
+        self._slot_freed = None
+        self._loop = None
+        self.restart_backoff = RESTART_BACKOFF_S
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start every worker and wait for their handshakes (blocking)"""
+        for i in range(self.num_workers):
+            worker = _Worker(i)
+            self._workers.append(worker)
+            self._spawn(worker)
+            worker.available = True
+            threading.Thread(target=self._monitor, args=(worker,), daemon=True,
+                             name=f'asl-worker-monitor-{i}').start()
+        return self
+
+    def _spawn(self, worker):
+        # Pipe(duplex=False) returns (receive end, send end)
+        requests_recv, requests_send = self.ctx.Pipe(duplex=False)
+        results_recv, results_send = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(self.model_path, requests_recv, results_send),
+            name=f'asl-inference-{worker.index}',
+            daemon=True,
+        )
+        process.start()
+        requests_recv.close()
+        results_send.close()
+        try:
+            self._attach(worker, process, requests_send, results_recv)
+        except BaseException:
+            process.kill()
+            process.join()
+            requests_send.close()
+            results_recv.close()
+            raise
+        threading.Thread(target=self._read_results, args=(worker, results_recv), daemon=True,
+                         name=f'asl-worker-reader-{worker.index}').start()
+
+    def _attach(self, worker, process, requests_send, results_recv):
+        """Handshake with a started worker process; raises if it fails to load the model"""
+        try:
+            meta = json.loads(results_recv.recv_bytes().decode('utf-8'))
+        except EOFError:
+            process.join(timeout=5)
+            raise RuntimeError(f'Inference worker exited during startup (code {process.exitcode})')
+        if self.shared_model is None:
+            if len(meta['classes']) > self.max_classes:
+                raise ValueError(f"Model has {len(meta['classes'])} classes, pool allows {self.max_classes}")
+            self.seq_len = meta['sequence_length']
+            self.features = meta['features']
+            self.num_classes = len(meta['classes'])
+            self.shared_model = SharedModel(
+                None, 'lstm', classes=meta['classes'],
+                sequence_length=meta['sequence_length'], features=meta['features'],
+                scale=meta['scale'], offset=meta['offset'],
+            )
+        if worker.shm is None:
+            worker.allocate(self.slots, self.seq_len, self.features, self.max_classes)
+        requests_send.send_bytes(json.dumps({
+            'shm_name': worker.shm.name, 'slots': self.slots, 'max_classes': self.max_classes,
+        }).encode('utf-8'))
+        # Publish the pipes only once the worker is attached, so slot ids
+        # submitted meanwhile fail over to the monitor's re-send
+        worker.process = process
+        worker.requests_conn = requests_send
+        worker.results_conn = results_recv
+
+    def _monitor(self, worker):
+        """Restart the worker whenever its process exits unexpectedly"""
+        while not self._closing:
+            wait_for_objects([worker.process.sentinel])
+            if self._closing:
+                return
+            worker.process.join()
+            print(f"[Inference] worker {worker.index} exited with code {worker.process.exitcode}; restarting")
+            with self._lock:
+                worker.available = False
+            try:
+                worker.results_conn.close()
+                worker.requests_conn.close()
+            except OSError:
+                pass
+            worker.restarts += 1
+            delay = self.restart_backoff
+            while not self._closing:
+                try:
+                    self._spawn(worker)
+                    break
+                except Exception as e:
+                    print(f"[Inference] worker {worker.index} failed to restart: {e}; retrying in {delay:.1f}s")
+                    self._fail_inflight(worker, RuntimeError(f'Inference worker {worker.index} is down: {e}'))
+                    time.sleep(delay)
+                    delay = min(delay * 2, RESTART_BACKOFF_MAX_S)
+            if self._closing:
+                return
+            # Windows for in-flight slots are still in shared memory
+            with self._lock:
+                pending = [(slot, entry[2]) for slot, entry in worker.inflight.items()]
+                worker.available = True
+            if pending:
+                worker.requests_conn.send_bytes(np.array(pending, dtype=np.uint32).tobytes())
+            if self._slot_freed is not None:
+                self._call_in_loop(self._slot_freed.set)
+
+    def _fail_inflight(self, worker, error):
+        """Fail every request waiting on a worker that is down"""
+        with self._lock:
+            done = [(future, error, queued) for future, queued, _ in worker.inflight.values()]
+            worker.free.extend(worker.inflight)
+            worker.inflight.clear()
+        if done:
+            self._call_in_loop(self._resolve, done)
+
+    def _call_in_loop(self, callback, *args):
+        """Run callback on the submitting event loop from a pool thread"""
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The loop is closed; nobody is waiting any more
+            pass
+
+    def close(self):
+        self._closing = True
+        for worker in self._workers:
+            try:
+                worker.requests_conn.send_bytes(np.array([STOP, 0], dtype=np.uint32).tobytes())
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            del worker.requests, worker.responses
+            worker.shm.close()
+            worker.shm.unlink()
+        self._workers = []
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def _read_results(self, worker, conn):
+        while True:
+            try:
+                message = np.frombuffer(conn.recv_bytes(), dtype=np.uint32)
+            except (EOFError, OSError):
+                return
+            failed, pairs = message[0] == RESULT_ERROR, message[1:].reshape(-1, 2)
+            done = []
+            with self._lock:
+                for slot, generation in pairs.tolist():
+                    entry = worker.inflight.get(slot)
+                    if entry is None or entry[2] != generation:
+                        continue
+                    future, queued, _ = worker.inflight.pop(slot)
+                    if failed:
+                        result = RuntimeError('Inference worker failed to run the batch')
+                    else:
+                        result = worker.responses[slot, :self.num_classes].copy()
+                    worker.free.append(slot)
+                    done.append((future, result, queued))
+            if done:
+                self._call_in_loop(self._resolve, done)
+
+    def _resolve(self, done):
+        now = time.perf_counter()
+        self.stats.record(len(done), [(now - queued) * 1000 for _, _, queued in done], 0.0)
+        for future, result, _ in done:
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        self._slot_freed.set()
+
+    def _queue(self, window, future):
+        """Claim a slot on the least busy running worker for window.
+
+        (worker, slot, generation), or None if every running worker is full;
+        raises RuntimeError if no worker is running.
+        """
+        with self._lock:
+            running = [w for w in self._workers if w.available]
+            if not running:
+                raise RuntimeError('No inference worker is running')
+            candidates = [w for w in running if w.free]
+            if not candidates:
+                return None
+            worker = min(candidates, key=lambda w: len(w.inflight))
+            slot = worker.free.pop()
+            worker.generations[slot] += 1
+            generation = int(worker.generations[slot])
+            worker.requests[slot] = window
+            worker.inflight[slot] = (future, time.perf_counter(), generation)
+            return worker, slot, generation
+
+    async def submit(self, window):
+        """Run one window on a worker process and return its probability row"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slot_freed = asyncio.Event()
+        future = loop.create_future()
+        queued = self._queue(window, future)
+        if queued is None:
+            # Every slot is busy: keep our own copy while we wait, the
+            # caller's window may be a view that changes meanwhile
+            window = np.array(window, dtype=np.float32)
+        while queued is None:
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+            queued = self._queue(window, future)
+
+        worker, slot, generation = queued
+        try:
+            worker.requests_conn.send_bytes(np.array([slot, generation], dtype=np.uint32).tobytes())
+        except (OSError, ValueError):
+            # Worker is being restarted; the monitor re-sends in-flight slots
+            # or fails them if the restart fails
+            pass
+        return await future
+
+    def worker_stats(self):
+        return [
+            {'worker': w.index, 'pid': w.process.pid, 'inflight': len(w.inflight), 'restarts': w.restarts,
+             'available': w.available}
+            for w in self._workers
+        ]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(model_path, num_workers=None, **kwargs):
+    """Process-wide worker pool, started on first use (blocking)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferenceWorkerPool(model_path, num_workers=num_workers, **kwargs).start()
+        return _pool
+
+
+def benchmark(model_path, worker_counts=(1, 2, 4), windows=2000, concurrency=64):
+    """Windows per second for each worker count"""
+    results = {}
+    for count in worker_counts:
+        pool = InferenceWorkerPool(model_path, num_workers=count).start()
+        rng = np.random.default_rng(0)
+        data = rng.uniform(-1, 1, (concurrency, pool.seq_len, pool.features)).astype(np.float32)
+
+        async def client(i, n):
+            for _ in range(n):
+                await pool.submit(data[i])
+
+        async def run():
+            per_client = windows // concurrency
+            start = time.perf_counter()
+            await asyncio.gather(*(client(i, per_client) for i in range(concurrency)))
+            return per_client * concurrency / (time.perf_counter() - start)
+
+        rate = asyncio.run(run())
+        pool.close()
+        results[count] = rate
+        print(f"  {count} worker(s): {rate:8.1f} windows/s")
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python -m ml_models.worker_pool <model.aslb|model.npz|model.h5> [max_workers]")
+        sys.exit(1)
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    counts = sorted({1, 2, 4, max_workers} & set(range(1, max_workers + 1)))
+    print(f"Inference worker pool throughput ({sys.argv[1]}):")
+    benchmark(sys.argv[1], counts)
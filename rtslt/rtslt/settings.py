@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -81,6 +82,97 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Several Daphne workers (`python -m rtslt.workers`) need a shared Redis
+# channel layer so chat/video rooms and the asl_<id> landmark group reach
+# peers on other workers. Set RTSLT_REDIS_URL (e.g. redis://127.0.0.1:6379/0)
+# to use it:
+# - capacity: messages waiting for one worker process before send() raises
+#   ChannelFull (relayed video frames are dropped then, as on the in-memory
+#   layer). Every socket's channel is a process-specific channel
+#   (specific.<worker>!<socket>) and channels-redis keeps all of a process's
+#   channels in one Redis key, so this is the budget of the whole worker,
+#   not of one socket: about 200 busy sockets per worker with a few frames
+#   or captions each. channel_capacity cannot split it further because it
+#   is checked against that same shared key.
+# - expiry: seconds an undelivered message lives; frames and captions older
+#   than a few seconds are useless, so they do not pile up in Redis
+# - group_expiry: seconds a group membership lives without its socket
+#   disconnecting (a killed worker), longer than any call
+REDIS_URL = os.environ.get('RTSLT_REDIS_URL')
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                'prefix': 'rtslt',
+                'capacity': 1000,
+                'expiry': 10,
+                'group_expiry': 6 * 3600,
+            },
+        }
+    }
+
+# Sequence model served by ASLConsumer. Point this at the .npz written by
+# `python -m ml_models.numpy_engine <model.h5>` to serve predictions with the
+# NumPy engine instead of TensorFlow, at a quantized .tflite written by
+# `python export_tflite.py` to use the TFLite interpreter, or at a .aslb
+# bundle from `python -m ml_models.bundle <model.npz>` to load weights,
+# classes and normalization with a single mmap.
+ASL_MODEL_PATH = 'ml_models/saved_models/lstm_model.h5'
+
+# The ML stack (NumPy, model backends, TensorFlow for .h5 models) is imported
+# on the first ASL connection. Workers started with RTSLT_ROLE=inference load
+# the model at startup instead so the first signer does not wait for it.
+ASL_PRELOAD_MODEL = os.environ.get('RTSLT_ROLE') == 'inference'
+
+# ASL inference micro-batching: windows from all connections are grouped
+# into one model call of at most ASL_BATCH_MAX_SIZE windows, waiting no
+# longer than ASL_BATCH_MAX_WAIT_MS for the batch to fill.
+ASL_BATCH_MAX_SIZE = 32
+ASL_BATCH_MAX_WAIT_MS = 5.0
+# Threads that run model calls so they never block the event loop
+ASL_INFERENCE_WORKERS = 2
+# 'thread' runs the model in this process; 'process' hands windows to
+# ASL_INFERENCE_PROCESSES worker processes over shared memory so inference
+# does not share the GIL with WebSocket I/O (defaults to one per CPU)
+ASL_INFERENCE_MODE = os.environ.get('RTSLT_INFERENCE_MODE', 'thread')
+ASL_INFERENCE_PROCESSES = int(os.environ.get('RTSLT_INFERENCE_PROCESSES', 0)) or None
+# Sessions per process in the preallocated landmark arena
+# (each slot costs 2 * 10 * 126 float32 values, about 10 KB)
+ASL_MAX_SESSIONS = 256
+# Skip the model while the hand is static: reuse the last probabilities when
+# the mean landmark change is below ASL_MOTION_THRESHOLD (normalized units),
+# but run it at least every ASL_MOTION_MIN_REFRESH_MS
+ASL_MOTION_GATING = True
+ASL_MOTION_THRESHOLD = 0.01
+ASL_MOTION_MIN_REFRESH_MS = 200.0
+# Cheap-first cascade: set ASL_CASCADE_MODEL_PATH to the baseline MLP
+# (e.g. 'ml_models/saved_models/baseline_mlp.pkl') to screen every frame with
+# it and only run the sequence model when the MLP's top probability is below
+# ASL_CASCADE_THRESHOLD or it disagrees with the current stable label
+ASL_CASCADE_MODEL_PATH = None
+ASL_CASCADE_THRESHOLD = 0.9
+
+# Relayed video frames waiting for a slow receiver; older ones are dropped
+VIDEO_SEND_QUEUE_FRAMES = 2
+# Receivers that ack (?acks=1) get at most VIDEO_MAX_UNACKED_FRAMES frames
+# ahead of their acks; a frame unacked after VIDEO_ACK_TIMEOUT_MS is lost
+VIDEO_MAX_UNACKED_FRAMES = 2
+VIDEO_ACK_TIMEOUT_MS = 2000
+
+# Congestion control: every VIDEO_CONTROL_INTERVAL_MS each receiver checks
+# relay latency and drops, and tells the sender to lower (or restore) its
+# resolution, JPEG quality and fps to keep p95 latency under the budget
+VIDEO_LATENCY_BUDGET_MS = 250
+VIDEO_CONTROL_INTERVAL_MS = 1000
+
+# Server-side MediaPipe landmark extraction for thin clients (video socket
+# with ?extract=1): worker processes (None = one per core) and how many
+# frames a session may have waiting before the oldest is dropped
+ASL_EXTRACTION_PROCESSES = int(os.environ.get('RTSLT_EXTRACTION_PROCESSES', 0)) or None
+ASL_EXTRACTION_QUEUE_FRAMES = 1
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
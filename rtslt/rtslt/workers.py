@@ -0,0 +1,163 @@
+"""
+Multi-process deployment: several Daphne workers on one Redis channel layer.
+
+Each worker is a plain `daphne rtslt.asgi:application` on its own port with
+RTSLT_REDIS_URL set, so chat/video rooms and the asl_<id> landmark group
+reach consumers on every worker (see CHANNEL_LAYERS in settings.py).
+
+ASL sessions are stateful: the sequence buffer, motion gating and server-side
+landmark extraction live in the worker holding the socket. The nginx config
+written with --nginx-conf hashes every /ws/ request on its ?self= id, so all
+sockets of one user (ASL, video, chat, or the single mux socket) and their
+reconnects land on the same worker. Adding or removing a worker only moves
+the users hashed to it.
+
+Usage (from the rtslt/ project directory):
+    python -m rtslt.workers --workers 4
+    python -m rtslt.workers --workers 4 --redis redis://10.0.0.5:6379/0 \\
+        --nginx-conf /etc/nginx/conf.d/rtslt.conf
+Without --redis a local redis-server is started on a free port.
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+NGINX_TEMPLATE = """\
+# Written by `python -m rtslt.workers`
+upstream rtslt_workers {{
+    # Session affinity: a user's sockets always reach the same worker
+    hash $arg_self consistent;
+{servers}
+}}
+
+map $http_upgrade $connection_upgrade {{
+    default upgrade;
+    ''      close;
+}}
+
+server {{
+    listen {listen};
+
+    location /ws/ {{
+        proxy_pass http://rtslt_workers;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection $connection_upgrade;
+        proxy_set_header Host $host;
+        proxy_read_timeout 1h;
+    }}
+
+    location / {{
+        proxy_pass http://rtslt_workers;
+        proxy_set_header Host $host;
+    }}
+}}
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, proc, timeout=30):
+    """Block until something listens on port; raises RuntimeError if proc exits first"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{proc.args[0]} exited with code {proc.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'Nothing listening on port {port} after {timeout}s')
+
+
+def start_redis(port, executable='redis-server'):
+    """Throwaway local redis-server without persistence"""
+    proc = subprocess.Popen(
+        [executable, '--port', str(port), '--bind', '127.0.0.1', '--save', '', '--appendonly', 'no'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    wait_for_port(port, proc)
+    return proc
+
+
+def start_worker(port, redis_url, host='127.0.0.1', quiet=False):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='rtslt.settings',
+        RTSLT_REDIS_URL=redis_url,
+    )
+    output = subprocess.DEVNULL if quiet else None
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', host, '-p', str(port), 'rtslt.asgi:application'],
+        cwd=ROOT, env=env, stdout=output, stderr=output,
+    )
+    wait_for_port(port, proc)
+    return proc
+
+
+def nginx_config(ports, listen=8000, host='127.0.0.1'):
+    servers = '\n'.join(f'    server {host}:{port};' for port in ports)
+    return NGINX_TEMPLATE.format(servers=servers, listen=listen)
+
+
+def stop(procs):
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Daphne workers on a shared Redis channel layer')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--base-port', type=int, default=8001, help='worker i listens on base-port + i')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--redis', help='redis:// URL of the channel layer (default: start a local redis-server)')
+    parser.add_argument('--nginx-conf', help='write an nginx config with per-user worker affinity here')
+    parser.add_argument('--listen', type=int, default=8000, help='port nginx listens on')
+    args = parser.parse_args()
+
+    procs = []
+    redis_url = args.redis
+    try:
+        if not redis_url:
+            port = free_port()
+            procs.append(start_redis(port))
+            redis_url = f'redis://127.0.0.1:{port}/0'
+            print(f"[Workers] redis-server on {redis_url}")
+        ports = [args.base_port + i for i in range(args.workers)]
+        for index, port in enumerate(ports):
+            procs.append(start_worker(port, redis_url, host=args.host))
+            print(f"[Workers] worker {index} on {args.host}:{port}")
+        if args.nginx_conf:
+            Path(args.nginx_conf).write_text(nginx_config(ports, args.listen, args.host))
+            print(f"[Workers] nginx config written to {args.nginx_conf}")
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        while all(proc.poll() is None for proc in procs):
+            time.sleep(1)
+        print("[Workers] a process exited, stopping")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop(procs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Import-time report for the ASGI entry point.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+summarizes the result: total wall time, the slowest top-level packages and
+whether the ML stack (numpy / tensorflow / sklearn) was pulled in.
+
+Usage (from the rtslt/ project directory):
+    python scripts/import_time_report.py                 # rtslt.asgi
+    python scripts/import_time_report.py rtslt.asgi --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+ML_PACKAGES = ['tensorflow', 'keras', 'numpy', 'sklearn', 'h5py', 'ml_models']
+
+
+def measure(module):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='rtslt.settings')
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ['']
+        raise SystemExit(f'import {module} failed: {tail[0]}')
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    cumulative = {}
+    self_by_top = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        self_us, cum_us, name = int(parts[0]), int(parts[1]), parts[2].strip()
+        cumulative[name] = cum_us
+        self_by_top[name.split('.')[0]] += self_us
+    return wall_ms, cumulative, self_by_top
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize python -X importtime for a module')
+    parser.add_argument('module', nargs='?', default='rtslt.asgi')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    wall_ms, cumulative, self_by_top = measure(args.module)
+
+    print('=' * 60)
+    print(f'IMPORT TIME: {args.module}')
+    print('=' * 60)
+    print(f'Interpreter wall time:  {wall_ms:8.1f} ms')
+    print(f'Cumulative import time: {cumulative.get(args.module, 0) / 1000:8.1f} ms')
+    print(f'Modules imported:       {len(cumulative):8d}')
+
+    print(f'\nSlowest top-level packages (self time):')
+    for name, us in sorted(self_by_top.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f'  {name:<28} {us / 1000:8.1f} ms')
+
+    print('\nML stack:')
+    for pkg in ML_PACKAGES:
+        times = [us for name, us in cumulative.items() if name == pkg or name.startswith(pkg + '.')]
+        detail = f'{max(times) / 1000:.1f} ms' if times else 'not imported'
+        print(f'  {pkg:<28} {detail}')
+
+
+if __name__ == '__main__':
+    main()
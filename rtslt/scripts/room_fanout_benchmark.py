@@ -0,0 +1,119 @@
+"""
+Room fan-out benchmark over real local WebSockets.
+
+Starts daphne on 127.0.0.1 and, for each room size, connects N clients to
+/ws/video/room/<room>/. One of them sends frames; the other N-1 receive
+every frame. Reported per room size and format:
+frames/s, copies delivered/s and server CPU per frame and per delivered
+copy (from /proc, Linux only).
+
+Usage (from the rtslt/ project directory):
+    python scripts/room_fanout_benchmark.py
+    python scripts/room_fanout_benchmark.py --sizes 2 8 16 --frames 500
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from translator.media import VIDEO_HEADER, FRAME_VIDEO, encode_video_frame  # noqa: E402
+from video_relay_benchmark import connect, cpu_seconds, free_port, start_server  # noqa: E402
+
+
+async def run_room(port, server_pid, fmt, size, frames, jpeg, window):
+    room = f'bench-{fmt}-{size}'
+    query = '&frames=binary' if fmt == 'binary' else ''
+    last_seq = [-1] * (size - 1)
+    delivered = 0
+    progress = asyncio.Event()
+
+    def on_message(index):
+        def handle(payload):
+            nonlocal delivered
+            if fmt == 'binary':
+                if payload[0] != FRAME_VIDEO:
+                    return
+                seq = VIDEO_HEADER.unpack_from(payload)[3]
+            else:
+                data = json.loads(payload)
+                if data.get('type') != 'frame':
+                    return
+                seq = int(data['frame_data'].rsplit(',', 1)[1][:8], 16)
+            last_seq[index] = max(last_seq[index], seq)
+            delivered += 1
+            progress.set()
+        return handle
+
+    receivers = [
+        await connect(port, f'/ws/video/room/{room}/?self=r{i}{query}', on_message(i))
+        for i in range(size - 1)
+    ]
+    sender = await connect(port, f'/ws/video/room/{room}/?self=sender{query}')
+    await asyncio.sleep(0.3)
+
+    def message(seq):
+        if fmt == 'binary':
+            return encode_video_frame(seq, jpeg), True
+        # The sequence number rides in front of the base64 data for the receivers
+        frame_data = 'data:image/jpeg;base64,' + f'{seq:08x}' + base64.b64encode(jpeg).decode('ascii')
+        return json.dumps({'type': 'frame', 'frame_data': frame_data}).encode('utf-8'), False
+
+    cpu_start, start = cpu_seconds(server_pid), time.perf_counter()
+    for seq in range(frames):
+        while seq - min(last_seq) > window:
+            progress.clear()
+            await asyncio.wait_for(progress.wait(), timeout=10)
+        data, is_binary = message(seq)
+        sender.sendMessage(data, isBinary=is_binary)
+    while min(last_seq) < frames - 1:
+        progress.clear()
+        await asyncio.wait_for(progress.wait(), timeout=10)
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds(server_pid) - cpu_start
+
+    for client in receivers + [sender]:
+        client.sendClose()
+    await asyncio.sleep(0.3)
+    return frames / elapsed, delivered / elapsed, cpu / frames * 1000, cpu / max(delivered, 1) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure video fan-out cost as a room grows')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 4, 8, 12, 16])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--jpeg-kb', type=int, default=20)
+    parser.add_argument('--window', type=int, default=1, help='frames in flight')
+    parser.add_argument('--formats', nargs='+', default=['binary', 'json'])
+    args = parser.parse_args()
+
+    jpeg = b'\xff\xd8' + os.urandom(args.jpeg_kb * 1024 - 4) + b'\xff\xd9'
+    port = free_port()
+    server = start_server(port)
+    try:
+        results = []
+        for fmt in args.formats:
+            for size in args.sizes:
+                results.append((fmt, size, asyncio.run(
+                    run_room(port, server.pid, fmt, size, args.frames, jpeg, args.window)
+                )))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print('=' * 72)
+    print(f'ROOM FAN-OUT ({args.frames} frames, {args.jpeg_kb} KB JPEG, window {args.window})')
+    print('=' * 72)
+    print(f'{"format":<8} {"size":>4} {"frames/s":>10} {"copies/s":>10} {"CPU ms/frame":>13} {"CPU ms/copy":>12}')
+    for fmt, size, (rate, copies, ms_frame, ms_copy) in results:
+        print(f'{fmt:<8} {size:4d} {rate:10.1f} {copies:10.1f} {ms_frame:13.3f} {ms_copy:12.3f}')
+
+
+if __name__ == '__main__':
+    main()
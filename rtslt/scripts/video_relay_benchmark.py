@@ -0,0 +1,150 @@
+"""
+Video relay benchmark over real local WebSockets.
+
+Starts daphne on 127.0.0.1, connects a sender and a receiver to
+/ws/video/<peer>/ and pushes the same JPEG-sized payload through the relay
+in both formats:
+
+- json     {"type": "frame", "frame_data": "data:image/jpeg;base64,..."}
+- binary   8-byte header + raw JPEG bytes (?frames=binary)
+
+The sender keeps at most --window frames in flight. Reported per format:
+relayed frames/s, bytes on the wire per frame and server CPU ms per frame
+(from /proc, Linux only).
+
+Usage (from the rtslt/ project directory):
+    python scripts/video_relay_benchmark.py
+    python scripts/video_relay_benchmark.py --frames 2000 --jpeg-kb 30
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from autobahn.asyncio.websocket import WebSocketClientFactory, WebSocketClientProtocol
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from translator.media import encode_video_frame  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='rtslt.settings')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port), 'rtslt.asgi:application'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit('daphne did not start')
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class Client(WebSocketClientProtocol):
+    def onOpen(self):
+        self.factory.opened.set_result(self)
+
+    def onMessage(self, payload, is_binary):
+        self.factory.on_message(payload)
+
+
+async def connect(port, path, on_message=None):
+    loop = asyncio.get_running_loop()
+    factory = WebSocketClientFactory(f'ws://127.0.0.1:{port}{path}')
+    factory.protocol = Client
+    factory.opened = loop.create_future()
+    factory.on_message = on_message or (lambda payload: None)
+    await loop.create_connection(factory, '127.0.0.1', port)
+    return await factory.opened
+
+
+async def run_format(port, server_pid, fmt, frames, jpeg, window):
+    received = 0
+    progress = asyncio.Event()
+
+    def on_message(payload):
+        nonlocal received
+        received += 1
+        progress.set()
+
+    query = '&frames=binary' if fmt == 'binary' else ''
+    receiver = await connect(port, f'/ws/video/alice/?self=bob{query}', on_message)
+    sender = await connect(port, f'/ws/video/bob/?self=alice{query}')
+    await asyncio.sleep(0.2)
+
+    if fmt == 'binary':
+        message, is_binary = encode_video_frame(0, jpeg), True
+    else:
+        frame_data = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+        message, is_binary = json.dumps({'type': 'frame', 'frame_data': frame_data}).encode('utf-8'), False
+
+    cpu_start, start = cpu_seconds(server_pid), time.perf_counter()
+    for sent in range(frames):
+        while sent - received >= window:
+            progress.clear()
+            await progress.wait()
+        sender.sendMessage(message, isBinary=is_binary)
+    while received < frames:
+        progress.clear()
+        await asyncio.wait_for(progress.wait(), timeout=10)
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds(server_pid) - cpu_start
+
+    sender.sendClose()
+    receiver.sendClose()
+    await asyncio.sleep(0.2)
+    return frames / elapsed, len(message), cpu / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON/base64 and binary video relay')
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--jpeg-kb', type=int, default=20)
+    parser.add_argument('--window', type=int, default=8, help='frames in flight')
+    args = parser.parse_args()
+
+    jpeg = b'\xff\xd8' + os.urandom(args.jpeg_kb * 1024 - 4) + b'\xff\xd9'
+    port = free_port()
+    server = start_server(port)
+    try:
+        results = {}
+        for fmt in ('json', 'binary'):
+            results[fmt] = asyncio.run(run_format(port, server.pid, fmt, args.frames, jpeg, args.window))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print('=' * 60)
+    print(f'VIDEO RELAY ({args.frames} frames, {args.jpeg_kb} KB JPEG, window {args.window})')
+    print('=' * 60)
+    print(f'{"format":<8} {"frames/s":>10} {"bytes/frame":>12} {"server CPU ms/frame":>20}')
+    for fmt, (rate, size, cpu_ms) in results.items():
+        print(f'{fmt:<8} {rate:10.1f} {size:12d} {cpu_ms:20.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Landmark wire format benchmark.
+
+Encodes a synthetic hand-motion stream with every ASL wire format and
+reports bytes per frame, server decode cost per frame and reconstruction
+error:
+
+- json      {"type": "landmarks", "landmarks": [...]} text frames
+- float32   binary FRAME_LANDMARKS
+- batch3    binary FRAME_BATCH with 3 frames per message
+- q16       quantized keyframes + int8 deltas (?encoding=q16)
+
+Usage (from the rtslt/ project directory):
+    python scripts/wire_format_benchmark.py
+    python scripts/wire_format_benchmark.py --frames 3000 --step 0.004
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from translator import wire  # noqa: E402
+
+
+def synthetic_stream(frames, step, seed=0):
+    """Random-walk landmarks in [0, 1], roughly a moving hand at 20 fps"""
+    rng = np.random.default_rng(seed)
+    current = rng.uniform(0.2, 0.8, wire.LANDMARK_VALUES)
+    out = np.empty((frames, wire.LANDMARK_VALUES))
+    for i in range(frames):
+        current = np.clip(current + rng.normal(0, step, wire.LANDMARK_VALUES), 0, 1)
+        out[i] = current
+    return out
+
+
+def encode_all(stream):
+    messages = {
+        'json': [json.dumps({'type': 'landmarks', 'landmarks': f.tolist(), 'has_hands': True}) for f in stream],
+        'float32': [wire.encode_landmark_frame(i, f) for i, f in enumerate(stream)],
+        'batch3': [
+            wire.encode_landmark_batch(i, np.arange(i, i + len(stream[i:i + 3]), dtype=float), list(stream[i:i + 3]))
+            for i in range(0, len(stream), 3)
+        ],
+    }
+    encoder = wire.QuantizedFrameEncoder()
+    messages['q16'] = [encoder.encode(i, f) for i, f in enumerate(stream)]
+    return messages
+
+
+def decoders():
+    q16 = wire.QuantizedFrameDecoder()
+    return {
+        'json': lambda m: [np.array(json.loads(m)['landmarks'], dtype=np.float32)],
+        'float32': lambda m: [wire.decode_landmark_frame(m)[1]],
+        'batch3': lambda m: wire.decode_landmark_batch(m)[2],
+        'q16': lambda m: [q16.decode(m)[1]],
+    }
+
+
+def measure(stream, repeats):
+    messages = encode_all(stream)
+    rows = []
+    for name, decode in decoders().items():
+        msgs = messages[name]
+        size = sum(len(m) for m in msgs) / len(stream)
+        decoded = np.concatenate([np.stack(decode(m)) for m in msgs])
+        error = float(np.abs(decoded - stream).max())
+        best = float('inf')
+        for _ in range(repeats):
+            decode = decoders()[name]
+            start = time.perf_counter()
+            for m in msgs:
+                decode(m)
+            best = min(best, time.perf_counter() - start)
+        rows.append((name, size, best / len(stream) * 1e6, error))
+    keyframes = sum(1 for m in messages['q16'] if m[0] == wire.FRAME_Q16_KEY)
+    return rows, keyframes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ASL landmark wire formats')
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--step', type=float, default=0.004, help='per-frame landmark motion (std dev)')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    stream = synthetic_stream(args.frames, args.step)
+    rows, keyframes = measure(stream, args.repeats)
+
+    print('=' * 60)
+    print(f'LANDMARK WIRE FORMATS ({args.frames} frames, step {args.step})')
+    print('=' * 60)
+    print(f'{"format":<10} {"bytes/frame":>12} {"decode us/frame":>16} {"max error":>12}')
+    for name, size, us, error in rows:
+        print(f'{name:<10} {size:12.1f} {us:16.2f} {error:12.2e}')
+    print(f'\nq16 keyframes: {keyframes} of {args.frames} frames')
+
+
+if __name__ == '__main__':
+    main()
@@ -121,6 +121,19 @@ def train_improved_lstm(X, y, sequence_length=10, model_path='ml_models/saved_mo
         X_train, y_train, test_size=0.15, random_state=42, stratify=y_train
     )
     
+    # Keep the held-out windows (and calibration windows from the training
+    # set) for export_tflite.py: augmentation is random, so this split cannot
+    # be rebuilt from the landmark pickle later
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    split_path = model_path.replace('.h5', '_split.npz')
+    calibration = np.random.default_rng(42).choice(len(X_train), size=min(200, len(X_train)), replace=False)
+    np.savez_compressed(
+        split_path,
+        X_test=X_test.astype(np.float32), y_test=y_test,
+        X_calibration=X_train[calibration].astype(np.float32)
+    )
+    print(f"✓ Held-out split saved to: {split_path}")
+    
     # One-hot encode labels
     num_classes = len(le.classes_)
     y_train_cat = to_categorical(y_train, num_classes)
@@ -0,0 +1,144 @@
+"""
+Message codecs for the WebSocket consumers
+
+A client picks the encoding of control messages, chat messages and relayed
+events with the WebSocket subprotocol it offers on connect:
+
+    new WebSocket(url, ['rtslt.msgpack', 'rtslt.json'])
+
+The first offered subprotocol the server supports wins. Clients that offer
+none get JSON text frames, as before. msgpack messages travel as binary
+frames.
+
+Group events carry their payload already encoded (`encode_all`), so a
+message relayed to N receivers is serialized once per codec instead of once
+per receiver. Only codecs a client of this process has negotiated are
+encoded, so JSON-only traffic is serialized once. A receiver whose codec
+is missing from an event (its sender runs in another worker process)
+transcodes one of the payloads.
+"""
+
+import json
+
+from channels.exceptions import ChannelFull
+
+try:
+    import msgpack
+except ImportError:  # JSON only
+    msgpack = None
+
+
+class JSONCodec:
+    name = 'json'
+    subprotocol = 'rtslt.json'
+    binary = False
+
+    def encode(self, message):
+        return json.dumps(message)
+
+    def decode(self, data):
+        return json.loads(data)
+
+    def claims(self, data):
+        """True if a binary frame is a codec message rather than raw data"""
+        return False
+
+
+class MsgpackCodec:
+    name = 'msgpack'
+    subprotocol = 'rtslt.msgpack'
+    binary = True
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+    def claims(self, data):
+        # Messages are maps: fixmap (0x80-0x8f), map16 (0xde) or map32 (0xdf).
+        # Binary landmark and video frames start with a small type byte.
+        return bool(data) and (0x80 <= data[0] <= 0x8f or data[0] in (0xde, 0xdf))
+
+
+JSON = JSONCodec()
+CODECS = [JSON] + ([MsgpackCodec()] if msgpack is not None else [])
+BY_SUBPROTOCOL = {codec.subprotocol: codec for codec in CODECS}
+BY_NAME = {codec.name: codec for codec in CODECS}
+
+# Codecs negotiated by any connection of this process so far
+_negotiated = {JSON.name}
+
+
+def negotiate(scope):
+    """(codec, subprotocol to accept or None) for a WebSocket scope"""
+    for offered in scope.get('subprotocols') or []:
+        if offered in BY_SUBPROTOCOL:
+            codec = BY_SUBPROTOCOL[offered]
+            _negotiated.add(codec.name)
+            return codec, offered
+    return JSON, None
+
+
+def encode_all(message):
+    """Payloads for a group event, keyed by codec name, for the codecs in use"""
+    return {codec.name: codec.encode(message) for codec in CODECS if codec.name in _negotiated}
+
+
+def payload_for(payloads, codec):
+    """An event's payload in `codec`, transcoded from another codec if missing"""
+    payload = payloads.get(codec.name)
+    if payload is None:
+        name, other = next(iter(payloads.items()))
+        payload = codec.encode(BY_NAME[name].decode(other))
+    return payload
+
+
+class CodecMixin:
+    """Negotiated encode/decode helpers for AsyncWebsocketConsumer subclasses"""
+
+    codec = JSON
+
+    async def accept_with_codec(self):
+        self.codec, subprotocol = negotiate(self.scope)
+        await self.accept(subprotocol=subprotocol)
+
+    def decode_message(self, text_data=None, bytes_data=None):
+        # Text frames are JSON whatever was negotiated
+        if bytes_data is not None:
+            return self.codec.decode(bytes_data)
+        return json.loads(text_data or '{}')
+
+    async def send_message(self, message):
+        await self.send_encoded(self.codec.encode(message))
+
+    async def send_encoded(self, payload):
+        if isinstance(payload, bytes):
+            await self.send(bytes_data=payload)
+        else:
+            await self.send(text_data=payload)
+
+    async def send_event_payload(self, event):
+        """Send a group event's pre-encoded payload in this client's codec"""
+        await self.send_encoded(payload_for(event['payloads'], self.codec))
+
+    async def group_send_message(self, group, handler, message, **routing):
+        """group_send `message` encoded once per codec; routing keys stay plain"""
+        await self.channel_layer.group_send(group, {
+            'type': handler,
+            'payloads': encode_all(message),
+            **routing,
+        })
+
+    async def channel_send_message(self, channel, handler, message, **routing):
+        """Like group_send_message, for one channel"""
+        await self.channels_send_message([channel], handler, message, **routing)
+
+    async def channels_send_message(self, channels, handler, message, **routing):
+        """Send `message`, encoded once, to each of `channels`; full channels are skipped"""
+        event = {'type': handler, 'payloads': encode_all(message), **routing}
+        for channel in channels:
+            try:
+                await self.channel_layer.send(channel, event)
+            except ChannelFull:
+                pass
@@ -1,106 +1,295 @@
 import json
+import time
 import asyncio
-import numpy as np
+import functools
+from django.conf import settings
+from channels.exceptions import ChannelFull
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.consumer import get_handler_name
 from django.contrib.auth.models import AnonymousUser
 from asgiref.sync import sync_to_async
-from urllib.parse import parse_qs
-from ml_models.inference import ASLPredictor
+from urllib.parse import parse_qs, urlencode
+from .codecs import CodecMixin, negotiate
+from . import media, mux, signaling
 from .models import UserProfile, ChatMessage
 
-class ASLConsumer(AsyncWebsocketConsumer):
+
+def room_name(prefix, current_id, target_id):
+    """Symmetric room name shared by both peers, e.g. chat_<a>_<b>"""
+    ids = sorted([current_id or 'anon', target_id])
+    return f"{prefix}_{ids[0]}_{ids[1]}"
+
+
+def group_room_name(prefix, room_id):
+    """Group of an N-party room, e.g. video_room_<room_id>"""
+    return f"{prefix}_room_{room_id}"
+
+
+def asl_group(current_id):
+    """Group of a user's ASL sockets; server-extracted landmarks go here"""
+    return f"asl_{current_id}"
+
+
+class ASLConsumer(CodecMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for real-time ASL translation"""
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.predictor = None
+        self.scheduler = None
         self.current_id = None
+        # Chat room captions are routed to (?target= peer or ?room= N-party room)
+        self.chat_room = None
+        # Newest ready window waiting for inference; older ones are dropped
+        self.mailbox = None
+        self.inference_task = None
+        # Bumped on reset so results for windows queued before it are ignored
+        self.generation = 0
+        # Binary landmark encoding negotiated with ?encoding= ('float32' or 'q16')
+        self.encoding = 'float32'
+        self.frame_decoder = None
+        self.keyframe_requested = False
     
     async def connect(self):
-        # Get current user's ID from query string
+        # Get current user's ID, target peer and landmark encoding from query string
         try:
             qs = parse_qs((self.scope.get('query_string') or b'').decode())
             self.current_id = qs.get('self', [None])[0]
+            target_id = qs.get('target', [None])[0]
+            room_id = qs.get('room', [None])[0]
+            if room_id:
+                self.chat_room = group_room_name('chat', room_id)
+            elif self.current_id and target_id:
+                self.chat_room = room_name('chat', self.current_id, target_id)
+            self.encoding = qs.get('encoding', ['float32'])[0]
         except Exception:
             pass
         
-        await self.accept()
+        await self.accept_with_codec()
+        if self.current_id:
+            await self.channel_layer.group_add(asl_group(self.current_id), self.channel_name)
         
         # Initialize predictor
         try:
-            # Use the trained model
-            self.predictor = ASLPredictor(
-                model_path='ml_models/saved_models/lstm_model.h5',
-                label_encoder_path='ml_models/saved_models/lstm_model_label_encoder.pkl',
-                model_type='lstm'
-            )
+            # Import the ML stack on first ASL use so HTTP/chat-only workers
+            # never pay for it
+            from ml_models.session import open_asl_session
+            from . import wire
+            self.predictor, self.scheduler, self.mailbox = await open_asl_session(settings)
+            self.inference_task = asyncio.create_task(self._inference_loop())
+            
+            # Unknown encodings fall back to float32; the reply tells the
+            # client which one is in effect
+            if self.encoding not in wire.ENCODINGS:
+                self.encoding = wire.ENCODING_FLOAT32
+            if self.encoding == wire.ENCODING_Q16:
+                self.frame_decoder = wire.QuantizedFrameDecoder()
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'connection',
                 'status': 'connected',
-                'message': 'ASL Translator ready'
-            }))
+                'message': 'ASL Translator ready',
+                'encoding': self.encoding
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Failed to load model: {str(e)}'
-            }))
+            })
     
     async def disconnect(self, close_code):
-        pass
+        if self.current_id:
+            await self.channel_layer.group_discard(asl_group(self.current_id), self.channel_name)
+        if self.inference_task is not None:
+            self.inference_task.cancel()
+        if self.predictor is not None:
+            self.predictor.close()
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Receive landmarks from client and send prediction to chat room"""
         try:
-            data = json.loads(text_data)
+            if bytes_data is not None and not self.codec.claims(bytes_data):
+                # Binary landmark frame(s); NumPy is already loaded by connect()
+                from . import wire
+                msg_type = wire.message_type(bytes_data)
+                if msg_type == wire.FRAME_BATCH:
+                    _, timestamps, frames = wire.decode_landmark_batch(bytes_data)
+                    await self._handle_frames(frames, float(timestamps[-1]) if frames else None)
+                elif msg_type in (wire.FRAME_Q16_KEY, wire.FRAME_Q16_DELTA):
+                    if self.frame_decoder is None:
+                        raise wire.WireError('Quantized frames need ?encoding=q16 on connect')
+                    try:
+                        _, landmarks = self.frame_decoder.decode(bytes_data)
+                    except wire.MissingKeyframe:
+                        # Ask once; deltas are dropped until the keyframe arrives
+                        if not self.keyframe_requested:
+                            self.keyframe_requested = True
+                            await self.send_message({'type': 'keyframe_request'})
+                        return
+                    self.keyframe_requested = False
+                    await self._handle_frames([landmarks])
+                else:
+                    _, landmarks = wire.decode_landmark_frame(bytes_data)
+                    await self._handle_frames([landmarks])
+                return
+            
+            data = self.decode_message(text_data, bytes_data)
             
             if data['type'] == 'landmarks':
-                has_hands = data.get('has_hands', True)
-                
                 # If no hands detected, reset buffer and don't predict
-                if not has_hands:
-                    self.predictor.reset_sequence()
-                    return
-                
-                landmarks = np.array(data['landmarks'])
-                
-                # Make prediction
-                label, confidence, latency = self.predictor.predict(landmarks, has_hands=True)
-                
-                if label is not None and confidence > 0.70:  # Higher threshold for better accuracy
-                    # Send to chat room for broadcasting
-                    if self.current_id:
-                        # Create room name based on sorted IDs (same as ChatConsumer)
-                        # For now, just send back to client and let chat handle broadcasting
-                        await self.send(text_data=json.dumps({
-                            'type': 'prediction',
-                            'label': label,
-                            'confidence': confidence,
-                            'latency': latency
-                        }))
+                has_hands = data.get('has_hands', True)
+                await self._handle_frames([data['landmarks'] if has_hands else None], data.get('t'))
+            
+            elif data['type'] == 'landmark_batch':
+                # Several consecutive frames, oldest first, each with its
+                # capture time 't'
+                frames = data['frames']
+                await self._handle_frames(
+                    [f['landmarks'] if f.get('has_hands', True) else None for f in frames],
+                    frames[-1].get('t') if frames else None
+                )
+            
+            elif data['type'] == 'stats':
+                await self.send_message({
+                    'type': 'stats',
+                    'batching': self.scheduler.stats.as_dict(),
+                    'dropped_frames': self.mailbox.dropped,
+                    'inferred_frames': self.mailbox.delivered,
+                    'process_dropped_frames': type(self.mailbox).total_dropped,
+                    'motion_gate': self.predictor.gate.stats() if self.predictor.gate else None,
+                    'cascade': self.predictor.cascade_stats.as_dict() if self.predictor.cascade_stats else None
+                })
             
             elif data['type'] == 'reset':
-                self.predictor.reset_sequence()
-                await self.send(text_data=json.dumps({
+                self._reset()
+                await self.send_message({
                     'type': 'reset_confirmed'
-                }))
+                })
         
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': str(e)
-            }))
+            })
+    
+    async def asl_landmarks(self, event):
+        """Landmarks the server extracted from this user's video frames"""
+        if self.predictor is None:
+            return
+        import numpy as np
+        landmarks = event['landmarks']
+        await self._handle_landmarks(None if landmarks is None else np.frombuffer(landmarks, dtype=np.float32))
+
+    async def _handle_frames(self, frames, captured_at=None):
+        """Buffer frames in order (None = no hands); evaluate only the newest window.
+        
+        captured_at is the client's capture time of the last frame and is
+        echoed back with the prediction it produces.
+        """
+        if not frames:
+            return
+        for landmarks in frames[:-1]:
+            if landmarks is None:
+                self._reset()
+            else:
+                self.predictor.push_frame(landmarks)
+        await self._handle_landmarks(frames[-1], captured_at)
+    
+    async def _handle_landmarks(self, landmarks, captured_at=None):
+        """Buffer one frame (None = no hands) and queue the newest window"""
+        if landmarks is None:
+            self._reset()
+            return
+        
+        # Buffer the frame and hand the newest full window to the
+        # inference task; receive() never waits on the model
+        if self.predictor.push_frame(landmarks):
+            start_time = time.time()
+            # A confident single-frame MLP that agrees with the
+            # stable label answers without the sequence model
+            screened = self.predictor.screen_frame(landmarks)
+            if screened is not None:
+                result = self.predictor.update_from_probabilities(screened, start_time)
+                self.predictor.record_cascade(False, start_time)
+                await self._send_prediction(*result, captured_at)
+                return
+            # While the pose is static the motion gate hands back
+            # the last probabilities and the model is skipped
+            cached = self.predictor.cached_probabilities()
+            if cached is not None:
+                result = self.predictor.update_from_probabilities(cached, start_time)
+                self.predictor.record_reuse(start_time)
+                await self._send_prediction(*result, captured_at)
+            else:
+                # Snapshot: the arena row holding timestep 0 is overwritten
+                # by the next frame, which may arrive before the batch runs
+                window = self.predictor.current_window().copy()
+                # The gate's reference pose moves to this frame only once
+                # the window's result is back
+                self.mailbox.put((self.generation, start_time, captured_at, window, window[-1]))
+    
+    def _reset(self):
+        self.generation += 1
+        self.mailbox.clear()
+        self.predictor.reset_sequence()
+    
+    async def _inference_loop(self):
+        """Run the newest pending window through the batch scheduler"""
+        while True:
+            generation, start_time, captured_at, window, frame = await self.mailbox.get()
+            try:
+                probabilities = await self.scheduler.submit(window)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self.send_message({
+                    'type': 'error',
+                    'message': str(e)
+                })
+                continue
+            # Discard results for windows that predate a reset
+            if generation != self.generation:
+                continue
+            self.predictor.record_inference(probabilities, frame)
+            result = self.predictor.update_from_probabilities(probabilities, start_time)
+            self.predictor.record_cascade(True, start_time)
+            await self._send_prediction(*result, captured_at)
+    
+    async def _send_prediction(self, label, confidence, latency, captured_at=None):
+        if label is not None and confidence > 0.70:  # Higher threshold for better accuracy
+            if self.current_id:
+                message = {
+                    'type': 'prediction',
+                    'label': label,
+                    'confidence': confidence,
+                    'latency': latency
+                }
+                if captured_at is not None:
+                    message['captured_at'] = captured_at
+                await self.send_message(message)
+            # Caption the peer directly: same event ChatConsumer sends when a
+            # client relays a prediction, without the extra client round trip
+            if self.chat_room:
+                await self.group_send_message(self.chat_room, 'asl.prediction', {
+                    'type': 'asl_prediction',
+                    'label': label,
+                    'confidence': confidence,
+                    'sender': self.current_id,
+                }, sender_id=self.current_id)
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(CodecMixin, AsyncWebsocketConsumer):
     """Simple chat consumer joining a room derived from two user random IDs.
-    Connect to ws/chat/<target_random_id>/ while authenticated.
+    Connect to ws/chat/<target_random_id>/ while authenticated, or to
+    ws/chat/room/<room_id>/ for an N-party room. Room messages are not
+    echoed back to their sender.
     """
 
     async def connect(self):
         self.scope_user = self.scope.get('user')
         target_id = self.scope['url_route']['kwargs'].get('target_id')
-        if not target_id:
+        self.room_id = self.scope['url_route']['kwargs'].get('room_id')
+        if not target_id and not self.room_id:
             await self.close()
             return
         # Resolve current user's random id (or anonymous); allow override via ?self=
@@ -114,20 +303,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
             pass
         if not self.current_id:
             self.current_id = await self._get_current_random_id()
-        # Create symmetric room name
-        ids = sorted([self.current_id or 'anon', target_id])
-        self.room_name = f"chat_{ids[0]}_{ids[1]}"
+        if self.room_id:
+            self.room_name = group_room_name('chat', self.room_id)
+        else:
+            # Create symmetric room name
+            self.room_name = room_name('chat', self.current_id, target_id)
         await self.channel_layer.group_add(self.room_name, self.channel_name)
-        await self.accept()
+        await self.accept_with_codec()
         # notify join
-        await self.channel_layer.group_send(
-            self.room_name,
-            {
-                'type': 'chat.message',
-                'sender': await self._get_username(),
-                'text': '[joined]'
-            }
-        )
+        await self.group_send_message(self.room_name, 'chat.message', {
+            'type': 'message',
+            'sender': await self._get_username(),
+            'text': '[joined]'
+        }, sender_channel=self.channel_name)
 
     async def disconnect(self, close_code):
         if hasattr(self, 'room_name'):
@@ -135,48 +323,43 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data=None, bytes_data=None):
         try:
-            data = json.loads(text_data or '{}')
+            data = self.decode_message(text_data, bytes_data)
             if data.get('type') == 'message':
                 text = data.get('text', '')
                 sender_name = await self._get_username()
                 # Optionally persist
                 await self._persist_message(text)
-                await self.channel_layer.group_send(
-                    self.room_name,
-                    {
-                        'type': 'chat.message',
-                        'sender': sender_name,
-                        'text': text
-                    }
-                )
+                await self.group_send_message(self.room_name, 'chat.message', {
+                    'type': 'message',
+                    'sender': sender_name,
+                    'text': text
+                }, sender_channel=self.channel_name)
             elif data.get('type') == 'prediction' or data.get('type') == 'asl_prediction':
                 label = data.get('label')
                 confidence = float(data.get('confidence') or 0.0)
-                await self.channel_layer.group_send(
-                    self.room_name,
-                    {
-                        'type': 'asl.prediction',
-                        'label': label,
-                        'confidence': confidence,
-                    }
-                )
+                await self.group_send_message(self.room_name, 'asl.prediction', {
+                    'type': 'asl_prediction',
+                    'label': label,
+                    'confidence': confidence,
+                }, sender_channel=self.channel_name)
         except Exception as e:
-            await self.send(text_data=json.dumps({'type': 'error', 'message': str(e)}))
+            await self.send_message({'type': 'error', 'message': str(e)})
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'message',
-            'sender': event['sender'],
-            'text': event['text']
-        }))
+        if not self._is_own(event):
+            await self.send_event_payload(event)
 
     async def asl_prediction(self, event):
         """Send ASL prediction to client"""
-        await self.send(text_data=json.dumps({
-            'type': 'asl_prediction',
-            'label': event.get('label'),
-            'confidence': event.get('confidence'),
-        }))
+        if not self._is_own(event):
+            await self.send_event_payload(event)
+
+    def _is_own(self, event):
+        """In rooms, events this client (or its ASL socket) sent are skipped"""
+        if not self.room_id:
+            return False
+        return (event.get('sender_channel') == self.channel_name
+                or (self.current_id is not None and event.get('sender_id') == self.current_id))
 
     @sync_to_async
     def _get_current_random_id(self):
@@ -200,23 +383,53 @@ class ChatConsumer(AsyncWebsocketConsumer):
             ChatMessage.objects.create(room=self.room_name, sender=user, text=text)
 
 
-class VideoConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for video streaming between two peers"""
+class VideoConsumer(CodecMixin, AsyncWebsocketConsumer):
+    """WebSocket consumer for video between two peers or in an N-party room.
+
+    ws/video/<target_id>/ pairs this client with one peer. In
+    ws/video/room/<room_id>/ every participant's frames go to every other
+    participant subscribed to that sender: all senders by default, or the
+    ones listed in ?senders=a,b or a later {"type": "subscribe", "senders": [...]}
+    ("senders": null subscribes to everyone again).
+
+    With ?webrtc=1 the socket also relays WebRTC signaling (see signaling.py)
+    so capable peers can send media directly; relayed frames remain the
+    fallback.
+
+    With ?acks=1 the client answers every relayed frame with {"type": "ack"}
+    and the server keeps at most VIDEO_MAX_UNACKED_FRAMES of them in flight
+    (see media.DeliveryWindow).
+    """
 
     async def connect(self):
         self.scope_user = self.scope.get('user')
-        target_id = self.scope['url_route']['kwargs'].get('target_id')
-        if not target_id:
+        kwargs = self.scope['url_route']['kwargs']
+        target_id = kwargs.get('target_id')
+        self.room_id = kwargs.get('room_id')
+        if not target_id and not self.room_id:
             await self.close()
             return
         
         # Resolve current user's random id
         self.current_id = None
+        # Receive relayed frames as raw binary (?frames=binary, or implied
+        # once this client sends a binary frame); otherwise JSON data URLs
+        self.binary_frames = False
+        senders = None
+        self.webrtc = False
+        extract = False
+        acks = False
         try:
             qs = parse_qs((self.scope.get('query_string') or b'').decode())
             override = qs.get('self', [None])[0]
             if override:
                 self.current_id = override
+            self.binary_frames = qs.get('frames', [''])[0] == 'binary'
+            if qs.get('senders'):
+                senders = [s for s in qs['senders'][0].split(',') if s]
+            self.webrtc = qs.get('webrtc', [''])[0] in ('1', 'true')
+            extract = qs.get('extract', [''])[0] in ('1', 'true')
+            acks = qs.get('acks', [''])[0] in ('1', 'true')
         except Exception:
             pass
         
@@ -226,60 +439,446 @@ class VideoConsumer(AsyncWebsocketConsumer):
         # Store target and current IDs
         self.target_id = target_id
         
-        # Create symmetric room name
-        ids = sorted([self.current_id or 'anon', target_id])
-        self.room_name = f"video_{ids[0]}_{ids[1]}"
-        
-        print(f"[Video] {self.current_id} connecting to room {self.room_name} (targeting {target_id})")
+        if self.room_id:
+            self.room_name = group_room_name('video', self.room_id)
+            # Senders whose video this client wants; None means everyone
+            self.subscriptions = set(senders) if senders else None
+            print(f"[Video] {self.current_id} joining room {self.room_name}")
+        else:
+            # Create symmetric room name
+            self.room_name = room_name('video', self.current_id, target_id)
+            self.subscriptions = {target_id}
+            print(f"[Video] {self.current_id} connecting to room {self.room_name} (targeting {target_id})")
         
+        # random_id -> channel_name of the peers in this room, learned from
+        # video.hello announcements so frames go straight to their channels
+        self.peer_channels = {}
+        # Channels of the peers subscribed to this client's video
+        self.subscribers = set()
+        # Latest video_control from each of those receivers; the client gets
+        # the most frugal one
+        self.receiver_controls = {}
+        self.forwarded_control = None
+        # peer_id -> SignalingSession, for peers that also speak WebRTC
+        self.signaling = {}
+        # Server-side landmark extraction from this client's own frames
+        # (?extract=1), for clients that cannot run MediaPipe themselves
+        self.extraction = None
+        # Outgoing frames for this receiver; a slow link drops stale frames
+        # instead of queueing them
+        self.send_queue = media.FrameQueue(getattr(settings, 'VIDEO_SEND_QUEUE_FRAMES', 2))
+        # Frames on their way to this receiver; with acks the writer waits
+        # for the client instead of filling the socket's buffers
+        self.delivery = media.DeliveryWindow(
+            self.send_queue.stats,
+            max_unacked=getattr(settings, 'VIDEO_MAX_UNACKED_FRAMES', 2),
+            timeout_s=getattr(settings, 'VIDEO_ACK_TIMEOUT_MS', 2000) / 1000,
+            enabled=acks,
+        )
+        self.writer_task = asyncio.create_task(self._write_frames())
+        # Watches what this receiver acknowledges and tells the senders to
+        # step their resolution/quality/fps to stay within the latency budget
+        self.congestion = media.CongestionEstimator(
+            latency_budget_ms=getattr(settings, 'VIDEO_LATENCY_BUDGET_MS', 250)
+        )
+        self.control_task = asyncio.create_task(self._control_loop()) if acks else None
         await self.channel_layer.group_add(self.room_name, self.channel_name)
-        await self.accept()
+        await self.accept_with_codec()
+        await self.channel_layer.group_send(self.room_name, self._hello())
+        if extract and self.current_id:
+            await self._start_extraction()
 
     async def disconnect(self, close_code):
+        if hasattr(self, 'writer_task'):
+            self.writer_task.cancel()
+            if self.control_task is not None:
+                self.control_task.cancel()
+            if self.extraction is not None:
+                self.extraction.close()
         if hasattr(self, 'room_name'):
             print(f"[Video] {self.current_id} disconnecting from room {self.room_name}")
             await self.channel_layer.group_discard(self.room_name, self.channel_name)
+            await self.channel_layer.group_send(self.room_name, {
+                'type': 'video.bye',
+                'peer_id': self.current_id,
+                'channel': self.channel_name,
+            })
 
     async def receive(self, text_data=None, bytes_data=None):
-        """Receive video frame and relay ONLY to the other peer"""
+        """Receive a video frame and forward it to the subscribed peers only"""
         try:
-            if text_data:
-                data = json.loads(text_data)
+            if bytes_data is not None and not self.codec.claims(bytes_data):
+                # Raw JPEG with a binary header: relayed untouched, except
+                # for the sender tag rooms need
+                media.parse_video_header(bytes_data)
+                self.binary_frames = True
+                if self.extraction is not None:
+                    self.extraction.submit(bytes(media.jpeg_payload(bytes_data)))
+                if self.subscribers:
+                    if self.room_id:
+                        bytes_data = media.tag_sender(bytes_data, self.current_id)
+                    event = {
+                        'type': 'video.frame',
+                        'frame': bytes_data,
+                        'sender': self.current_id,
+                    }
+                    for channel in list(self.subscribers):
+                        try:
+                            await self.channel_layer.send(channel, event)
+                        except ChannelFull:
+                            pass
+            elif text_data or bytes_data:
+                data = self.decode_message(text_data, bytes_data)
                 if data.get('type') == 'frame':
-                    frame_data = data.get('frame_data')
-                    print(f"[Video] {self.current_id} → {self.target_id}: Sending frame in room {self.room_name}")
-                    # Send to group - video_frame handler will filter to appropriate peer
-                    await self.channel_layer.group_send(
-                        self.room_name,
-                        {
-                            'type': 'video.frame',
-                            'frame_data': frame_data,
-                            'sender_id': self.current_id,
-                            'target_id': self.target_id
+                    if self.extraction is not None and data.get('frame_data'):
+                        self.extraction.submit(media.jpeg_from_data_url(data['frame_data']))
+                    if self.subscribers:
+                        await self.channels_send_message(
+                            list(self.subscribers), 'video.frame',
+                            {'type': 'frame', 'frame_data': data.get('frame_data'), 'sender': self.current_id},
+                            sender=self.current_id
+                        )
+                elif data.get('type') == 'ack':
+                    self.delivery.ack(int(data.get('frames', 1)))
+                elif data.get('type') in signaling.SIGNAL_TYPES:
+                    await self._relay_signal(data)
+                elif data.get('type') == 'subscribe' and self.room_id:
+                    senders = data.get('senders')
+                    self.subscriptions = set(senders) if senders is not None else None
+                    await self.channel_layer.group_send(self.room_name, {
+                        **self._hello(),
+                        'type': 'video.subscribe',
+                    })
+                elif data.get('type') == 'stats':
+                    await self.send_message({
+                        'type': 'stats',
+                        'video': self.send_queue.stats.as_dict(),
+                        'queued_frames': len(self.send_queue),
+                        'unacked_frames': len(self.delivery),
+                        'process_dropped_frames': media.RelayStats.total_dropped,
+                        'subscribers': len(self.subscribers),
+                        'signaling': {peer: session.state for peer, session in self.signaling.items()},
+                        'extraction': self._extraction_stats(),
+                        'congestion': {
+                            **self.congestion.settings(),
+                            'delivered_fps': round(self.congestion.delivered_fps, 2),
+                            'p95_latency_ms': round(self.congestion.p95_latency_ms, 3),
                         }
-                    )
+                    })
         except Exception as e:
             print(f"[Video Error] {e}")
-            await self.send(text_data=json.dumps({'type': 'error', 'message': str(e)}))
+            await self.send_message({'type': 'error', 'message': str(e)})
+
+    async def _start_extraction(self):
+        try:
+            from ml_models.landmark_pool import get_landmark_pool
+            pool = await sync_to_async(get_landmark_pool, thread_sensitive=False)(
+                getattr(settings, 'ASL_EXTRACTION_PROCESSES', None),
+                queue_frames=getattr(settings, 'ASL_EXTRACTION_QUEUE_FRAMES', 1),
+            )
+            self.extraction = pool.open_session(self._extracted)
+        except Exception as e:
+            print(f"[Video Error] landmark extraction unavailable: {e}")
+            await self.send_message({'type': 'error', 'message': f'Landmark extraction unavailable: {e}'})
+
+    async def _extracted(self, landmarks, has_hands):
+        """Feed extracted landmarks to this user's ASL socket"""
+        await self.channel_layer.group_send(asl_group(self.current_id), {
+            'type': 'asl.landmarks',
+            'landmarks': landmarks.tobytes() if has_hands else None,
+        })
+
+    def _extraction_stats(self):
+        if self.extraction is None:
+            return None
+        return {**self.extraction.stats(), 'pool': self.extraction.pool.metrics()}
+
+    def _hello(self):
+        return {
+            'type': 'video.hello',
+            'peer_id': self.current_id,
+            'channel': self.channel_name,
+            'senders': None if self.subscriptions is None else sorted(self.subscriptions),
+            'webrtc': self.webrtc,
+        }
+
+    def _wants(self, peer_id):
+        return self.subscriptions is None or peer_id in self.subscriptions
+
+    async def video_hello(self, event):
+        """A peer joined the room (or answered our hello): remember its channel"""
+        if event['channel'] == self.channel_name:
+            return
+        self.peer_channels[event['peer_id']] = event['channel']
+        await self.video_subscribe(event)
+        if self.webrtc and event.get('webrtc') and event['peer_id'] not in self.signaling:
+            self.signaling[event['peer_id']] = signaling.SignalingSession(self.current_id, event['peer_id'])
+            await self.send_message({'type': 'peer', 'peer_id': event['peer_id'], 'webrtc': True})
+        if not event.get('reply'):
+            try:
+                await self.channel_layer.send(event['channel'], {**self._hello(), 'reply': True})
+            except ChannelFull:
+                print(f"[Video Error] hello to {event['peer_id']} dropped: its worker's channel is full")
+
+    async def video_subscribe(self, event):
+        """A peer (re)stated whose video it wants"""
+        senders = event.get('senders')
+        if event['channel'] == self.channel_name:
+            return
+        if senders is None or self.current_id in senders:
+            self.subscribers.add(event['channel'])
+        else:
+            self.subscribers.discard(event['channel'])
+            # Its estimator no longer speaks for frames we send
+            if self.receiver_controls.pop(event['channel'], None):
+                await self._forward_control()
+
+    async def video_bye(self, event):
+        if self.peer_channels.get(event['peer_id']) == event['channel']:
+            del self.peer_channels[event['peer_id']]
+            if self.signaling.pop(event['peer_id'], None):
+                await self.send_message({'type': 'peer_left', 'peer_id': event['peer_id']})
+        self.subscribers.discard(event['channel'])
+        if self.receiver_controls.pop(event['channel'], None):
+            await self._forward_control()
+
+    async def video_control(self, event):
+        """Sending settings chosen by a receiver's estimator: pass the most
+        frugal of all our receivers' settings to our client"""
+        self.receiver_controls[event['receiver']] = event['control']
+        await self._forward_control()
+
+    async def _forward_control(self):
+        """Tell our client the most frugal settings any receiver asked for,
+        back to the default level once no receiver asks"""
+        if self.receiver_controls:
+            control = max(self.receiver_controls.values(), key=lambda c: c['level'])
+        else:
+            control = {'type': 'video_control', **media.level_settings(media.DEFAULT_LEVEL)}
+        if control != self.forwarded_control:
+            self.forwarded_control = control
+            await self.send_message(control)
+
+    async def _relay_signal(self, data):
+        """Check an offer/answer/ice/hangup against the peer's session and forward it"""
+        kind = data['type']
+        peer_id = data.get('to') or self.target_id
+        if not self.webrtc:
+            raise signaling.SignalingError('Connect with ?webrtc=1 to use WebRTC signaling')
+        session = self.signaling.get(peer_id)
+        channel = self.peer_channels.get(peer_id)
+        if session is None or channel is None:
+            raise signaling.SignalingError(f'Peer {peer_id} is not available for WebRTC')
+        # Checks the message against the session before anything is relayed
+        previous = session.state
+        session.send(kind)
+        try:
+            await self.channel_layer.send(channel, {
+                'type': 'video.signal',
+                'kind': kind,
+                'from': self.current_id,
+                'payload': {field: data.get(field) for field in signaling.SIGNAL_FIELDS[kind]},
+            })
+        except ChannelFull:
+            # The peer never saw it, so the client may send it again
+            session.state = previous
+            raise signaling.SignalingError(f'{kind} to {peer_id} dropped: its worker is overloaded')
+
+    async def video_signal(self, event):
+        session = self.signaling.get(event['from'])
+        if session and session.receive(event['kind']):
+            await self.send_message({'type': event['kind'], 'from': event['from'], **event['payload']})
 
     async def video_frame(self, event):
-        """Relay video frame ONLY if this client is the TARGET (receiver)"""
-        sender_id = event.get('sender_id')
-        target_id = event.get('target_id')
+        """Frame addressed to this client's channel by a peer.
         
-        # Send frame only if:
-        # - This is not the sender themselves (current_id != sender_id)
-        # - AND this client is expecting frames from that sender (target_id == sender_id)
-        if sender_id != self.current_id and target_id == self.current_id:
-            print(f"[Video] {self.current_id} receiving frame from {sender_id}")
-            await self.send(text_data=json.dumps({
+        Only queued here, so the channel layer is drained at full speed
+        whatever the receiver's link can take.
+        """
+        self.send_queue.put(event, event.get('sender'))
+    
+    async def _write_frames(self):
+        while True:
+            await self.delivery.wait_for_space()
+            event = await self.send_queue.get()
+            try:
+                await self._send_frame(event)
+            except Exception as e:
+                print(f"[Video Error] sending frame to {self.current_id}: {e}")
+                continue
+            self.send_queue.stats.record_sent()
+            self.delivery.sent()
+    
+    async def _control_loop(self):
+        interval = getattr(settings, 'VIDEO_CONTROL_INTERVAL_MS', 1000) / 1000
+        unsent = False
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                control = self.congestion.update(self.send_queue.stats)
+                if not control and not unsent:
+                    continue
+                # A sender that missed the last change gets the current settings
+                unsent = not await self._send_control(control or self.congestion.settings())
+            except Exception as e:
+                print(f"[Video Error] congestion control for {self.current_id}: {e}")
+
+    async def _send_control(self, control):
+        """Tell the senders we watch; False if a channel was full"""
+        delivered = True
+        for peer_id, channel in list(self.peer_channels.items()):
+            if self._wants(peer_id):
+                try:
+                    await self.channel_layer.send(channel, {
+                        'type': 'video.control',
+                        'control': {'type': 'video_control', **control},
+                        'receiver': self.channel_name,
+                    })
+                except ChannelFull:
+                    delivered = False
+        return delivered
+
+    async def _send_frame(self, event):
+        frame = event.get('frame')
+        if frame is None:
+            await self.send_event_payload(event)
+        elif self.binary_frames:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send_message({
                 'type': 'frame',
-                'frame_data': event['frame_data']
-            }))
-        elif sender_id == self.current_id:
-            print(f"[Video] {self.current_id} ignoring own frame")
+                'frame_data': media.as_data_url(frame),
+                'sender': event.get('sender'),
+            })
+
+    @sync_to_async
+    def _get_current_random_id(self):
+        user = self.scope.get('user')
+        if user and not isinstance(user, AnonymousUser) and user.is_authenticated:
+            profile, _ = UserProfile.objects.get_or_create(user=user)
+            return profile.random_id
+        return None
+
+
+class MuxConsumer(AsyncWebsocketConsumer):
+    """ASL, chat and video streams over one WebSocket (see mux.py).
+
+    Connect to ws/mux/<target_id>/ or ws/mux/room/<room_id>/. Each open
+    stream is an instance of the regular consumer sharing this connection's
+    scope, channel name and socket. A user pays for one handshake, one
+    session/user lookup and one random_id lookup instead of three.
+    """
+
+    stream_classes = {
+        mux.STREAM_ASL: ASLConsumer,
+        mux.STREAM_CHAT: ChatConsumer,
+        mux.STREAM_VIDEO: VideoConsumer,
+    }
+
+    async def connect(self):
+        # stream id -> consumer instance
+        self.streams = {}
+        qs = parse_qs((self.scope.get('query_string') or b'').decode())
+        self.current_id = qs.get('self', [None])[0] or await self._get_current_random_id()
+        _, subprotocol = negotiate(self.scope)
+        await self.accept(subprotocol=subprotocol)
+
+    async def disconnect(self, close_code):
+        for stream_id in list(getattr(self, 'streams', {})):
+            await self._close_stream(stream_id, close_code, notify=False)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            if bytes_data is None:
+                raise mux.MuxError('Mux messages must be binary frames')
+            stream_id, text, data = mux.decode_frame(bytes_data)
+            if stream_id == mux.STREAM_CONTROL:
+                await self._control(json.loads(text or '{}'))
+                return
+            consumer = self.streams.get(stream_id)
+            if consumer is None:
+                raise mux.MuxError(f'Stream {mux.stream_label(stream_id)} is not open')
+            await consumer.receive(text_data=text, bytes_data=data)
+        except Exception as e:
+            print(f"[Mux Error] {e}")
+            await self._send_control({'type': 'error', 'message': str(e)})
+
+    async def dispatch(self, message):
+        """Channel-layer events go to the stream consumer that handles them"""
+        handler = get_handler_name(message)
+        if not hasattr(self, handler):
+            for consumer in list(self.streams.values()):
+                if hasattr(consumer, handler):
+                    await consumer.dispatch(message)
+                    return
+            # Event for a stream that has been closed since
+            return
+        await super().dispatch(message)
+
+    async def _control(self, data):
+        stream_id = data.get('stream')
+        if data.get('type') == 'open':
+            if stream_id not in self.stream_classes:
+                raise mux.MuxError(f'Unknown stream {stream_id}')
+            if stream_id in self.streams:
+                raise mux.MuxError(f'Stream {mux.stream_label(stream_id)} is already open')
+            await self._open_stream(stream_id, data.get('params') or {})
+        elif data.get('type') == 'close':
+            await self._close_stream(stream_id, 1000)
+
+    async def _open_stream(self, stream_id, params):
+        consumer = self.stream_classes[stream_id]()
+        consumer.scope = self._stream_scope(stream_id, params)
+        consumer.channel_layer = self.channel_layer
+        consumer.channel_name = self.channel_name
+        consumer.base_send = functools.partial(self._stream_send, stream_id)
+        self.streams[stream_id] = consumer
+        await self._send_control({'type': 'opened', 'stream': stream_id})
+        await consumer.websocket_connect({'type': 'websocket.connect'})
+
+    async def _close_stream(self, stream_id, code, notify=True):
+        consumer = self.streams.pop(stream_id, None)
+        if consumer is None:
+            return
+        try:
+            await consumer.disconnect(code)
+        except Exception as e:
+            print(f"[Mux Error] closing stream {mux.stream_label(stream_id)}: {e}")
+        if notify:
+            await self._send_control({'type': 'closed', 'stream': stream_id, 'code': code})
+
+    def _stream_scope(self, stream_id, params):
+        """The scope the stream's own endpoint would get for these params"""
+        kwargs = self.scope['url_route']['kwargs']
+        query = {key: str(value) for key, value in params.items()}
+        if self.current_id:
+            query['self'] = self.current_id
+        if stream_id == mux.STREAM_ASL:
+            # ASL takes its caption room from the query string
+            if kwargs.get('room_id'):
+                query['room'] = kwargs['room_id']
+            elif kwargs.get('target_id'):
+                query['target'] = kwargs['target_id']
+        return {
+            **self.scope,
+            'query_string': urlencode(query).encode(),
+            'url_route': {'args': (), 'kwargs': dict(kwargs)},
+        }
+
+    async def _stream_send(self, stream_id, message):
+        """base_send of a stream consumer: wrap its messages in mux frames"""
+        if message['type'] == 'websocket.accept':
+            return
+        if message['type'] == 'websocket.close':
+            await self._close_stream(stream_id, message.get('code', 1000))
+            return
+        if message.get('text') is not None:
+            await self.send(bytes_data=mux.encode_frame(stream_id, message['text'], text=True))
         else:
-            print(f"[Video] {self.current_id} filtering out frame: not expecting from {sender_id} (expected {target_id})")
+            await self.send(bytes_data=mux.encode_frame(stream_id, message['bytes']))
+
+    async def _send_control(self, message):
+        await self.send(bytes_data=mux.encode_frame(mux.STREAM_CONTROL, json.dumps(message), text=True))
 
     @sync_to_async
     def _get_current_random_id(self):
@@ -0,0 +1,339 @@
+"""
+Binary video frames for VideoConsumer
+
+A video frame is an 8-byte little-endian header followed by the JPEG bytes
+exactly as the browser's canvas.toBlob produced them:
+
+    offset 0  uint8   message type (FRAME_VIDEO)
+    offset 1  uint8   flags (FLAG_SENDER or 0)
+    offset 2  uint16  reserved
+    offset 4  uint32  sequence number chosen by the sender
+
+In N-party rooms the server sets FLAG_SENDER and inserts the sender's id
+between header and JPEG (uint8 length + UTF-8), once per frame, so
+receivers can tell the streams apart. Clients never set flags.
+
+The server only checks the header and relays the message untouched. That
+avoids base64 (+33%) and the json.loads/json.dumps on every hop of the old
+{"type": "frame", "frame_data": "data:image/jpeg;base64,..."} format.
+Receivers that never opted in (?frames=binary, or by sending binary frames
+themselves) still get the old JSON format, built on demand.
+
+Each receiving connection drains relayed frames through a FrameQueue that
+holds at most a couple of frames: a slow receiver skips stale frames (lower
+frame rate) instead of building up seconds of backlog. Handing a frame to
+the server's socket returns at once whatever the link, so the pace comes
+from the receiver: clients that connect with ?acks=1 answer every relayed
+frame with {"type": "ack"}, and a DeliveryWindow keeps at most a couple of
+frames unacknowledged. The rest wait in the FrameQueue, where newer frames
+replace them.
+
+The receiver side also runs a CongestionEstimator over those counters and
+tells the sender (video_control messages) to step its resolution, JPEG
+quality and frame rate up or down a fixed ladder, so the frames that are
+sent arrive within the latency budget.
+
+This module has no NumPy dependency so chat/video-only workers stay light.
+"""
+
+import asyncio
+import base64
+import statistics
+import struct
+import time
+from collections import Counter, deque
+
+VIDEO_HEADER = struct.Struct('<BBHI')
+FRAME_VIDEO = 0x10
+FLAG_SENDER = 0x01
+
+
+class VideoFrameError(ValueError):
+    """Raised for binary video messages that do not follow the frame layout"""
+
+
+def encode_video_frame(seq, jpeg):
+    return VIDEO_HEADER.pack(FRAME_VIDEO, 0, 0, seq & 0xFFFFFFFF) + jpeg
+
+
+def parse_video_header(data):
+    """Validate a binary video frame and return its sequence number"""
+    if len(data) <= VIDEO_HEADER.size:
+        raise VideoFrameError(f'Video frame is {len(data)} bytes, too short for header and image')
+    msg_type, flags, _, seq = VIDEO_HEADER.unpack_from(data)
+    if msg_type != FRAME_VIDEO:
+        raise VideoFrameError(f'Unknown binary message type {msg_type}')
+    if flags:
+        raise VideoFrameError(f'Unexpected video frame flags {flags:#x}')
+    return seq
+
+
+def tag_sender(data, sender_id):
+    """Copy of a client frame with FLAG_SENDER and the sender's id added"""
+    sender = (sender_id or '').encode('utf-8')[:255]
+    _, _, reserved, seq = VIDEO_HEADER.unpack_from(data)
+    return b''.join([
+        VIDEO_HEADER.pack(FRAME_VIDEO, FLAG_SENDER, reserved, seq),
+        bytes([len(sender)]), sender, jpeg_payload(data),
+    ])
+
+
+def frame_sender(data):
+    """Sender id of a tagged frame, None for untagged frames"""
+    if not data[1] & FLAG_SENDER:
+        return None
+    length = data[VIDEO_HEADER.size]
+    start = VIDEO_HEADER.size + 1
+    return bytes(data[start:start + length]).decode('utf-8')
+
+
+def jpeg_payload(data):
+    offset = VIDEO_HEADER.size
+    if data[1] & FLAG_SENDER:
+        offset += 1 + data[offset]
+    return memoryview(data)[offset:]
+
+
+def jpeg_from_data_url(frame_data):
+    """JPEG bytes of a legacy {"frame_data": "data:image/jpeg;base64,..."} frame"""
+    return base64.b64decode(frame_data.split(',', 1)[-1])
+
+
+def as_data_url(data):
+    """Legacy frame_data for receivers that only understand JSON frames"""
+    return 'data:image/jpeg;base64,' + base64.b64encode(jpeg_payload(data)).decode('ascii')
+
+
+class RelayStats:
+    """Counters and delivery latency for one receiver.
+
+    dropped counts stale frames replaced in the FrameQueue, lost counts
+    frames never acknowledged in time. latencies_ms are ack round trips:
+    from handing a frame to the socket until the receiver's ack is back,
+    both on this process's clock.
+    """
+
+    # Frames dropped by every receiver in this process
+    total_dropped = 0
+
+    def __init__(self, window=500):
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.lost = 0
+        self.latencies_ms = deque(maxlen=window)
+
+    def record_sent(self):
+        self.sent += 1
+
+    def record_acked(self, latency_ms):
+        self.acked += 1
+        self.latencies_ms.append(latency_ms)
+
+    def record_dropped(self):
+        self.dropped += 1
+        RelayStats.total_dropped += 1
+
+    def record_lost(self):
+        self.lost += 1
+
+    def as_dict(self):
+        latencies = sorted(self.latencies_ms) or [0.0]
+        return {
+            'sent': self.sent,
+            'acked': self.acked,
+            'dropped': self.dropped,
+            'lost': self.lost,
+            'avg_latency_ms': round(statistics.fmean(latencies), 3),
+            'p95_latency_ms': round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+            'max_latency_ms': round(latencies[-1], 3),
+        }
+
+
+class FrameQueue:
+    """Bounded outgoing queue that keeps only the newest frames.
+
+    put() never waits: when the queue is full the oldest frame is dropped
+    and counted. A writer task awaits get() and sends at the pace the
+    receiver's DeliveryWindow allows.
+    """
+
+    def __init__(self, max_frames=2):
+        self.max_frames = max_frames
+        self._frames = deque()
+        self._queued = Counter()
+        self._event = asyncio.Event()
+        self.stats = RelayStats()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame, sender=None):
+        """Queue a frame.
+
+        The limit is per sender, so in a room one busy sender cannot push
+        out the other senders' frames.
+        """
+        if self._queued[sender] == self.max_frames:
+            for i, queued in enumerate(self._frames):
+                if queued[0] == sender:
+                    del self._frames[i]
+                    break
+            self.stats.record_dropped()
+        else:
+            self._queued[sender] += 1
+        self._frames.append((sender, frame))
+        self._event.set()
+
+    async def get(self):
+        while not self._frames:
+            self._event.clear()
+            await self._event.wait()
+        sender, frame = self._frames.popleft()
+        self._queued[sender] -= 1
+        return frame
+
+    def clear(self):
+        self._frames.clear()
+        self._queued.clear()
+
+
+class DeliveryWindow:
+    """Frames handed to a receiver's socket and not acknowledged yet.
+
+    Frames reach the client in order, so each ack settles the oldest
+    outstanding frame. wait_for_space() holds the writer while max_unacked
+    frames are outstanding. A frame unacknowledged after timeout_s counts as
+    lost and frees its place; its late ack is then skipped so the acks stay
+    matched to their frames. Disabled windows (clients that do not ack)
+    never wait.
+    """
+
+    def __init__(self, stats, max_unacked=2, timeout_s=2.0, enabled=True):
+        self.stats = stats
+        self.max_unacked = max_unacked
+        self.timeout = timeout_s
+        self.enabled = enabled
+        self._sent_at = deque()
+        self._expired = 0
+        self._event = asyncio.Event()
+
+    def __len__(self):
+        return len(self._sent_at)
+
+    def sent(self, now=None):
+        if self.enabled:
+            self._sent_at.append(time.monotonic() if now is None else now)
+
+    def ack(self, count=1, now=None):
+        now = time.monotonic() if now is None else now
+        for _ in range(min(count, self._expired + len(self._sent_at))):
+            if self._expired:
+                self._expired -= 1
+            elif self._sent_at:
+                self.stats.record_acked((now - self._sent_at.popleft()) * 1000)
+        self._event.set()
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self._sent_at and now - self._sent_at[0] >= self.timeout:
+            self._sent_at.popleft()
+            self._expired += 1
+            self.stats.record_lost()
+
+    async def wait_for_space(self):
+        while self.enabled:
+            self.expire()
+            if len(self._sent_at) < self.max_unacked:
+                return
+            self._event.clear()
+            try:
+                await asyncio.wait_for(
+                    self._event.wait(), self.timeout - (time.monotonic() - self._sent_at[0])
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+# Sender settings from best to most frugal: (resolution scale, JPEG quality, fps)
+QUALITY_LADDER = [
+    (1.0, 0.7, 12),
+    (1.0, 0.5, 10),
+    (0.75, 0.5, 8),
+    (0.5, 0.5, 6),
+    (0.5, 0.4, 4),
+    (0.5, 0.3, 2),
+]
+DEFAULT_LEVEL = 1
+
+
+def level_settings(level):
+    scale, quality, fps = QUALITY_LADDER[level]
+    return {'level': level, 'scale': scale, 'quality': quality, 'fps': fps}
+
+
+class CongestionEstimator:
+    """Picks a QUALITY_LADDER level from one receiver's RelayStats.
+
+    Everything comes from the receiver's acks on this process's clock:
+    latency is the p95 ack round trip of the interval (infinite when frames
+    went out and none was acked), and frames dropped from the FrameQueue or
+    lost without an ack count against the offered frames.
+
+    Call update() once per control interval. The level steps down as soon
+    as an interval's p95 latency exceeds the budget or more than
+    max_drop_ratio of the offered frames were dropped or lost, and steps
+    back up after `recover_intervals` intervals with latency under half the
+    budget and nothing dropped or lost.
+    """
+
+    def __init__(self, latency_budget_ms=250.0, max_drop_ratio=0.2, recover_intervals=3,
+                 level=DEFAULT_LEVEL):
+        self.latency_budget_ms = latency_budget_ms
+        self.max_drop_ratio = max_drop_ratio
+        self.recover_intervals = recover_intervals
+        self.level = level
+        self.good_intervals = 0
+        self._sent = 0
+        self._acked = 0
+        self._dropped = 0
+        self._lost = 0
+        self._last_update = None
+        self.delivered_fps = 0.0
+        self.p95_latency_ms = 0.0
+
+    def settings(self):
+        return level_settings(self.level)
+
+    def update(self, stats, now=None):
+        """Settings dict if the level changed this interval, else None"""
+        now = time.monotonic() if now is None else now
+        sent, dropped = stats.sent - self._sent, stats.dropped - self._dropped
+        acked, lost = stats.acked - self._acked, stats.lost - self._lost
+        self._sent, self._acked, self._dropped, self._lost = stats.sent, stats.acked, stats.dropped, stats.lost
+        # Frames that never reached the receiver in time
+        dropped += lost
+        elapsed = now - self._last_update if self._last_update is not None else None
+        self._last_update = now
+        if sent + dropped == 0:
+            return None
+
+        recent = sorted(list(stats.latencies_ms)[-acked:]) if acked else [float('inf')]
+        self.p95_latency_ms = recent[int(0.95 * (len(recent) - 1))]
+        if elapsed:
+            self.delivered_fps = acked / elapsed
+
+        congested = (self.p95_latency_ms > self.latency_budget_ms
+                     or dropped > self.max_drop_ratio * (sent + dropped))
+        previous = self.level
+        if congested:
+            self.good_intervals = 0
+            self.level = min(self.level + 1, len(QUALITY_LADDER) - 1)
+        elif dropped == 0 and self.p95_latency_ms < self.latency_budget_ms / 2:
+            self.good_intervals += 1
+            if self.good_intervals >= self.recover_intervals:
+                self.good_intervals = 0
+                self.level = max(self.level - 1, 0)
+        else:
+            self.good_intervals = 0
+        return self.settings() if self.level != previous else None
@@ -0,0 +1,65 @@
+"""
+Stream multiplexing for MuxConsumer
+
+One WebSocket (ws/mux/<target_id>/ or ws/mux/room/<room_id>/) carries the
+ASL, chat and video streams that otherwise need three sockets. Every
+message in either direction is a binary frame with a 2-byte header:
+
+    offset 0  uint8   stream id (STREAM_*)
+    offset 1  uint8   flags: FLAG_TEXT if the payload is a UTF-8 text
+                      message of that stream, else its binary message
+    offset 2          the stream's own message, unchanged
+
+Stream 0 is the control stream (JSON text):
+
+    -> {"type": "open", "stream": 3, "params": {"frames": "binary"}}
+    -> {"type": "close", "stream": 3}
+    <- {"type": "opened", "stream": 3}
+    <- {"type": "closed", "stream": 3, "code": 1000}
+    <- {"type": "error", "message": ...}
+
+params are the query parameters the stream's own endpoint takes (e.g.
+encoding=q16 for ASL, frames=binary or webrtc=1 for video). The peer or
+room comes from the mux URL, and ?self= applies to every stream.
+"""
+
+import struct
+
+MUX_HEADER = struct.Struct('<BB')
+FLAG_TEXT = 0x01
+
+STREAM_CONTROL = 0
+STREAM_ASL = 1
+STREAM_CHAT = 2
+STREAM_VIDEO = 3
+STREAM_NAMES = {STREAM_ASL: 'asl', STREAM_CHAT: 'chat', STREAM_VIDEO: 'video'}
+
+
+class MuxError(ValueError):
+    """Raised for frames that do not follow the multiplexing layout"""
+
+
+def stream_label(stream_id):
+    """'3 (video)' for error and log messages"""
+    name = STREAM_NAMES.get(stream_id)
+    return f'{stream_id} ({name})' if name else str(stream_id)
+
+
+def encode_frame(stream_id, payload, text=False):
+    if text:
+        payload = payload.encode('utf-8')
+    return MUX_HEADER.pack(stream_id, FLAG_TEXT if text else 0) + payload
+
+
+def decode_frame(data):
+    """(stream id, text or None, bytes or None) for a client frame"""
+    if len(data) < MUX_HEADER.size:
+        raise MuxError(f'Mux frame is {len(data)} bytes, too short for header')
+    stream_id, flags = MUX_HEADER.unpack_from(data)
+    payload = data[MUX_HEADER.size:]
+    if flags & FLAG_TEXT:
+        try:
+            return stream_id, payload.decode('utf-8'), None
+        except UnicodeDecodeError as e:
+            raise MuxError(f'Stream {stream_label(stream_id)} text is not UTF-8') from e
+    return stream_id, None, payload
@@ -3,6 +3,10 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/asl/$', consumers.ASLConsumer.as_asgi()),
+    re_path(r'^ws/chat/room/(?P<room_id>[A-Za-z0-9_.-]{1,64})/$', consumers.ChatConsumer.as_asgi()),
     re_path(r'^ws/chat/(?P<target_id>[^/]+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'^ws/video/room/(?P<room_id>[A-Za-z0-9_.-]{1,64})/$', consumers.VideoConsumer.as_asgi()),
     re_path(r'^ws/video/(?P<target_id>[^/]+)/$', consumers.VideoConsumer.as_asgi()),
+    re_path(r'^ws/mux/room/(?P<room_id>[A-Za-z0-9_.-]{1,64})/$', consumers.MuxConsumer.as_asgi()),
+    re_path(r'^ws/mux/(?P<target_id>[^/]+)/$', consumers.MuxConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+WebRTC signaling for VideoConsumer
+
+Clients that connect with ?webrtc=1 can negotiate a direct peer-to-peer
+connection through the video socket. The server relays only these JSON
+messages, and the media stops passing through Daphne:
+
+    {"type": "offer",  "to": <peer id>, "sdp": ...}
+    {"type": "answer", "to": <peer id>, "sdp": ...}
+    {"type": "ice",    "to": <peer id>, "candidate": ...}
+    {"type": "hangup", "to": <peer id>}
+
+"to" defaults to the target peer. The peer receives the same message
+with "from" in place of "to". Until the peer connection is up, or after
+it fails, clients keep sending relayed frames over the same socket.
+
+One SignalingSession per peer follows the offer/answer exchange, so
+out-of-order or stray messages are rejected instead of confusing the
+other browser. When both sides send an offer at once, the offer from the
+lower peer id wins. The other side receives it and rolls back its own
+offer, as the "polite" peer in WebRTC's perfect negotiation pattern does.
+"""
+
+IDLE = 'idle'
+OFFER_SENT = 'offer-sent'
+OFFER_RECEIVED = 'offer-received'
+CONNECTED = 'connected'
+
+SIGNAL_TYPES = ('offer', 'answer', 'ice', 'hangup')
+# Message fields relayed to the peer for each signal type
+SIGNAL_FIELDS = {'offer': ('sdp',), 'answer': ('sdp',), 'ice': ('candidate',), 'hangup': ()}
+
+
+class SignalingError(ValueError):
+    """Raised for signaling messages that are invalid in the current state"""
+
+
+class SignalingSession:
+    """Offer/answer state of this client towards one peer"""
+
+    def __init__(self, local_id, peer_id):
+        self.local_id = local_id
+        self.peer_id = peer_id
+        self.state = IDLE
+
+    def send(self, kind):
+        """Our client sends `kind` to the peer; raises SignalingError if out of order"""
+        if kind == 'offer':
+            if self.state == OFFER_SENT:
+                raise SignalingError('An offer is already pending')
+            if self.state == OFFER_RECEIVED:
+                raise SignalingError('Answer the pending offer first')
+            self.state = OFFER_SENT
+        elif kind == 'answer':
+            if self.state != OFFER_RECEIVED:
+                raise SignalingError('No offer to answer')
+            self.state = CONNECTED
+        elif kind == 'ice':
+            if self.state == IDLE:
+                raise SignalingError('ICE candidate before any offer')
+        elif kind == 'hangup':
+            self.state = IDLE
+        else:
+            raise SignalingError(f'Unknown signal {kind!r}')
+
+    def receive(self, kind):
+        """The peer sent us `kind`; False if it must not reach our client"""
+        if kind == 'offer':
+            if self.state == OFFER_SENT and self._wins_glare():
+                # Our offer wins; the peer rolls its own back
+                return False
+            self.state = OFFER_RECEIVED
+        elif kind == 'answer':
+            if self.state != OFFER_SENT:
+                return False
+            self.state = CONNECTED
+        elif kind == 'ice':
+            return self.state != IDLE
+        elif kind == 'hangup':
+            self.state = IDLE
+        else:
+            return False
+        return True
+
+    def _wins_glare(self):
+        return (self.local_id or '') < (self.peer_id or '')
@@ -1,3 +1,964 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import msgpack
+import numpy as np
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+try:
+    import channels_redis  # noqa: F401
+    REDIS_SERVER = shutil.which('redis-server')
+except ImportError:
+    REDIS_SERVER = None
+
+from ml_models.bundle import write_bundle
+from ml_models.numpy_engine import fold_batch_norm
+from ml_models.scheduler import BatchScheduler
+from ml_models.tests import random_improved_layers
+from rtslt import workers
+
+from . import codecs, mux
+from .codecs import JSON, CODECS, JSONCodec, encode_all, payload_for
+from .consumers import ASLConsumer, VideoConsumer
+from .media import (
+    FRAME_VIDEO, CongestionEstimator, DeliveryWindow, FrameQueue, RelayStats, encode_video_frame, frame_sender,
+    jpeg_payload, tag_sender
+)
+from .routing import websocket_urlpatterns
+from .signaling import SignalingError, SignalingSession
+from .wire import (
+    FRAME_Q16_DELTA, FRAME_Q16_KEY, MissingKeyframe, QuantizedFrameDecoder, QuantizedFrameEncoder, WireError,
+    decode_landmark_batch, decode_landmark_frame, encode_landmark_batch, encode_landmark_frame
+)
+
+CLASSES = ['A', 'B', 'C', 'D', 'E']
+
+
+def write_test_bundle(directory, confident_class=None):
+    """Small random ASL model with the production input shape.
+
+    With confident_class the output bias makes that class win every window.
+    """
+    layers = random_improved_layers(np.random.default_rng(7), features=126, classes=5)
+    if confident_class is not None:
+        layers[-1]['bias'][confident_class] = 20.0
+    layers = fold_batch_norm(layers)
+    path = os.path.join(directory, 'asl.aslb')
+    write_bundle(path, layers, CLASSES, sequence_length=10, features=126)
+    return path
+
+
+class ASLConsumerTestCase(SimpleTestCase):
+    """Runs ASLConsumer against a temporary bundle without motion gating"""
+
+    confident_class = None
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            ASL_MODEL_PATH=write_test_bundle(self.tmp.name, self.confident_class),
+            ASL_MOTION_GATING=False,
+            ASL_CASCADE_MODEL_PATH=None,
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    async def connect_asl(self, path='/ws/asl/?self=alice'):
+        communicator = WebsocketCommunicator(ASLConsumer.as_asgi(), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'connection', message)
+        return communicator
+
+    async def receive_type(self, communicator, message_type, timeout=2):
+        """Next message of the given type, skipping predictions and the like"""
+        while True:
+            message = await communicator.receive_json_from(timeout)
+            if message['type'] == message_type:
+                return message
+
+    async def request_stats(self, communicator):
+        await communicator.send_json_to({'type': 'stats'})
+        return await self.receive_type(communicator, 'stats')
+
+
+class WireFormatTests(SimpleTestCase):
+    def test_round_trip(self):
+        values = np.linspace(0, 1, 126, dtype=np.float32)
+        frame = encode_landmark_frame(42, values)
+        self.assertEqual(len(frame), 8 + 126 * 4)
+        seq, landmarks = decode_landmark_frame(frame)
+        self.assertEqual(seq, 42)
+        self.assertEqual(landmarks.dtype, np.float32)
+        np.testing.assert_array_equal(landmarks, values)
+        self.assertEqual(decode_landmark_frame(encode_landmark_frame(43)), (43, None))
+
+    def test_rejects_malformed_frames(self):
+        with self.assertRaises(WireError):
+            decode_landmark_frame(b'\x01\x01')
+        with self.assertRaises(WireError):
+            decode_landmark_frame(encode_landmark_frame(1, np.zeros(126))[:-4])
+        with self.assertRaises(WireError):
+            decode_landmark_frame(b'\x09' + encode_landmark_frame(1)[1:])
+
+
+    def test_batch_round_trip(self):
+        rng = np.random.default_rng(1)
+        frames = [rng.uniform(0, 1, 126), None, rng.uniform(0, 1, 126)]
+        seq, timestamps, decoded = decode_landmark_batch(encode_landmark_batch(7, [1.0, 2.0, 3.5], frames))
+        self.assertEqual(seq, 7)
+        self.assertEqual(timestamps.tolist(), [1.0, 2.0, 3.5])
+        self.assertIsNone(decoded[1])
+        np.testing.assert_allclose(decoded[2], frames[2], rtol=1e-6)
+
+    def test_quantized_delta_stream_reconstructs_within_half_a_quantum(self):
+        rng = np.random.default_rng(2)
+        stream = np.clip(0.5 + np.cumsum(rng.normal(0, 0.003, (40, 126)), axis=0), 0, 1)
+        encoder, decoder = QuantizedFrameEncoder(keyframe_interval=30), QuantizedFrameDecoder()
+        messages = [encoder.encode(i, f) for i, f in enumerate(stream)]
+        self.assertEqual([m[0] for m in messages].count(FRAME_Q16_KEY), 2)
+        self.assertEqual(len(messages[1]), 8 + 126)
+        for message, frame in zip(messages, stream):
+            _, landmarks = decoder.decode(message)
+            self.assertLessEqual(np.abs(landmarks - frame).max(), 0.5 / 4096 + 1e-6)
+
+        decoder = QuantizedFrameDecoder()
+        self.assertEqual(messages[1][0], FRAME_Q16_DELTA)
+        with self.assertRaises(MissingKeyframe):
+            decoder.decode(messages[1])
+
+
+class ASLConsumerBinaryTests(ASLConsumerTestCase):
+    def test_binary_and_json_frames_feed_the_same_buffer(self):
+        async def run():
+            communicator = await self.connect_asl()
+            rng = np.random.default_rng(0)
+            for seq in range(5):
+                await communicator.send_to(bytes_data=encode_landmark_frame(seq, rng.uniform(0, 1, 126)))
+            for _ in range(5):
+                await communicator.send_json_to({
+                    'type': 'landmarks', 'landmarks': rng.uniform(0, 1, 126).tolist(), 'has_hands': True
+                })
+            await asyncio.sleep(0.1)
+            stats = await self.request_stats(communicator)
+            self.assertGreaterEqual(stats['inferred_frames'] + stats['dropped_frames'], 1)
+
+            await communicator.send_to(bytes_data=b'\x01')
+            error = await self.receive_type(communicator, 'error')
+            self.assertIn('header', error['message'])
+            await communicator.disconnect()
+
+        asyncio.run(run())
+
+    @override_settings(ASL_BATCH_MAX_WAIT_MS=100)
+    def test_frames_pushed_while_a_window_waits_do_not_change_it(self):
+        original_predict = BatchScheduler._predict
+        seen = []
+
+        def predict(scheduler, windows):
+            seen.append(windows.copy())
+            return original_predict(scheduler, windows)
+
+        async def run():
+            communicator = await self.connect_asl()
+            for seq in range(10):
+                await communicator.send_to(bytes_data=encode_landmark_frame(seq, np.full(126, seq / 100)))
+            # The window of frame 9 is now waiting for its batch to fill
+            await communicator.receive_nothing(0.02)
+            for seq in (10, 11):
+                await communicator.send_to(bytes_data=encode_landmark_frame(seq, np.full(126, seq / 100)))
+            await communicator.receive_nothing(0.3)
+            await communicator.disconnect()
+
+        with mock.patch.object(BatchScheduler, '_predict', predict):
+            asyncio.run(run())
+        np.testing.assert_allclose(seen[0][0, :, 0], np.arange(10) / 50 - 1, atol=1e-6)
+
+    def test_batch_feeds_every_frame_and_evaluates_once(self):
+        async def run():
+            communicator = await self.connect_asl()
+            rng = np.random.default_rng(0)
+            frames = list(rng.uniform(0, 1, (12, 126)))
+            await communicator.send_to(bytes_data=encode_landmark_batch(0, np.arange(12.0), frames))
+            await communicator.send_json_to({
+                'type': 'landmark_batch',
+                'frames': [{'t': 12.0 + i, 'landmarks': f.tolist()} for i, f in enumerate(frames[:3])],
+            })
+            await asyncio.sleep(0.1)
+            stats = await self.request_stats(communicator)
+            # One window per message, not one per frame
+            self.assertEqual(stats['inferred_frames'] + stats['dropped_frames'], 2)
+            await communicator.disconnect()
+
+        asyncio.run(run())
+
+    def test_quantized_encoding_is_negotiated_and_requests_keyframes(self):
+        async def run():
+            communicator = WebsocketCommunicator(ASLConsumer.as_asgi(), '/ws/asl/?self=alice&encoding=q16')
+            await communicator.connect()
+            self.assertEqual((await communicator.receive_json_from())['encoding'], 'q16')
+            rng = np.random.default_rng(0)
+            encoder = QuantizedFrameEncoder()
+            for seq in range(10):
+                await communicator.send_to(bytes_data=encoder.encode(seq, 0.5 + rng.normal(0, 0.002, 126)))
+            await asyncio.sleep(0.1)
+            stats = await self.request_stats(communicator)
+            self.assertEqual(stats['inferred_frames'] + stats['dropped_frames'], 1)
+
+            # A gap in the delta chain asks the client for a keyframe, once
+            await communicator.send_to(bytes_data=encoder.encode(12, 0.5 + rng.normal(0, 0.002, 126)))
+            await communicator.send_to(bytes_data=encoder.encode(13, 0.5 + rng.normal(0, 0.002, 126)))
+            await self.receive_type(communicator, 'keyframe_request')
+            await communicator.send_json_to({'type': 'reset'})
+            await self.receive_type(communicator, 'reset_confirmed')
+            await communicator.disconnect()
+
+        asyncio.run(run())
+
+
+class CodecTests(SimpleTestCase):
+    def connect(self, path, subprotocols=None):
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), path, subprotocols=subprotocols)
+
+    def test_chat_fan_out_encodes_once_per_codec(self):
+        async def run():
+            alice = self.connect('/ws/chat/bob/?self=alice')
+            bob = self.connect('/ws/chat/alice/?self=bob', subprotocols=['rtslt.msgpack', 'rtslt.json'])
+            _, subprotocol = await alice.connect()
+            self.assertIsNone(subprotocol)
+            _, subprotocol = await bob.connect()
+            self.assertEqual(subprotocol, 'rtslt.msgpack')
+            # Drain the join notices
+            await alice.receive_json_from()
+            await alice.receive_json_from()
+            await bob.receive_from()
+
+            with mock.patch.object(JSONCodec, 'encode', autospec=True, side_effect=lambda self, m: json.dumps(m)) as encode:
+                await alice.send_json_to({'type': 'message', 'text': 'hello'})
+                self.assertEqual(await alice.receive_json_from(), {'type': 'message', 'sender': 'anonymous', 'text': 'hello'})
+                self.assertEqual(msgpack.unpackb(await bob.receive_from()), {'type': 'message', 'sender': 'anonymous', 'text': 'hello'})
+                self.assertEqual(encode.call_count, 1)
+
+            await bob.send_to(bytes_data=msgpack.packb({'type': 'asl_prediction', 'label': 'A', 'confidence': 0.9}))
+            self.assertEqual((await alice.receive_json_from())['label'], 'A')
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+
+    def test_json_only_traffic_is_encoded_once(self):
+        async def run():
+            alice = self.connect('/ws/chat/bob/?self=alice')
+            bob = self.connect('/ws/chat/alice/?self=bob')
+            await alice.connect()
+            await bob.connect()
+            await alice.receive_json_from()
+            await alice.receive_json_from()
+            await bob.receive_json_from()
+            with mock.patch.object(codecs.MsgpackCodec, 'encode', autospec=True) as packb:
+                await alice.send_json_to({'type': 'message', 'text': 'hello'})
+                self.assertEqual((await bob.receive_json_from())['text'], 'hello')
+                packb.assert_not_called()
+            await alice.disconnect()
+            await bob.disconnect()
+
+        with mock.patch('translator.codecs._negotiated', {'json'}):
+            asyncio.run(run())
+
+    def test_missing_codec_is_transcoded(self):
+        message = {'type': 'message', 'text': 'hello'}
+        with mock.patch('translator.codecs._negotiated', {'json'}):
+            payloads = encode_all(message)
+        self.assertEqual(list(payloads), ['json'])
+        msgpack_codec = CODECS[1]
+        self.assertEqual(msgpack.unpackb(payload_for(payloads, msgpack_codec)), message)
+        self.assertIs(payload_for(payloads, JSON), payloads['json'])
+
+
+class PredictionRoutingTests(ASLConsumerTestCase):
+    confident_class = 0
+
+    def test_predictions_reach_the_peer_chat_in_one_server_hop(self):
+        async def run():
+            router = URLRouter(websocket_urlpatterns)
+            signer = WebsocketCommunicator(router, '/ws/asl/?self=alice&target=bob')
+            await signer.connect()
+            await self.receive_type(signer, 'connection')
+            peer_chat = WebsocketCommunicator(router, '/ws/chat/alice/?self=bob')
+            await peer_chat.connect()
+            await self.receive_type(peer_chat, 'message')
+
+            rng = np.random.default_rng(0)
+            # 10 frames fill the window; smoothing confirms the label on the
+            # third window, so captions start with frame 12
+            for seq in range(11):
+                await signer.send_to(bytes_data=encode_landmark_frame(seq, rng.uniform(0, 1, 126)))
+                await peer_chat.receive_nothing(0.05)
+
+            latencies = []
+            for seq in range(11, 41):
+                sent = time.perf_counter()
+                await signer.send_to(bytes_data=encode_landmark_frame(seq, rng.uniform(0, 1, 126)))
+                caption = await self.receive_type(peer_chat, 'asl_prediction')
+                latencies.append((time.perf_counter() - sent) * 1000)
+                self.assertEqual((caption['label'], caption['sender']), ('A', 'alice'))
+
+            self.assertLess(float(np.median(latencies)), 100.0)
+            await signer.disconnect()
+            await peer_chat.disconnect()
+
+        asyncio.run(run())
+
+
+class VideoRelayTests(SimpleTestCase):
+    def test_frames_are_sent_only_to_the_target_peer(self):
+        async def run():
+            router = URLRouter(websocket_urlpatterns)
+            alice = WebsocketCommunicator(router, '/ws/video/bob/?self=alice&frames=binary')
+            bob = WebsocketCommunicator(router, '/ws/video/alice/?self=bob&frames=binary')
+            await alice.connect()
+            await bob.connect()
+            # Let the hello announcements settle
+            await alice.receive_nothing(0.05)
+
+            jpeg = b'\xff\xd8' + bytes(range(256)) * 4 + b'\xff\xd9'
+            frame = encode_video_frame(5, jpeg)
+            await alice.send_to(bytes_data=frame)
+            self.assertEqual(await bob.receive_from(), frame)
+            self.assertTrue(await alice.receive_nothing(0.05))
+
+            await alice.send_to(bytes_data=b'\x01' + frame[1:])
+            self.assertEqual((await alice.receive_json_from())['type'], 'error')
+
+            # A reconnecting peer that only understands JSON gets a data URL
+            await bob.disconnect()
+            legacy = WebsocketCommunicator(router, '/ws/video/alice/?self=bob')
+            await legacy.connect()
+            await alice.receive_nothing(0.05)
+            await alice.send_to(bytes_data=frame)
+            legacy_frame = await legacy.receive_json_from()
+            self.assertEqual(
+                legacy_frame['frame_data'], 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+            )
+            await alice.disconnect()
+            await legacy.disconnect()
+
+        asyncio.run(run())
+
+    def test_receiver_that_stops_acking_gets_only_the_newest_frames(self):
+        async def run():
+            router = URLRouter(websocket_urlpatterns)
+            alice = WebsocketCommunicator(router, '/ws/video/bob/?self=alice&frames=binary')
+            bob = WebsocketCommunicator(router, '/ws/video/alice/?self=bob&frames=binary&acks=1')
+            await alice.connect()
+            await bob.connect()
+            await alice.receive_nothing(0.05)
+
+            for seq in range(50):
+                await alice.send_to(bytes_data=encode_video_frame(seq, b'\xff\xd8frame'))
+            await asyncio.sleep(0.1)
+            received = []
+            while not await bob.receive_nothing(0.05):
+                received.append(await bob.receive_from())
+
+            # Without acks only VIDEO_MAX_UNACKED_FRAMES leave the server
+            self.assertEqual(received, [encode_video_frame(seq, b'\xff\xd8frame') for seq in (0, 1)])
+            await bob.send_json_to({'type': 'ack', 'frames': 2})
+            for seq in (48, 49):
+                self.assertEqual(await bob.receive_from(), encode_video_frame(seq, b'\xff\xd8frame'))
+            await bob.send_json_to({'type': 'ack', 'frames': 2})
+            await bob.send_json_to({'type': 'stats'})
+            stats = await bob.receive_json_from()
+            self.assertEqual(stats['video']['sent'], 4)
+            self.assertEqual(stats['video']['acked'], 4)
+            self.assertEqual(stats['video']['dropped'], 46)
+            self.assertEqual(stats['unacked_frames'], 0)
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+    def test_send_error_does_not_stop_the_writer(self):
+        original_send = VideoConsumer.send
+        failures = []
+
+        async def flaky_send(consumer, *args, **kwargs):
+            if consumer.current_id == 'bob' and not failures and kwargs.get('bytes_data'):
+                failures.append(kwargs['bytes_data'])
+                raise RuntimeError('socket closed')
+            await original_send(consumer, *args, **kwargs)
+
+        async def run():
+            router = URLRouter(websocket_urlpatterns)
+            alice = WebsocketCommunicator(router, '/ws/video/bob/?self=alice&frames=binary')
+            bob = WebsocketCommunicator(router, '/ws/video/alice/?self=bob&frames=binary')
+            await alice.connect()
+            await bob.connect()
+            await alice.receive_nothing(0.05)
+            await alice.send_to(bytes_data=encode_video_frame(0, b'\xff\xd8frame'))
+            await bob.receive_nothing(0.1)
+            await alice.send_to(bytes_data=encode_video_frame(1, b'\xff\xd8frame'))
+            self.assertEqual(await bob.receive_from(), encode_video_frame(1, b'\xff\xd8frame'))
+            self.assertEqual(len(failures), 1)
+            await alice.disconnect()
+            await bob.disconnect()
+
+        with mock.patch.object(VideoConsumer, 'send', flaky_send):
+            asyncio.run(run())
+
+    def test_frame_queue_keeps_newest_frames(self):
+        async def run():
+            queue = FrameQueue(max_frames=2)
+            for i in range(5):
+                queue.put(i)
+            self.assertEqual([await queue.get() for _ in range(2)], [3, 4])
+            self.assertEqual(queue.stats.dropped, 3)
+
+        asyncio.run(run())
+
+    @override_settings(VIDEO_CONTROL_INTERVAL_MS=50)
+    def test_slow_receiver_makes_the_sender_step_down(self):
+        async def run():
+            router = URLRouter(websocket_urlpatterns)
+            alice = WebsocketCommunicator(router, '/ws/video/bob/?self=alice&frames=binary')
+            bob = WebsocketCommunicator(router, '/ws/video/alice/?self=bob&frames=binary&acks=1')
+            await alice.connect()
+            await bob.connect()
+            await alice.receive_nothing(0.05)
+
+            async def ack_slowly():
+                while True:
+                    await bob.receive_from()
+                    await asyncio.sleep(0.3)
+                    await bob.send_json_to({'type': 'ack'})
+
+            acker = asyncio.create_task(ack_slowly())
+            for seq in range(10):
+                await alice.send_to(bytes_data=encode_video_frame(seq, b'\xff\xd8frame'))
+            control = await alice.receive_json_from(timeout=2)
+            self.assertEqual(control['type'], 'video_control')
+            self.assertLess(control['fps'], 10)
+            acker.cancel()
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+    @override_settings(VIDEO_CONTROL_INTERVAL_MS=50)
+    def test_full_channel_does_not_stop_congestion_control(self):
+        layer_class = type(get_channel_layer())
+        original_send = layer_class.send
+        refused = []
+
+        async def send(layer, channel, message):
+            if message['type'] == 'video.control' and not refused:
+                refused.append(message)
+                raise ChannelFull()
+            await original_send(layer, channel, message)
+
+        async def run():
+            router = URLRouter(websocket_urlpatterns)
+            alice = WebsocketCommunicator(router, '/ws/video/bob/?self=alice&frames=binary')
+            bob = WebsocketCommunicator(router, '/ws/video/alice/?self=bob&frames=binary&acks=1')
+            await alice.connect()
+            await bob.connect()
+            await alice.receive_nothing(0.05)
+            for seq in range(3):
+                await alice.send_to(bytes_data=encode_video_frame(seq, b'\xff\xd8frame'))
+            # The refused step down is sent again on the next interval
+            control = await alice.receive_json_from(timeout=2)
+            self.assertEqual(control['type'], 'video_control')
+            self.assertEqual(len(refused), 1)
+            await alice.disconnect()
+            await bob.disconnect()
+
+        with mock.patch.object(layer_class, 'send', send):
+            asyncio.run(run())
+
+
+class CongestionEstimatorTests(SimpleTestCase):
+    def simulate(self, estimator, stats, capacity_fps, seconds, start=0):
+        """Receiver link that delivers at most capacity_fps frames per second.
+
+        Frames beyond capacity are dropped by the FrameQueue and the ones
+        that get through wait behind a full queue (twice the send time).
+        """
+        levels = []
+        for t in range(start, start + seconds):
+            offered = estimator.settings()['fps']
+            delivered = min(offered, capacity_fps)
+            latency = 1000 / capacity_fps * (2 if offered > capacity_fps else 1)
+            for _ in range(delivered):
+                stats.record_sent()
+                stats.record_acked(latency)
+            for _ in range(offered - delivered):
+                stats.record_dropped()
+            estimator.update(stats, now=t + 1)
+            levels.append(estimator.settings())
+        return levels
+
+    def test_settles_under_the_latency_budget_and_recovers(self):
+        estimator, stats = CongestionEstimator(latency_budget_ms=250), RelayStats()
+
+        levels = self.simulate(estimator, stats, capacity_fps=5, seconds=15)
+        self.assertEqual({level['fps'] for level in levels[-10:]}, {4})
+        self.assertLessEqual(estimator.p95_latency_ms, 250)
+        self.assertEqual(estimator.delivered_fps, 4)
+
+        levels = self.simulate(estimator, stats, capacity_fps=30, seconds=20, start=15)
+        self.assertEqual(levels[-1], {'level': 0, 'scale': 1.0, 'quality': 0.7, 'fps': 12})
+
+    def test_idle_interval_changes_nothing(self):
+        estimator = CongestionEstimator()
+        self.assertIsNone(estimator.update(RelayStats(), now=1))
+        self.assertEqual(estimator.settings()['level'], 1)
+
+    def test_unacked_and_lost_frames_step_down(self):
+        estimator, stats = CongestionEstimator(), RelayStats()
+        for _ in range(5):
+            stats.record_sent()
+        self.assertEqual(estimator.update(stats, now=1)['level'], 2)
+        self.assertEqual(estimator.p95_latency_ms, float('inf'))
+
+        window = DeliveryWindow(stats, max_unacked=5, timeout_s=1.0)
+        for _ in range(5):
+            stats.record_sent()
+            window.sent(now=1)
+        window.ack(count=2, now=1.05)
+        window.expire(now=2)
+        self.assertEqual((stats.acked, stats.lost), (2, 3))
+        self.assertEqual(estimator.update(stats, now=2)['level'], 3)
+        # Late acks of the lost frames settle nothing
+        window.ack(count=3, now=2.1)
+        self.assertEqual(stats.acked, 2)
+
+
+class RoomTests(SimpleTestCase):
+    def connect(self, path):
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+
+    def test_video_frames_reach_every_subscriber_but_the_sender(self):
+        async def run():
+            names = ['alice', 'bob', 'carol', 'dave']
+            peers = {name: self.connect(f'/ws/video/room/class-1/?self={name}&frames=binary') for name in names}
+            for peer in peers.values():
+                await peer.connect()
+            await peers['alice'].receive_nothing(0.05)
+
+            jpeg = b'\xff\xd8' + bytes(range(256)) + b'\xff\xd9'
+            await peers['alice'].send_to(bytes_data=encode_video_frame(1, jpeg))
+            for name in ('bob', 'carol', 'dave'):
+                frame = await peers[name].receive_from()
+                self.assertEqual(frame_sender(frame), 'alice')
+                self.assertEqual(bytes(jpeg_payload(frame)), jpeg)
+            self.assertTrue(await peers['alice'].receive_nothing(0.05))
+
+            # carol only watches bob from now on
+            await peers['carol'].send_json_to({'type': 'subscribe', 'senders': ['bob']})
+            await peers['carol'].receive_nothing(0.05)
+            await peers['alice'].send_to(bytes_data=encode_video_frame(2, jpeg))
+            await peers['bob'].send_to(bytes_data=encode_video_frame(3, jpeg))
+            self.assertEqual(frame_sender(await peers['carol'].receive_from()), 'bob')
+            self.assertTrue(await peers['carol'].receive_nothing(0.05))
+            dave_frames = [await peers['dave'].receive_from() for _ in range(2)]
+            self.assertEqual(sorted(frame_sender(f) for f in dave_frames), ['alice', 'bob'])
+
+            self.assertEqual(frame_sender(await peers['bob'].receive_from()), 'alice')
+
+            # Clients cannot tag frames themselves
+            await peers['bob'].send_to(bytes_data=tag_sender(encode_video_frame(4, jpeg), 'alice'))
+            self.assertEqual((await peers['bob'].receive_json_from())['type'], 'error')
+            for peer in peers.values():
+                await peer.disconnect()
+
+        asyncio.run(run())
+
+    @override_settings(VIDEO_CONTROL_INTERVAL_MS=50)
+    def test_unsubscribed_receiver_no_longer_limits_the_sender(self):
+        async def run():
+            alice = self.connect('/ws/video/room/class-2/?self=alice&frames=binary')
+            bob = self.connect('/ws/video/room/class-2/?self=bob&frames=binary&acks=1')
+            await alice.connect()
+            await bob.connect()
+            await alice.receive_nothing(0.05)
+
+            # bob never acks, so his estimator asks alice to step down
+            for seq in range(3):
+                await alice.send_to(bytes_data=encode_video_frame(seq, b'\xff\xd8frame'))
+            control = await alice.receive_json_from(timeout=2)
+            self.assertEqual(control['level'], 2)
+
+            await bob.send_json_to({'type': 'subscribe', 'senders': ['carol']})
+            control = await alice.receive_json_from(timeout=2)
+            self.assertEqual(control, {'type': 'video_control', 'level': 1, 'scale': 1.0, 'quality': 0.5, 'fps': 10})
+            self.assertTrue(await alice.receive_nothing(0.2))
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+    def test_room_chat_is_not_echoed_to_the_sender(self):
+        async def run():
+            peers = [self.connect(f'/ws/chat/room/class-1/?self=p{i}') for i in range(3)]
+            for i, peer in enumerate(peers):
+                await peer.connect()
+                # Join notices of the peers that joined later
+                for earlier in peers[:i]:
+                    self.assertEqual((await earlier.receive_json_from())['text'], '[joined]')
+
+            await peers[0].send_json_to({'type': 'message', 'text': 'hi all'})
+            for peer in peers[1:]:
+                self.assertEqual((await peer.receive_json_from())['text'], 'hi all')
+            self.assertTrue(await peers[0].receive_nothing(0.05))
+            for peer in peers:
+                await peer.disconnect()
+
+        asyncio.run(run())
+
+
+class SignalingTests(SimpleTestCase):
+    async def pair(self, alice_query='webrtc=1', bob_query='webrtc=1'):
+        router = URLRouter(websocket_urlpatterns)
+        alice = WebsocketCommunicator(router, f'/ws/video/bob/?self=alice&{alice_query}')
+        bob = WebsocketCommunicator(router, f'/ws/video/alice/?self=bob&{bob_query}')
+        await alice.connect()
+        await bob.connect()
+        return alice, bob
+
+    def test_offer_refused_by_a_full_channel_can_be_sent_again(self):
+        layer_class = type(get_channel_layer())
+        original_send = layer_class.send
+        refused = []
+
+        async def send(layer, channel, message):
+            if message['type'] == 'video.signal' and not refused:
+                refused.append(message)
+                raise ChannelFull()
+            await original_send(layer, channel, message)
+
+        async def run():
+            alice, bob = await self.pair()
+            await alice.receive_json_from()
+            await bob.receive_json_from()
+
+            await alice.send_json_to({'type': 'offer', 'sdp': 'v=0 offer'})
+            self.assertIn('dropped', (await alice.receive_json_from())['message'])
+            self.assertTrue(await bob.receive_nothing(0.05))
+            await alice.send_json_to({'type': 'offer', 'sdp': 'v=0 offer'})
+            self.assertEqual(await bob.receive_json_from(), {'type': 'offer', 'from': 'alice', 'sdp': 'v=0 offer'})
+            await alice.disconnect()
+            await bob.disconnect()
+
+        with mock.patch.object(layer_class, 'send', send):
+            asyncio.run(run())
+
+    def test_offer_answer_and_ice_are_relayed_in_order(self):
+        async def run():
+            alice, bob = await self.pair()
+            self.assertEqual(await alice.receive_json_from(), {'type': 'peer', 'peer_id': 'bob', 'webrtc': True})
+            self.assertEqual(await bob.receive_json_from(), {'type': 'peer', 'peer_id': 'alice', 'webrtc': True})
+
+            await bob.send_json_to({'type': 'answer', 'sdp': 'v=0 answer'})
+            self.assertEqual((await bob.receive_json_from())['message'], 'No offer to answer')
+
+            await alice.send_json_to({'type': 'offer', 'sdp': 'v=0 offer'})
+            self.assertEqual(await bob.receive_json_from(), {'type': 'offer', 'from': 'alice', 'sdp': 'v=0 offer'})
+            await alice.send_json_to({'type': 'ice', 'candidate': {'candidate': 'candidate:1'}})
+            self.assertEqual((await bob.receive_json_from())['candidate'], {'candidate': 'candidate:1'})
+            await bob.send_json_to({'type': 'answer', 'sdp': 'v=0 answer'})
+            self.assertEqual(await alice.receive_json_from(), {'type': 'answer', 'from': 'bob', 'sdp': 'v=0 answer'})
+
+            await alice.send_json_to({'type': 'stats'})
+            self.assertEqual((await alice.receive_json_from())['signaling'], {'bob': 'connected'})
+
+            # Relayed frames keep working as the fallback
+            frame = encode_video_frame(1, b'\xff\xd8jpeg')
+            await alice.send_to(bytes_data=frame)
+            self.assertEqual((await bob.receive_json_from())['sender'], 'alice')
+
+            await alice.send_json_to({'type': 'hangup'})
+            self.assertEqual(await bob.receive_json_from(), {'type': 'hangup', 'from': 'alice'})
+            await bob.disconnect()
+            self.assertEqual(await alice.receive_json_from(), {'type': 'peer_left', 'peer_id': 'bob'})
+            await alice.disconnect()
+
+        asyncio.run(run())
+
+    def test_glare_keeps_the_lower_ids_offer(self):
+        async def run():
+            alice, bob = await self.pair()
+            await alice.receive_json_from()
+            await bob.receive_json_from()
+
+            await alice.send_json_to({'type': 'offer', 'sdp': 'from alice'})
+            await bob.send_json_to({'type': 'offer', 'sdp': 'from bob'})
+            self.assertEqual((await bob.receive_json_from())['sdp'], 'from alice')
+            self.assertTrue(await alice.receive_nothing(0.05))
+            await bob.send_json_to({'type': 'answer', 'sdp': 'bob answers'})
+            self.assertEqual((await alice.receive_json_from())['sdp'], 'bob answers')
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+    def test_peers_without_webrtc_only_get_relayed_frames(self):
+        async def run():
+            alice, bob = await self.pair(bob_query='frames=binary')
+            self.assertTrue(await bob.receive_nothing(0.05))
+            self.assertTrue(await alice.receive_nothing(0.01))
+            await alice.send_json_to({'type': 'offer', 'sdp': 'v=0'})
+            self.assertEqual((await alice.receive_json_from())['type'], 'error')
+            await bob.send_json_to({'type': 'offer', 'sdp': 'v=0'})
+            self.assertIn('webrtc=1', (await bob.receive_json_from())['message'])
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+    def test_session_rejects_out_of_order_signals(self):
+        session = SignalingSession('alice', 'bob')
+        with self.assertRaises(SignalingError):
+            session.send('ice')
+        session.send('offer')
+        with self.assertRaises(SignalingError):
+            session.send('offer')
+        self.assertFalse(session.receive('offer'))
+        self.assertTrue(session.receive('answer'))
+        self.assertEqual(session.state, 'connected')
+        # Renegotiation (e.g. ICE restart) starts from connected
+        session.send('offer')
+        self.assertEqual(session.state, 'offer-sent')
+
+
+class ServerExtractionTests(ASLConsumerTestCase):
+    confident_class = 0
+
+    def test_extracted_landmarks_feed_the_asl_socket(self):
+        async def run():
+            asl = await self.connect_asl('/ws/asl/?self=alice')
+            layer = get_channel_layer()
+            rng = np.random.default_rng(0)
+            for _ in range(12):
+                await layer.group_send('asl_alice', {
+                    'type': 'asl.landmarks',
+                    'landmarks': rng.uniform(0, 1, 126).astype(np.float32).tobytes(),
+                })
+                await asl.receive_nothing(0.05)
+            self.assertEqual((await self.receive_type(asl, 'prediction'))['label'], 'A')
+
+            # Frames without hands reset the window like browser frames do
+            await layer.group_send('asl_alice', {'type': 'asl.landmarks', 'landmarks': None})
+            await asl.receive_nothing(0.05)
+            stats = await self.request_stats(asl)
+            self.assertGreater(stats['inferred_frames'], 0)
+            await asl.disconnect()
+
+        asyncio.run(run())
+
+
+class MuxTests(ASLConsumerTestCase):
+    confident_class = 0
+
+    async def open_mux(self, path, app=None):
+        communicator = WebsocketCommunicator(app or URLRouter(websocket_urlpatterns), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def control(self, communicator, message):
+        await communicator.send_to(bytes_data=mux.encode_frame(mux.STREAM_CONTROL, json.dumps(message), text=True))
+
+    async def open_stream(self, communicator, stream_id, **params):
+        await self.control(communicator, {'type': 'open', 'stream': stream_id, 'params': params})
+        self.assertEqual(await self.receive_stream(communicator, mux.STREAM_CONTROL), {'type': 'opened', 'stream': stream_id})
+
+    async def receive_stream(self, communicator, stream_id, message_type=None, timeout=2):
+        """Next message of a stream (JSON decoded if text), skipping other streams"""
+        while True:
+            got, text, data = mux.decode_frame(await communicator.receive_from(timeout))
+            message = json.loads(text) if text is not None else data
+            if got == stream_id and (message_type is None or message.get('type') == message_type):
+                return message
+
+    def test_chat_video_and_asl_share_one_socket(self):
+        async def run():
+            alice = await self.open_mux('/ws/mux/bob/?self=alice')
+            bob = await self.open_mux('/ws/mux/alice/?self=bob')
+            for peer in (alice, bob):
+                await self.open_stream(peer, mux.STREAM_CHAT)
+                await self.open_stream(peer, mux.STREAM_VIDEO, frames='binary')
+            await self.open_stream(alice, mux.STREAM_ASL)
+            self.assertEqual((await self.receive_stream(alice, mux.STREAM_ASL))['type'], 'connection')
+
+            await alice.send_to(bytes_data=mux.encode_frame(
+                mux.STREAM_CHAT, json.dumps({'type': 'message', 'text': 'hello'}), text=True
+            ))
+            message = await self.receive_stream(bob, mux.STREAM_CHAT, 'message')
+            while message['text'] == '[joined]':
+                message = await self.receive_stream(bob, mux.STREAM_CHAT, 'message')
+            self.assertEqual(message['text'], 'hello')
+
+            frame = encode_video_frame(7, b'\xff\xd8jpeg')
+            await alice.send_to(bytes_data=mux.encode_frame(mux.STREAM_VIDEO, frame))
+            self.assertEqual(await self.receive_stream(bob, mux.STREAM_VIDEO), frame)
+
+            # Captions from alice's ASL stream reach bob's chat stream
+            rng = np.random.default_rng(0)
+            for seq in range(12):
+                await alice.send_to(bytes_data=mux.encode_frame(
+                    mux.STREAM_ASL, encode_landmark_frame(seq, rng.uniform(0, 1, 126))
+                ))
+                await asyncio.sleep(0.05)
+            caption = await self.receive_stream(bob, mux.STREAM_CHAT, 'asl_prediction')
+            self.assertEqual(caption['sender'], 'alice')
+
+            await self.control(bob, {'type': 'close', 'stream': mux.STREAM_VIDEO})
+            self.assertEqual(
+                await self.receive_stream(bob, mux.STREAM_CONTROL),
+                {'type': 'closed', 'stream': mux.STREAM_VIDEO, 'code': 1000}
+            )
+            await bob.send_to(bytes_data=mux.encode_frame(mux.STREAM_VIDEO, frame))
+            self.assertEqual(
+                (await self.receive_stream(bob, mux.STREAM_CONTROL))['message'], 'Stream 3 (video) is not open'
+            )
+            await alice.disconnect()
+            await bob.disconnect()
+
+        asyncio.run(run())
+
+    def test_random_id_is_looked_up_once_per_connection(self):
+        user = mock.Mock(is_authenticated=True, username='alice')
+        router = URLRouter(websocket_urlpatterns)
+
+        async def app(scope, receive, send):
+            return await router({**scope, 'user': user}, receive, send)
+
+        async def run():
+            separate = [await self.open_mux(path, app) for path in ('/ws/chat/bob/', '/ws/video/bob/')]
+            separate_lookups = profiles.objects.get_or_create.call_count
+            for communicator in separate:
+                await communicator.disconnect()
+
+            profiles.objects.get_or_create.reset_mock()
+            muxed = await self.open_mux('/ws/mux/bob/', app)
+            await self.open_stream(muxed, mux.STREAM_CHAT)
+            await self.open_stream(muxed, mux.STREAM_VIDEO)
+            self.assertEqual((separate_lookups, profiles.objects.get_or_create.call_count), (2, 1))
+            await muxed.disconnect()
+
+        with mock.patch('translator.consumers.UserProfile') as profiles:
+            profiles.objects.get_or_create.return_value = (mock.Mock(random_id='alice'), False)
+            asyncio.run(run())
+
+
+async def open_client(port, path):
+    """Real WebSocket client (autobahn, as daphne ships it) and its message queue"""
+    from autobahn.asyncio.websocket import WebSocketClientFactory, WebSocketClientProtocol
+
+    class Client(WebSocketClientProtocol):
+        def onOpen(self):
+            self.factory.opened.set_result(self)
+
+        def onMessage(self, payload, is_binary):
+            self.factory.messages.put_nowait(payload)
+
+    loop = asyncio.get_running_loop()
+    factory = WebSocketClientFactory(f'ws://127.0.0.1:{port}{path}')
+    factory.protocol = Client
+    factory.opened = loop.create_future()
+    factory.messages = asyncio.Queue()
+    await loop.create_connection(factory, '127.0.0.1', port)
+    return await asyncio.wait_for(factory.opened, 10), factory.messages
+
+
+async def next_message(messages, accept):
+    while True:
+        payload = await asyncio.wait_for(messages.get(), 10)
+        if accept(payload):
+            return payload
+
+
+def is_video_frame(payload):
+    return payload[:1] == bytes([FRAME_VIDEO])
+
+
+@skipUnless(REDIS_SERVER, 'needs channels-redis and a redis-server executable')
+class RedisWorkersTests(SimpleTestCase):
+    """Three Daphne workers on a local redis-server, as `python -m rtslt.workers` runs them"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.procs = []
+        try:
+            redis_port = workers.free_port()
+            cls.procs.append(workers.start_redis(redis_port, REDIS_SERVER))
+            cls.ports = [workers.free_port() for _ in range(3)]
+            for port in cls.ports:
+                cls.procs.append(workers.start_worker(port, f'redis://127.0.0.1:{redis_port}/0', quiet=True))
+        except Exception:
+            workers.stop(cls.procs)
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        workers.stop(cls.procs)
+        super().tearDownClass()
+
+    def test_room_frames_and_chat_cross_workers(self):
+        async def run():
+            jpeg = b'\xff\xd8' + bytes(range(256)) + b'\xff\xd9'
+            names = ['alice', 'bob', 'carol']
+            clients = {
+                name: await open_client(port, f'/ws/video/room/redis-1/?self={name}&frames=binary')
+                for name, port in zip(names, self.ports)
+            }
+            # Let the hellos cross Redis so every worker knows the others' channels
+            await asyncio.sleep(0.5)
+            clients['alice'][0].sendMessage(encode_video_frame(1, jpeg), isBinary=True)
+            for name in ('bob', 'carol'):
+                frame = await next_message(clients[name][1], is_video_frame)
+                self.assertEqual(frame_sender(frame), 'alice')
+                self.assertEqual(bytes(jpeg_payload(frame)), jpeg)
+
+            chat = [await open_client(port, f'/ws/chat/room/redis-1/?self={name}')
+                    for name, port in zip(names[:2], self.ports)]
+            await asyncio.sleep(0.3)
+            chat[0][0].sendMessage(json.dumps({'type': 'message', 'text': 'hello'}).encode('utf-8'))
+            message = await next_message(chat[1][1], lambda p: json.loads(p).get('text') != '[joined]')
+            self.assertEqual(json.loads(message)['text'], 'hello')
+
+            for client, _ in [*clients.values(), *chat]:
+                client.sendClose()
+
+        asyncio.run(run())
+
+    def test_pair_video_cross_workers(self):
+        async def run():
+            jpeg = b'\xff\xd8' + b'\x01' * 5000 + b'\xff\xd9'
+            alice, alice_messages = await open_client(self.ports[0], '/ws/video/bob/?self=alice&frames=binary')
+            bob, _ = await open_client(self.ports[1], '/ws/video/alice/?self=bob&frames=binary')
+            await asyncio.sleep(0.5)
+            for seq in range(3):
+                bob.sendMessage(encode_video_frame(seq, jpeg), isBinary=True)
+                frame = await next_message(alice_messages, is_video_frame)
+                self.assertEqual(frame, encode_video_frame(seq, jpeg))
+            alice.sendClose()
+            bob.sendClose()
+
+        asyncio.run(run())
@@ -0,0 +1,224 @@
+"""
+Binary landmark frames for the ASL WebSocket
+
+Every message starts with an 8-byte little-endian header:
+
+    offset 0  uint8   message type (FRAME_LANDMARKS or FRAME_BATCH)
+    offset 1  uint8   flags (FLAG_HAS_HANDS, single frames only)
+    offset 2  uint16  frame count (FRAME_BATCH only, otherwise ignored)
+    offset 4  uint32  sequence number chosen by the client (first frame)
+
+FRAME_LANDMARKS is followed by 126 x float32 landmarks (x, y, z for 21
+points x 2 hands). A frame without FLAG_HAS_HANDS carries no payload and
+resets the sequence, like {"type": "landmarks", "has_hands": false} does in
+the JSON protocol. Compared with JSON text this is 512 bytes instead of
+roughly 2.5 KB, and the payload is read in place with np.frombuffer instead
+of parsing decimals.
+
+FRAME_BATCH packs `count` consecutive frames into one message so framing
+and dispatch are paid once:
+
+    count x float64   capture timestamps (client clock, ms)
+    count x uint8     has-hands mask, zero-padded to a multiple of 8 bytes
+    n x 126 float32   landmarks for the n frames whose mask is set, in order
+
+Clients on slow uplinks can negotiate the quantized encoding with
+`?encoding=q16` when connecting. Values are quantized to 1/4096 (MediaPipe
+coordinates need no more) and sent as:
+
+    FRAME_Q16_KEY     126 x int16  quantized values (260 bytes)
+    FRAME_Q16_DELTA   126 x int8   change since the previous frame (134 bytes)
+
+The client sends a keyframe every QUANT_KEYFRAME_INTERVAL frames, whenever a
+delta does not fit in int8, and when the server asks for one after losing
+the reference (a delta whose seq does not follow the previous frame).
+"""
+
+import struct
+
+import numpy as np
+
+HEADER = struct.Struct('<BBHI')
+LANDMARK_VALUES = 126
+
+FRAME_LANDMARKS = 1
+FRAME_BATCH = 2
+FRAME_Q16_KEY = 3
+FRAME_Q16_DELTA = 4
+
+ENCODING_FLOAT32 = 'float32'
+ENCODING_Q16 = 'q16'
+ENCODINGS = (ENCODING_FLOAT32, ENCODING_Q16)
+
+QUANT_SCALE = 4096
+QUANT_KEYFRAME_INTERVAL = 30
+
+FLAG_HAS_HANDS = 0x01
+
+
+class WireError(ValueError):
+    """Raised for binary messages that do not follow the frame layout"""
+
+
+class MissingKeyframe(WireError):
+    """Raised for a delta frame the decoder has no reference for"""
+
+
+def _mask_bytes(count):
+    return (count + 7) // 8 * 8
+
+
+def message_type(data):
+    if len(data) < HEADER.size:
+        raise WireError(f'Frame is {len(data)} bytes, shorter than the {HEADER.size}-byte header')
+    return data[0]
+
+
+def decode_landmark_frame(data):
+    """bytes -> (seq, landmarks or None); landmarks is a read-only float32 view"""
+    msg_type = message_type(data)
+    _, flags, _, seq = HEADER.unpack_from(data)
+    if msg_type != FRAME_LANDMARKS:
+        raise WireError(f'Unknown binary message type {msg_type}')
+    if not flags & FLAG_HAS_HANDS:
+        return seq, None
+    expected = HEADER.size + LANDMARK_VALUES * 4
+    if len(data) != expected:
+        raise WireError(f'Landmark frame is {len(data)} bytes, expected {expected}')
+    return seq, np.frombuffer(data, dtype='<f4', count=LANDMARK_VALUES, offset=HEADER.size)
+
+
+def decode_landmark_batch(data):
+    """bytes -> (seq, timestamps, frames); frames[i] is a float32 view or None"""
+    msg_type = message_type(data)
+    _, _, count, seq = HEADER.unpack_from(data)
+    if msg_type != FRAME_BATCH:
+        raise WireError(f'Expected a batch message, got type {msg_type}')
+    mask_offset = HEADER.size + count * 8
+    values_offset = mask_offset + _mask_bytes(count)
+    if len(data) < values_offset:
+        raise WireError(f'Batch of {count} frames is truncated')
+    timestamps = np.frombuffer(data, dtype='<f8', count=count, offset=HEADER.size)
+    has_hands = np.frombuffer(data, dtype=np.uint8, count=count, offset=mask_offset)
+    n = int(np.count_nonzero(has_hands))
+    expected = values_offset + n * LANDMARK_VALUES * 4
+    if len(data) != expected:
+        raise WireError(f'Batch is {len(data)} bytes, expected {expected}')
+    values = np.frombuffer(data, dtype='<f4', count=n * LANDMARK_VALUES, offset=values_offset)
+    values = values.reshape(n, LANDMARK_VALUES)
+    frames, k = [], 0
+    for hands in has_hands:
+        if hands:
+            frames.append(values[k])
+            k += 1
+        else:
+            frames.append(None)
+    return seq, timestamps, frames
+
+
+def encode_landmark_frame(seq, landmarks=None):
+    """Build a frame (used by tests and Python clients)"""
+    if landmarks is None:
+        return HEADER.pack(FRAME_LANDMARKS, 0, 1, seq & 0xFFFFFFFF)
+    values = np.asarray(landmarks, dtype='<f4').reshape(-1)
+    if values.size != LANDMARK_VALUES:
+        raise WireError(f'Expected {LANDMARK_VALUES} landmark values, got {values.size}')
+    return HEADER.pack(FRAME_LANDMARKS, FLAG_HAS_HANDS, 1, seq & 0xFFFFFFFF) + values.tobytes()
+
+
+def encode_landmark_batch(seq, timestamps, frames):
+    """Build a batch from capture timestamps and frames (None = no hands)"""
+    count = len(frames)
+    if len(timestamps) != count:
+        raise WireError('Need one timestamp per frame')
+    mask = np.zeros(_mask_bytes(count), dtype=np.uint8)
+    values = []
+    for i, frame in enumerate(frames):
+        if frame is None:
+            continue
+        frame = np.asarray(frame, dtype='<f4').reshape(-1)
+        if frame.size != LANDMARK_VALUES:
+            raise WireError(f'Expected {LANDMARK_VALUES} landmark values, got {frame.size}')
+        mask[i] = 1
+        values.append(frame.tobytes())
+    return b''.join([
+        HEADER.pack(FRAME_BATCH, 0, count, seq & 0xFFFFFFFF),
+        np.asarray(timestamps, dtype='<f8').tobytes(),
+        mask.tobytes(),
+        *values,
+    ])
+
+
+class QuantizedFrameDecoder:
+    """Per-connection state for the q16 encoding"""
+
+    def __init__(self):
+        self.reference = np.zeros(LANDMARK_VALUES, dtype=np.int16)
+        self.has_reference = False
+        self.last_seq = None
+        self._out = np.empty(LANDMARK_VALUES, dtype=np.float32)
+
+    def decode(self, data):
+        """bytes -> (seq, landmarks or None); landmarks is reused between calls"""
+        msg_type = message_type(data)
+        _, flags, _, seq = HEADER.unpack_from(data)
+        if msg_type == FRAME_Q16_KEY:
+            if not flags & FLAG_HAS_HANDS:
+                self.has_reference = False
+                self.last_seq = seq
+                return seq, None
+            self._check_size(data, 2)
+            self.reference[:] = np.frombuffer(data, dtype='<i2', count=LANDMARK_VALUES, offset=HEADER.size)
+        elif msg_type == FRAME_Q16_DELTA:
+            self._check_size(data, 1)
+            if not self.has_reference or seq != (self.last_seq + 1) & 0xFFFFFFFF:
+                self.has_reference = False
+                raise MissingKeyframe(f'Delta frame {seq} has no reference frame')
+            self.reference += np.frombuffer(data, dtype=np.int8, count=LANDMARK_VALUES, offset=HEADER.size)
+        else:
+            raise WireError(f'Unknown binary message type {msg_type}')
+        self.has_reference = True
+        self.last_seq = seq
+        np.multiply(self.reference, 1.0 / QUANT_SCALE, out=self._out)
+        return seq, self._out
+
+    def reset(self):
+        self.has_reference = False
+        self.last_seq = None
+
+    @staticmethod
+    def _check_size(data, itemsize):
+        expected = HEADER.size + LANDMARK_VALUES * itemsize
+        if len(data) != expected:
+            raise WireError(f'Quantized frame is {len(data)} bytes, expected {expected}')
+
+
+class QuantizedFrameEncoder:
+    """Client side of the q16 encoding (used by tests, benchmarks and Python clients)"""
+
+    def __init__(self, keyframe_interval=QUANT_KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.reference = None
+        self.since_keyframe = 0
+
+    def request_keyframe(self):
+        self.reference = None
+
+    def encode(self, seq, landmarks=None):
+        seq &= 0xFFFFFFFF
+        if landmarks is None:
+            self.reference = None
+            return HEADER.pack(FRAME_Q16_KEY, 0, 1, seq)
+        values = np.asarray(landmarks, dtype=np.float64).reshape(-1)
+        if values.size != LANDMARK_VALUES:
+            raise WireError(f'Expected {LANDMARK_VALUES} landmark values, got {values.size}')
+        quantized = np.clip(np.rint(values * QUANT_SCALE), -32768, 32767).astype(np.int16)
+        if self.reference is not None and self.since_keyframe < self.keyframe_interval:
+            delta = quantized.astype(np.int32) - self.reference
+            if np.abs(delta).max() <= 127:
+                self.reference = quantized
+                self.since_keyframe += 1
+                return HEADER.pack(FRAME_Q16_DELTA, FLAG_HAS_HANDS, 1, seq) + delta.astype(np.int8).tobytes()
+        self.reference = quantized
+        self.since_keyframe = 1
+        return HEADER.pack(FRAME_Q16_KEY, FLAG_HAS_HANDS, 1, seq) + quantized.astype('<i2').tobytes()
@@ -26,7 +26,7 @@ try:
     )
     print("[OK] Model loaded successfully")
     print(f"   Model type: {predictor.model_type}")
-    print(f"   Sequence buffer size: {len(predictor.sequence_buffer)}")
+    print(f"   Sequence buffer size: {predictor.buffered_frames}")
     print(f"   Sequence length needed: {predictor.sequence_length}")
 except Exception as e:
     print(f"[ERROR] Failed to load model: {e}")
@@ -40,7 +40,7 @@ try:
         label, conf, latency = predictor.predict(landmarks, has_hands=True)
         
         if label is None:
-            print(f"   Frame {frame_idx}/10: Buffering... ({len(predictor.sequence_buffer)}/10)")
+            print(f"   Frame {frame_idx}/10: Buffering... ({predictor.buffered_frames}/10)")
         else:
             print(f"   Frame {frame_idx}/10: [OK] {label} ({conf:.1%}) - {latency}ms")
             break
@@ -82,11 +82,11 @@ try:
         landmarks = np.random.rand(126).astype(np.float32)
         predictor.predict(landmarks, has_hands=True)
     
-    buffer_before = len(predictor.sequence_buffer)
+    buffer_before = predictor.buffered_frames
     
     # Signal no hands
     predictor.predict(None, has_hands=False)
-    buffer_after = len(predictor.sequence_buffer)
+    buffer_after = predictor.buffered_frames
     
     print(f"   Buffer before reset: {buffer_before} frames")
     print(f"   Buffer after reset: {buffer_after} frames")